@@ -2,10 +2,33 @@ import unittest
 
 from game_player import GamePlayer
 from placeble import Placeble
-from game_piece import GamePiece
-from go_model import GoModel
+from game_piece import GamePiece, stone
+from go_model import GoModel, UndoException, ConsistencyError
 from position import Position
 from player_colors import PlayerColors
+from zobrist import zobrist_table, hash_board
+from bit_board import BitBoard
+from board_geometry import geometry, neighbor_table, CORNER, EDGE, CENTER
+from batch_go_model import BatchGoModel
+from self_play import play_game, random_strategy, run_games, load_strategy
+from mcts_player import MCTSPlayer, TranspositionTable, SearchNode, PASS, _winner
+from sgf import read_games, write_game, replay
+from benchmark import run_benchmarks, compare, measure_memory
+from go_server import GoServer, run_load
+from position_codec import encode, decode, record_size, HEADER, NO_KO
+from game_archive import GameArchive, PositionArchive
+from symmetry import canonical_form, transform_bitboard, transform_point, inverse, TRANSFORMS
+from eval_cache import EvalCache
+from ownership import OwnershipEstimator
+from solver import SolverPlayer, SolutionTable
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import random
+import tempfile
+import time
 
 
 class GamePieceTest(unittest.TestCase):
@@ -36,6 +59,12 @@ class GamePieceTest(unittest.TestCase):
         temp_game_piece = GamePiece(PlayerColors.BLACK)
         temp_neighbor_piece = GamePiece(PlayerColors.BLACK)
         self.assertTrue(temp_game_piece == temp_neighbor_piece)
+    def test_stones_are_shared_and_slotted(self): #53
+        self.assertIs(stone(PlayerColors.WHITE), stone(PlayerColors.WHITE))
+        self.assertEqual(stone(PlayerColors.BLACK), GamePiece(PlayerColors.BLACK))
+        self.assertFalse(hasattr(stone(PlayerColors.BLACK), '__dict__'))
+        with self.assertRaises(TypeError):
+            stone(3)
 
 class GamePlayerTest(unittest.TestCase):
     def test_game_player_is_a_player_color(self): #8
@@ -60,8 +89,736 @@ class GamePlayerTest(unittest.TestCase):
 
 
 
-# class GoModelTest(unittest.TestCase):
-#     pass
+def play(model, row, col):
+    """
+    Plays a move for the current player the same way the GUI does
+    """
+    pos = Position(row, col)
+    piece = GamePiece(model.current_player.player_color)
+    if not model.is_valid_placement(pos, piece):
+        return False
+    model.set_piece(pos, piece)
+    model.capture()
+    model.set_next_player()
+    return True
+
+def setup_ko(model):
+    """
+    Plays the moves for a ko shape where black has just captured at (1, 2) and white may not retake at (1, 1)
+    """
+    for row, col in ((1, 0), (0, 2), (0, 1), (2, 2), (2, 1), (1, 3), (5, 5), (1, 1), (1, 2)):
+        play(model, row, col)
+
+class GoModelTest(unittest.TestCase):
+    def test_ko_recapture_is_invalid(self): #14
+        model = GoModel()
+        setup_ko(model)
+        self.assertIsNone(model.piece_at(Position(1, 1)))
+        self.assertFalse(model.is_valid_placement(Position(1, 1), GamePiece(PlayerColors.WHITE)))
+    def test_ko_can_be_retaken_after_another_move(self): #15
+        model = GoModel()
+        setup_ko(model)
+        play(model, 5, 0)
+        play(model, 4, 0)
+        self.assertTrue(model.is_valid_placement(Position(1, 1), GamePiece(PlayerColors.WHITE)))
+    def test_position_hash_matches_board(self): #16
+        model = GoModel()
+        setup_ko(model)
+        self.assertEqual(model.position_hash, hash_board(model.board, zobrist_table(6, 6)))
+    def test_superko_forbids_older_positions(self): #17
+        model = GoModel(superko=True)
+        play(model, 0, 0)
+        self.assertFalse(model.check_ko(model.position_hash ^ 1))
+        self.assertTrue(model.check_ko(0))
+    def test_capture_removes_chain(self): #18
+        model = GoModel()
+        for row, col in ((0, 1), (0, 0), (1, 1), (1, 0), (2, 0)):
+            play(model, row, col)
+        self.assertIsNone(model.piece_at(Position(0, 0)))
+        self.assertIsNone(model.piece_at(Position(1, 0)))
+        self.assertEqual(model.player_b.capture_count, 2)
+        self.assertEqual(model.player_w.capture_count, 0)
+    def test_chain_liberties(self): #19
+        model = GoModel()
+        for row, col in ((2, 2), (0, 0), (2, 3)):
+            play(model, row, col)
+        chain = model.chain_at(Position(2, 2))
+        self.assertIs(chain, model.chain_at(Position(2, 3)))
+        self.assertEqual(chain.stones, {(2, 2), (2, 3)})
+        self.assertEqual(chain.liberties, {(1, 2), (1, 3), (3, 2), (3, 3), (2, 1), (2, 4)})
+    def test_suicide_is_invalid(self): #20
+        model = GoModel()
+        for row, col in ((0, 1), (5, 5), (1, 0)):
+            play(model, row, col)
+        self.assertFalse(model.is_valid_placement(Position(0, 0), GamePiece(PlayerColors.WHITE)))
+    def test_find_group_large_snake(self): #21
+        model = GoModel(19, 19)
+        for row in range(0, 19, 2):
+            for col in range(19):
+                model.set_piece(Position(row, col), GamePiece(PlayerColors.BLACK))
+            if row < 18:
+                model.set_piece(Position(row + 1, 18 if row % 4 == 0 else 0), GamePiece(PlayerColors.BLACK))
+        group = model.find_group(model.board, PlayerColors.BLACK, (0, 0))
+        self.assertEqual(len(group), 10 * 19 + 9)
+        self.assertEqual(len(model.chain_at(Position(0, 0))), 10 * 19 + 9)
+    def test_undo_restores_same_pieces(self): #25
+        model = GoModel()
+        for row, col in ((0, 1), (0, 0), (1, 1)):
+            play(model, row, col)
+        white_piece = model.piece_at(Position(0, 0))
+        before_hash = model.position_hash
+        play(model, 1, 0)
+        play(model, 2, 0)
+        self.assertIsNone(model.piece_at(Position(0, 0)))
+        model.undo()
+        model.undo()
+        self.assertIs(model.piece_at(Position(0, 0)), white_piece)
+        self.assertIsNone(model.piece_at(Position(1, 0)))
+        self.assertEqual(model.position_hash, before_hash)
+        self.assertEqual(model.current_player.player_color, PlayerColors.WHITE)
+    def test_undo_restores_capture_count(self): #26
+        model = GoModel()
+        for row, col in ((0, 1), (0, 0), (1, 0)):
+            play(model, row, col)
+        self.assertEqual(model.player_b.capture_count, 1)
+        model.undo()
+        self.assertEqual(model.player_b.capture_count, 0)
+        self.assertIsNotNone(model.piece_at(Position(0, 0)))
+    def test_undo_with_no_moves(self): #27
+        with self.assertRaises(UndoException):
+            GoModel().undo()
+    def test_redo_replays_move(self): #28
+        model = GoModel()
+        for row, col in ((0, 1), (0, 0), (1, 0)):
+            play(model, row, col)
+        after_hash = model.position_hash
+        model.undo()
+        model.pass_turn()
+        model.undo()
+        model.redo()
+        self.assertEqual(model.consecutive_passes, 1)
+        with self.assertRaises(UndoException):
+            model.redo()
+        model.undo()
+        play(model, 1, 0)
+        self.assertEqual(model.position_hash, after_hash)
+        model.undo()
+        model.redo()
+        self.assertEqual(model.position_hash, after_hash)
+        self.assertIsNone(model.piece_at(Position(0, 0)))
+        self.assertEqual(model.player_b.capture_count, 1)
+        self.assertEqual(model.history_length, 3)
+    def test_calculate_score(self): #29
+        model = GoModel()
+        for row in range(6):
+            model.set_piece(Position(row, 2), GamePiece(PlayerColors.BLACK))
+            model.set_piece(Position(row, 3), GamePiece(PlayerColors.WHITE))
+        model.player_b.capture_count = 2
+        self.assertEqual(model.calculate_score(), [12 + 6 + 2, 12 + 6 + 6.5])
+    def test_shared_region_is_not_territory(self): #30
+        model = GoModel()
+        model.set_piece(Position(0, 0), GamePiece(PlayerColors.BLACK))
+        model.set_piece(Position(5, 5), GamePiece(PlayerColors.WHITE))
+        self.assertEqual(model.calculate_score(komi=0), [1, 1])
+    def test_profiling_counts_calls(self): #46
+        model = GoModel()
+        self.assertEqual(model.stats(), {})
+        model.enable_profiling()
+        setup_ko(model)
+        model.is_valid_placement(Position(1, 1), GamePiece(PlayerColors.WHITE))
+        stats = model.stats()
+        self.assertEqual(stats['capture']['calls'], 9)
+        self.assertEqual(stats['remove_chain']['calls'], 1)
+        self.assertEqual(stats['is_valid_placement']['calls'], 10)
+        self.assertGreater(stats['is_valid_placement']['cells_visited'], 0)
+        self.assertGreaterEqual(stats['capture']['p99_seconds'], stats['capture']['p50_seconds'])
+        model.reset_stats()
+        self.assertEqual(model.stats()['capture']['calls'], 0)
+    def test_disabled_profiling_leaves_no_wrappers(self): #47
+        model = GoModel()
+        model.enable_profiling()
+        model.disable_profiling()
+        self.assertFalse(model.profiling)
+        self.assertNotIn('capture', vars(model))
+        play(model, 0, 0)
+        self.assertEqual(model.stats()['capture']['calls'], 0)
+    def test_legal_moves_leaves_out_ko(self): #39
+        model = GoModel()
+        setup_ko(model)
+        bits = model.to_bitboard()
+        legal = model.legal_moves()
+        self.assertFalse(legal >> bits.point(1, 1) & 1)
+        self.assertTrue(legal >> bits.point(3, 3) & 1)
+        self.assertEqual(legal.bit_count(), 36 - 10)
+    def test_legal_moves_match_valid_placements(self): #40
+        rng = random.Random(4)
+        for model in (GoModel(9, 9), GoModel(9, 9, superko=True)):
+            for _ in range(150):
+                piece = GamePiece(model.current_player.player_color)
+                bits = model.to_bitboard()
+                legal = model.legal_moves()
+                expected = [(r, c) for r in range(9) for c in range(9) if model.is_valid_placement(Position(r, c), piece)]
+                self.assertEqual(expected, [(r, c) for r in range(9) for c in range(9) if legal >> bits.point(r, c) & 1])
+                if not expected or rng.random() < 0.05:
+                    model.pass_turn()
+                elif rng.random() < 0.1 and model.history_length:
+                    model.undo()
+                else:
+                    play(model, *rng.choice(expected))
+    def test_counters_match_board_scans(self): #56
+        rng = random.Random(6)
+        model = GoModel(9, 9)
+        model.consistency_checks = True
+        for _ in range(300):
+            legal = [(r, c) for r in range(9) for c in range(9)
+                     if model.is_valid_placement(Position(r, c), GamePiece(model.current_player.player_color))]
+            if not legal or rng.random() < 0.03:
+                model.pass_turn()
+            elif rng.random() < 0.1 and model.history_length:
+                model.undo()
+            elif rng.random() < 0.05:
+                try:
+                    model.redo()
+                except UndoException:
+                    play(model, *rng.choice(legal))
+            else:
+                play(model, *rng.choice(legal))
+        black, white = model.stone_counts
+        self.assertEqual(model.empty_count, 81 - black - white)
+        self.assertEqual(len(model.occupied), black + white)
+        model.player_w.capture_count += 1
+        with self.assertRaises(ConsistencyError):
+            model.check_consistency()
+
+    def test_seek_matches_stepping(self): #62
+        rng = random.Random(8)
+        model = GoModel(9, 9, keyframe_interval=4)
+        model.consistency_checks = True
+        positions = [(model.position_hash, model.current_player, model.to_bitboard().ko)]
+        for _ in range(60):
+            legal = [(r, c) for r in range(9) for c in range(9)
+                     if model.is_valid_placement(Position(r, c), GamePiece(model.current_player.player_color))]
+            if not legal or rng.random() < 0.05:
+                model.pass_turn()
+            else:
+                play(model, *rng.choice(legal))
+            positions.append((model.position_hash, model.current_player, model.to_bitboard().ko))
+        for move_number in (0, 59, 3, 41, 42, 60, 17):
+            model.seek(move_number)
+            self.assertEqual(model.history_length, move_number)
+            self.assertEqual((model.position_hash, model.current_player, model.to_bitboard().ko), positions[move_number])
+        self.assertEqual(model.line_length, 60)
+        model.seek(5)
+        model.pass_turn()
+        self.assertEqual(model.line_length, 6)
+        with self.assertRaises(ValueError):
+            model.seek(7)
+
+    def test_fork_is_independent(self): #63
+        model = GoModel()
+        setup_ko(model)
+        before = (model.position_hash, model.history_length, model.player_b.capture_count)
+        child = model.fork()
+        self.assertEqual((child.position_hash, child.history_length, child.player_b.capture_count), before)
+        self.assertFalse(child.is_valid_placement(Position(1, 1), GamePiece(PlayerColors.WHITE)))
+        play(child, 4, 4)
+        play(child, 4, 5)
+        for _ in range(3):
+            child.undo()
+        grandchild = child.fork()
+        grandchild.seek(0)
+        self.assertEqual((model.position_hash, model.history_length, model.player_b.capture_count), before)
+        self.assertEqual(model.chain_at(Position(1, 0)).liberties, {(0, 0), (2, 0), (1, 1)})
+        self.assertEqual(child.chain_at(Position(1, 0)).liberties, {(0, 0), (2, 0)})
+        self.assertIsNotNone(child.piece_at(Position(1, 1)))
+        self.assertIs(child.current_player, child.player_b)
+        self.assertEqual(grandchild.empty_count, 36)
+        for game in (model, child, grandchild):
+            game.check_consistency()
+
+class BoardGeometryTest(unittest.TestCase):
+    def test_tables_match_board_edges(self): #55
+        board_geometry = geometry(9)
+        self.assertIs(geometry(9), board_geometry)
+        self.assertEqual(board_geometry.adjacent[0][0], ((0, 1), (1, 0)))
+        self.assertEqual(board_geometry.neighbor_points[board_geometry.point(4, 4)], (39, 41, 31, 49))
+        self.assertEqual([board_geometry.kinds.count(kind) for kind in (CORNER, EDGE, CENTER)], [4, 28, 49])
+        self.assertEqual(neighbor_table(1, 3)[0][1], ((0, 0), (0, 2)))
+        with self.assertRaises(ValueError):
+            geometry(7)
+
+class BitBoardTest(unittest.TestCase):
+    def test_play_captures_and_sets_ko(self): #22
+        bits = BitBoard(6)
+        for (row, col), color in (((1, 0), PlayerColors.BLACK), ((0, 1), PlayerColors.BLACK), ((2, 1), PlayerColors.BLACK),
+                                  ((0, 2), PlayerColors.WHITE), ((2, 2), PlayerColors.WHITE), ((1, 3), PlayerColors.WHITE),
+                                  ((1, 1), PlayerColors.WHITE)):
+            bits.set(row, col, color)
+        captured = bits.play(bits.point(1, 2), PlayerColors.BLACK)
+        self.assertEqual(captured, 1 << bits.point(1, 1))
+        self.assertEqual(bits.ko, bits.point(1, 1))
+        self.assertFalse(bits.is_legal(bits.point(1, 1), PlayerColors.WHITE))
+    def test_illegal_play_raises(self): #23
+        bits = BitBoard(6)
+        bits.set(0, 1, PlayerColors.BLACK)
+        bits.set(1, 0, PlayerColors.BLACK)
+        with self.assertRaises(ValueError):
+            bits.play(bits.point(0, 0), PlayerColors.WHITE)
+    def test_matches_model_during_random_game(self): #24
+        rng = random.Random(7)
+        model = GoModel(9, 9)
+        for _ in range(120):
+            piece = GamePiece(model.current_player.player_color)
+            bits = model.to_bitboard()
+            legal = bits.legal_moves(piece.color)
+            expected = [(r, c) for r in range(9) for c in range(9) if model.is_valid_placement(Position(r, c), piece)]
+            self.assertEqual(expected, [(r, c) for r in range(9) for c in range(9) if legal >> bits.point(r, c) & 1])
+            if not expected:
+                break
+            play(model, *rng.choice(expected))
+            bits = model.to_bitboard()
+            self.assertEqual(bits.position_hash, model.position_hash)
+            self.assertEqual(str(bits), '\n'.join(''.join('.' if p is None else p.color.name[0] for p in row) for row in model.board))
+    def test_unconditional_life(self): #65
+        model = GoModel(6, 6)
+        for row, line in enumerate(('.B.B.W', 'BBBBWW', 'W.WBW.', 'BBBBWW', '......', '......')):
+            for col, char in enumerate(line):
+                if char != '.':
+                    model.set_piece(Position(row, col), stone(PlayerColors.BLACK if char == 'B' else PlayerColors.WHITE))
+        bits = model.to_bitboard()
+        alive, regions = bits.unconditional_life(PlayerColors.BLACK)
+        self.assertEqual(alive, bits.stones[0])
+        self.assertEqual(regions, sum(1 << bits.point(row, col) for row, col in ((0, 0), (0, 2), (2, 0), (2, 1), (2, 2))))
+        # White's stones have one eye between them, so nothing of white's is settled
+        self.assertEqual(bits.unconditional_life(PlayerColors.WHITE), (0, 0))
+        self.assertEqual(model.settled_areas(), (alive | regions, 0))
+        # The two white stones inside black's area are dead without being marked
+        self.assertEqual(model.calculate_score(0), [11 + 5 + 2, 6 + 1])
+        self.assertEqual(model.stone_counts, (11, 8))
+
+class BatchGoModelTest(unittest.TestCase):
+    def test_matches_bitboards_during_random_games(self): #31
+        rng = random.Random(3)
+        batch = BatchGoModel(8, 6)
+        boards = [BitBoard(6) for _ in range(8)]
+        for _ in range(60):
+            color = batch.current_color
+            self.assertEqual(batch.legal_moves(), [bits.legal_moves(color) if bits.empty() else 0 for bits in boards])
+            moves = batch.random_moves(rng)
+            batch.step(moves)
+            for bits, move in zip(boards, moves):
+                if move is None:
+                    bits.ko = -1
+                else:
+                    bits.play(bits.point(*move), color)
+            for game, bits in enumerate(boards):
+                self.assertEqual(batch.board(game), bits)
+    def test_illegal_move_raises(self): #32
+        batch = BatchGoModel(2, 6)
+        batch.step([(0, 0), None])
+        with self.assertRaises(ValueError):
+            batch.step([(0, 0), None])
+    def test_scores_match_model(self): #33
+        batch = BatchGoModel(1, 6)
+        model = GoModel()
+        for _ in range(6):
+            batch.step([(batch.moves_played // 2, 2 + batch.moves_played % 2)])
+            batch.step([(batch.moves_played // 2, 2 + batch.moves_played % 2)])
+        for row in range(6):
+            model.set_piece(Position(row, 2), GamePiece(PlayerColors.BLACK))
+            model.set_piece(Position(row, 3), GamePiece(PlayerColors.WHITE))
+        self.assertEqual(batch.calculate_scores(), [model.calculate_score()])
+    def test_scorers_agree_on_settled_dead_stones(self): #67
+        # Black lives with two eyes around two dead white stones, which only count as captured if they are found dead
+        black = [(0, 1), (0, 3), (1, 0), (1, 1), (1, 2), (1, 3), (2, 3), (3, 0), (3, 1), (3, 2), (3, 3)]
+        white = [(0, 5), (1, 4), (1, 5), (2, 0), (2, 2), (2, 4), (3, 4), (3, 5)]
+        batch = BatchGoModel(1, 6)
+        model = GoModel()
+        for index, move in enumerate(black):
+            batch.step([move])
+            batch.step([white[index] if index < len(white) else None])
+        for (row, col), color in [(move, PlayerColors.BLACK) for move in black] + [(move, PlayerColors.WHITE) for move in white]:
+            model.set_piece(Position(row, col), GamePiece(color))
+        # Counting the dead stones as white's would give white the win by 1 with a komi of 5
+        self.assertEqual(model.calculate_score(5), [18, 12])
+        self.assertEqual(batch.calculate_scores(5), [[18, 12]])
+        self.assertEqual(_winner(model.to_bitboard(), [0, 0], 5), PlayerColors.BLACK.value)
+
+class SelfPlayTest(unittest.TestCase):
+    def test_games_are_reproducible(self): #34
+        first = play_game(3, 6, random_strategy, random_strategy, seed=5)
+        second = play_game(3, 6, random_strategy, random_strategy, seed=5)
+        self.assertEqual(first, second)
+        self.assertEqual(first['length'], len(first['moves']))
+    def test_run_games_in_order(self): #35
+        results = list(run_games(5, size=6, workers=1, chunk_size=2, seed=1))
+        self.assertEqual([result['game'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual(results[2], play_game(2, 6, random_strategy, random_strategy, seed=1))
+    def test_strategy_objects(self): #68
+        class Occupied:
+            def __call__(self, model, rng):
+                return Position(0, 0)
+        with self.assertRaisesRegex(ValueError, 'Strategy Occupied returned an invalid placement'):
+            play_game(0, 6, Occupied(), Occupied())
+        self.assertIsNot(load_strategy('mcts'), load_strategy('mcts'))
+        self.assertIs(load_strategy('random'), random_strategy)
+    def test_closing_a_run_early_returns_promptly(self): #73
+        games = run_games(400, size=9, workers=2, chunk_size=10)
+        self.assertEqual(next(games)['game'], 0)
+        start = time.perf_counter()
+        games.close()
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual([result['game'] for result in run_games(9, size=6, workers=2, chunk_size=2)], list(range(9)))
+
+class MCTSPlayerTest(unittest.TestCase):
+    def test_table_evicts_least_recently_used(self): #36
+        table = TranspositionTable(2)
+        table.put('a', SearchNode([PASS]))
+        table.put('b', SearchNode([PASS]))
+        table.get('a')
+        table.put('c', SearchNode([PASS]))
+        self.assertEqual(len(table), 2)
+        self.assertIsNone(table.get('b'))
+        self.assertIsNotNone(table.get('a'))
+    def test_chooses_valid_move_within_budget(self): #37
+        model = GoModel()
+        play(model, 2, 2)
+        player = MCTSPlayer(playouts=50, seed=1)
+        pos = player.choose_move(model)
+        self.assertTrue(model.is_valid_placement(pos, GamePiece(PlayerColors.WHITE)))
+        self.assertEqual(player.last_playouts, 50)
+        self.assertEqual(model.history_length, 1)
+    def test_same_seed_same_move(self): #38
+        model = GoModel()
+        first = MCTSPlayer(playouts=40, seed=7).choose_move(model)
+        second = MCTSPlayer(playouts=40, seed=7).choose_move(model)
+        self.assertEqual((first.row, first.col), (second.row, second.col))
+
+class SgfTest(unittest.TestCase):
+    def test_reads_main_line_of_each_game(self): #41
+        text = '(;GM[1]SZ[9]KM[5.5]C[a \\] b];B[cc](;W[dd];B[])(;W[ee]))\n(;SZ[6]AB[aa:ab];W[bb])'
+        games = list(read_games(io.StringIO(text), chunk_size=5))
+        self.assertEqual(len(games), 2)
+        self.assertEqual(games[0].properties['C'], ['a ] b'])
+        self.assertEqual((games[0].size, games[0].komi), (9, 5.5))
+        self.assertEqual(games[0].moves, [(PlayerColors.BLACK, (2, 2)), (PlayerColors.WHITE, (3, 3)), (PlayerColors.BLACK, None)])
+        self.assertEqual(games[1].setup, [(PlayerColors.BLACK, (0, 0)), (PlayerColors.BLACK, (1, 0))])
+    def test_write_and_replay_round_trip(self): #42
+        model = GoModel()
+        setup_ko(model)
+        model.pass_turn()
+        game = next(read_games(io.StringIO(write_game(model))))
+        replayed = replay(game)
+        self.assertEqual(replayed.position_hash, model.position_hash)
+        self.assertEqual(replayed.calculate_score(), model.calculate_score())
+        self.assertIs(replayed.current_player, replayed.player_b)
+    def test_replay_rejects_illegal_move(self): #43
+        game = next(read_games(io.StringIO('(;SZ[6];B[aa];W[aa])')))
+        with self.assertRaises(ValueError):
+            replay(game)
+    def test_setup_stones_are_not_moves(self): #70
+        game = next(read_games(io.StringIO('(;SZ[9]AB[aa][bb]AW[cc];W[dd])')))
+        model = replay(game)
+        self.assertEqual(model.history_length, 1)
+        text = write_game(model)
+        self.assertIn('AB[aa][bb]AW[cc]PL[W];W[dd]', text)
+        self.assertEqual(next(read_games(io.StringIO(text))).setup, game.setup)
+        model.undo()
+        self.assertEqual(model.history_length, 0)
+        self.assertEqual(model.stone_counts, (2, 1))
+        bits = BitBoard(9)
+        bits.set(2, 2, PlayerColors.BLACK)
+        model.restore_position(bits, PlayerColors.WHITE)
+        text = write_game(model)
+        self.assertIn('AB[cc]PL[W])', text)
+        self.assertIs(replay(next(read_games(io.StringIO(text)))).current_player.player_color, PlayerColors.WHITE)
+
+class BenchmarkTest(unittest.TestCase):
+    def test_runs_every_case_on_a_size(self): #44
+        results = run_benchmarks(sizes=(6,), repeat=1)
+        self.assertIn('snake_capture/6', results)
+        self.assertTrue(all(microseconds > 0 for microseconds in results.values()))
+    def test_compare_finds_regressions(self): #45
+        regressions = compare({'a/9': 1.5, 'b/9': 1.1, 'c/9': 9.0}, {'a/9': 1.0, 'b/9': 1.0}, threshold=0.2)
+        self.assertEqual(regressions, [('a/9', 1.0, 1.5)])
+    def test_measures_memory_per_operation(self): #54
+        memory = measure_memory(sizes=(6,), names=['play_move', 'is_valid_placement'])
+        self.assertEqual(memory['is_valid_placement/6']['retained'], 0)
+        self.assertGreater(memory['play_move/6']['peak'], 0)
+
+class GoServerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_commands(self): #48
+        server = GoServer()
+        session = (await server.handle({'id': 1, 'cmd': 'new', 'size': 6}))['session']
+        reply = await server.handle({'id': 2, 'cmd': 'place', 'session': session, 'row': 2, 'col': 3})
+        self.assertTrue(reply['ok'])
+        self.assertEqual(reply['id'], 2)
+        self.assertEqual(reply['board'][2], '...B..')
+        self.assertEqual(reply['to_move'], 'WHITE')
+        self.assertFalse((await server.handle({'cmd': 'place', 'session': session, 'row': 2, 'col': 3}))['ok'])
+        self.assertEqual(len((await server.handle({'cmd': 'legal', 'session': session}))['legal']), 35)
+        self.assertEqual((await server.handle({'cmd': 'undo', 'session': session}))['moves'], 0)
+        self.assertEqual((await server.handle({'cmd': 'seek', 'session': session, 'move': 1}))['board'][2], '...B..')
+        self.assertEqual((await server.handle({'cmd': 'seek', 'session': session, 'move': 0}))['line'], 1)
+        self.assertEqual((await server.handle({'cmd': 'score', 'session': session, 'komi': 0}))['score'], [0, 0])
+        self.assertFalse((await server.handle({'cmd': 'undo', 'session': session}))['ok'])
+        await server.handle({'cmd': 'close', 'session': session})
+        self.assertFalse((await server.handle({'cmd': 'state', 'session': session}))['ok'])
+    async def test_idle_sessions_are_evicted(self): #49
+        server = GoServer(idle_timeout=10)
+        session = (await server.handle({'cmd': 'new'}))['session']
+        now = asyncio.get_running_loop().time()
+        self.assertEqual(server.evict_idle(now + 5), 0)
+        self.assertEqual(server.evict_idle(now + 11), 1)
+        self.assertNotIn(session, server.sessions)
+    async def test_load_generator_over_tcp(self): #50
+        server = GoServer()
+        ready = asyncio.Event()
+        task = asyncio.create_task(server.serve(port=0, ready=ready))
+        await ready.wait()
+        port = server.sockets[0].getsockname()[1]
+        report = await run_load(clients=4, moves=10, size=6, port=port)
+        task.cancel()
+        self.assertEqual(report['requests'], 4 * (2 + 2 * 10))
+        self.assertGreater(report['requests_per_second'], 0)
+    async def test_long_line_and_close_while_busy(self): #71
+        server = GoServer()
+        ready = asyncio.Event()
+        task = asyncio.create_task(server.serve(port=0, ready=ready))
+        await ready.wait()
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+        writer.write(b'{"cmd": "' + b'x' * 100_000 + b'"}\n')
+        reply = json.loads(await reader.readline())
+        self.assertFalse(reply['ok'])
+        self.assertEqual(await reader.read(), b'')
+        writer.close()
+        task.cancel()
+        session = (await server.handle({'cmd': 'new'}))['session']
+        async with server.sessions[session].lock:
+            closing = asyncio.create_task(server.handle({'cmd': 'close', 'session': session}))
+            await asyncio.sleep(0)
+            self.assertIn(session, server.sessions)
+        self.assertTrue((await closing)['ok'])
+        self.assertNotIn(session, server.sessions)
+
+class PositionCodecTest(unittest.TestCase):
+    def test_round_trip_keeps_ko(self): #51
+        model = GoModel()
+        setup_ko(model)
+        data = encode(model)
+        self.assertEqual(len(data), record_size(6))
+        decoded = decode(data)
+        self.assertEqual(decoded.position_hash, model.position_hash)
+        self.assertIs(decoded.current_player, decoded.player_w)
+        self.assertEqual(decoded.player_b.capture_count, model.player_b.capture_count)
+        self.assertEqual(decoded.legal_moves(), model.legal_moves())
+        self.assertEqual(encode(decoded), data)
+    def test_rejects_bad_header_and_padding(self): #74
+        empty = bytes(record_size(9) - HEADER.size)
+        for data in (HEADER.pack(9, 0, 0, 0, 200) + empty, HEADER.pack(9, 8, 0, 0, NO_KO) + empty,
+                     HEADER.pack(9, 0, 0, 0, NO_KO) + empty[:-1] + b'\x80',
+                     HEADER.pack(9, 0, 0, 0, 0) + b'\x01' + empty[1:]):
+            with self.assertRaises(ValueError):
+                decode(data)
+        self.assertEqual(decode(HEADER.pack(9, 0, 0, 0, NO_KO) + empty).stone_counts, (0, 0))
+    def test_archive_random_access(self): #52
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'games.goa')
+            games = [play_game(0, size, random_strategy, random_strategy, seed=seed)['moves'] for seed, size in ((1, 6), (2, 9))]
+            expected = []
+            with GameArchive(path) as archive:
+                for moves, size in zip(games, (6, 9)):
+                    model = GoModel(size, size)
+                    positions = [encode(model)]
+                    for move in moves:
+                        if move is None:
+                            model.pass_turn()
+                        else:
+                            model.set_piece(Position(*move), GamePiece(model.current_player.player_color))
+                            model.capture()
+                            model.set_next_player()
+                        positions.append(encode(model))
+                    expected.append(positions)
+                    archive.append_game(positions)
+            with GameArchive(path) as archive:
+                self.assertEqual(len(archive), 2)
+                self.assertEqual(archive.game_length(1), len(expected[1]))
+                self.assertEqual(bytes(archive.position(1, 7)), expected[1][7])
+                self.assertEqual(encode(archive.decode(0, 5)), expected[0][5])
+                with self.assertRaises(IndexError):
+                    archive.position(0, len(expected[0]))
+    def test_position_archive_stores_symmetric_positions_once(self): #60
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'positions.gop')
+            models = []
+            for transform in TRANSFORMS:
+                model = GoModel()
+                for row, col in ((0, 1), (2, 3), (4, 4)):
+                    play(model, *transform_point(transform, row, col, 6))
+                models.append(model)
+            with PositionArchive(path, 6) as archive:
+                results = [archive.add(model) for model in models]
+                self.assertEqual([added for _, _, added in results], [True] + [False] * 7)
+                self.assertEqual(len(archive), 1)
+            with PositionArchive(path) as archive:
+                number, transform = archive.find(models[5])
+                stored = archive.decode(number)
+                row, col = transform_point(transform, *transform_point(5, 2, 3, 6), 6)
+                self.assertEqual(stored.board[row][col], GamePiece(PlayerColors.WHITE))
+                with self.assertRaises(ValueError):
+                    PositionArchive(path, 9)
+
+class SymmetryTest(unittest.TestCase):
+    def test_every_orientation_has_the_same_canonical_form(self): #59
+        model = GoModel(9, 9)
+        setup_ko(model)
+        bits = model.to_bitboard()
+        self.assertGreaterEqual(bits.ko, 0)
+        canonical, transform = canonical_form(bits)
+        for other in TRANSFORMS:
+            turned = transform_bitboard(bits, other)
+            self.assertEqual(turned.get(*transform_point(other, 1, 2, 9)), PlayerColors.BLACK)
+            same, _ = canonical_form(turned)
+            self.assertEqual((same.stones, same.ko, same.position_hash), (canonical.stones, canonical.ko, canonical.position_hash))
+            back = transform_bitboard(turned, inverse(other))
+            self.assertEqual(back.position_hash, bits.position_hash)
+        self.assertEqual(model.canonical_hash(), (canonical.position_hash, transform))
+
+class EvalCacheTest(unittest.TestCase):
+    def test_counts_hits_misses_and_evictions(self): #57
+        cache = EvalCache(capacity=2)
+        first, second = GoModel(), GoModel()
+        for row, col in ((0, 0), (5, 5), (1, 1)):
+            play(first, row, col)
+        for row, col in ((1, 1), (5, 5), (0, 0)):
+            play(second, row, col)
+        self.assertEqual(cache.score(first, 0.5), first.calculate_score(0.5))
+        self.assertEqual(cache.score(second, 0.5), first.calculate_score(0.5))
+        calls = []
+        cache.register('liberties', lambda model: calls.append(1) or len(model.occupied))
+        cache.evaluate('liberties', first)
+        cache.evaluate('liberties', second)
+        cache.score(first, 6.5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (2, 3, 1))
+        with self.assertRaises(ValueError):
+            cache.register('liberties', len)
+    def test_symmetric_cache_shares_turned_positions(self): #61
+        cache = EvalCache(symmetric=True)
+        for transform in TRANSFORMS:
+            model = GoModel()
+            for row, col in ((0, 1), (2, 3)):
+                play(model, *transform_point(transform, row, col, 6))
+            self.assertEqual(cache.score(model), model.calculate_score())
+        self.assertEqual((cache.hits, cache.misses), (7, 1))
+    def test_saves_and_loads(self): #58
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'scores.cache')
+            model = GoModel()
+            setup_ko(model)
+            cache = EvalCache(path=path)
+            cache.score(model)
+            cache.save()
+            loaded = EvalCache(path=path)
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded.score(model), model.calculate_score())
+            self.assertEqual(loaded.stats()['hits'], 1)
+
+class OwnershipTest(unittest.TestCase):
+    def test_invaders_are_dead(self): #64
+        model = GoModel(9, 9)
+        for row in range(9):
+            model.set_piece(Position(row, 3), stone(PlayerColors.BLACK))
+            model.set_piece(Position(row, 5), stone(PlayerColors.WHITE))
+        model.set_piece(Position(2, 1), stone(PlayerColors.WHITE))
+        model.set_piece(Position(6, 7), stone(PlayerColors.BLACK))
+        model.pass_turn()
+        model.pass_turn()
+        for workers in (1, 2):
+            estimator = OwnershipEstimator(playouts=60, workers=workers, seed=3)
+            ownership = estimator.estimate(model)
+            estimator.close()
+            self.assertEqual(ownership.playouts, 60)
+            self.assertEqual(ownership.dead_stones, {(2, 1), (6, 7)})
+            self.assertEqual(ownership.owner(4, 3), PlayerColors.BLACK)
+            self.assertLess(ownership.ownership(4, 5), 0)
+        self.assertEqual(model.calculate_score(0, ownership.dead_stones), [27 + 9 + 1, 27 + 9 + 1])
+        self.assertEqual(model.stone_counts, (10, 10))
+        self.assertEqual(OwnershipEstimator(time_budget=0).estimate(model).dead_stones, set())
+
+class SolverTest(unittest.TestCase):
+    def test_plays_out_solution_and_keeps_it(self): #66
+        model = GoModel()
+        for move in play_game(0, 6, random_strategy, random_strategy, seed=2035)['moves'][:-8]:
+            if move is None:
+                model.pass_turn()
+            else:
+                play(model, *move)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'solutions.pickle')
+            player = SolverPlayer(path=path)
+            player.choose_move(model)
+            solution = player.last_solution
+            self.assertTrue(solution.exact)
+            self.assertEqual((solution.move.row, solution.move.col), (3, 5))
+            # Both sides playing the solver's moves reach the margin it promised
+            game = model.fork()
+            while not game.is_game_over():
+                player.play_turn(game)
+            black, white = game.calculate_score(player.solver.komi)
+            self.assertEqual(black - white, solution.margin)
+            player.close()
+
+            # A later run answers from the saved table without searching
+            again = SolverPlayer(path=path)
+            again.choose_move(model)
+            self.assertEqual(again.last_solution.nodes, 0)
+            self.assertEqual(again.last_solution.margin, solution.margin)
+            self.assertEqual((again.last_solution.move.row, again.last_solution.move.col), (3, 5))
+    def test_ko_results_are_not_saved_as_solved(self): #69
+        model = GoModel()
+        for move in play_game(0, 6, random_strategy, random_strategy, seed=2047)['moves'][:-10]:
+            if move is None:
+                model.pass_turn()
+            else:
+                play(model, *move)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'solutions.pickle')
+            player = SolverPlayer(path=path)
+            player.choose_move(model)
+            solution = player.last_solution
+            # A ko cut some lines short, so the position's value depends on the line and only part of it is saved
+            self.assertTrue(solution.exact)
+            self.assertTrue(solution.repeated)
+            player.close()
+            self.assertLess(SolutionTable(path=path).solved_count(), len(player.solver.table))
+
+            again = SolverPlayer(path=path)
+            again.choose_move(model)
+            fresh = SolverPlayer()
+            fresh.choose_move(model)
+            # The saved positions save work without changing the answer a search from scratch gives
+            self.assertGreater(again.last_solution.nodes, 0)
+            self.assertLess(again.last_solution.nodes, fresh.last_solution.nodes)
+            for result in (again.last_solution, fresh.last_solution):
+                self.assertEqual(result.margin, solution.margin)
+                self.assertEqual((result.move.row, result.move.col), (solution.move.row, solution.move.col))
+
+@unittest.skipIf(importlib.util.find_spec('pygame') is None or importlib.util.find_spec('pygame_gui') is None,
+                 'pygame and pygame_gui are needed for the window')
+class GuiTest(unittest.TestCase):
+    def test_click_and_quit_without_a_display(self): #72
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame as pg
+        from go_gui_view import GUI, CELL_SIZE
+        window = GUI()
+        click = (window.board_x_offset + CELL_SIZE // 2, window.board_y_offset + CELL_SIZE // 2)
+        self.assertEqual((window.get_board_position(click).row, window.get_board_position(click).col), (0, 0))
+        pg.event.post(pg.event.Event(pg.MOUSEBUTTONDOWN, pos=click, button=1))
+        pg.event.post(pg.event.Event(pg.QUIT))
+        window.run_game()
+        self.assertEqual(tuple(window._screen.get_at(click))[:3], (0, 0, 0))
+        pg.quit()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,326 @@
+"""
+Title: BatchGoModel Class
+Purpose: Plays many games of the same size side by side, packing every board into one pair of bitmasks so captures and legal moves are worked out for all games at once
+"""
+import random
+from bit_board import BitBoard, iter_points, choose_point
+from go_model import VALID_BOARD_LENGTHS
+from player_colors import PlayerColors
+
+class BatchGoModel:
+    """
+    Represents a batch of games that are all played in step: every game moves (or passes) on each step and black
+    always moves on the even steps. The rules match GoModel: captures, no suicide and simple ko.
+
+    Every board is laid out like a BitBoard (size + 1 bits per row) followed by at least one empty guard row, padded
+    to a whole number of bytes, and the boards are stacked end to end in one int per color. A shift by one bit or one
+    row therefore never moves a stone onto a neighboring board, so neighbor, flood fill and capture masks are computed
+    for the whole batch with a few big integer operations. Splitting a packed mask back into boards goes through
+    bytes, so it costs the same for one game as for all of them.
+
+    Attributes:
+        count(int): the number of games in the batch
+        size(int): the number of rows (and columns) in each board
+        stride(int): the number of bits per row
+        slot_bits(int): the number of bits each board takes, including its guard row and padding
+        mask(int): a mask with a bit set for every point of every board
+        stones(list[int]): the packed black and white bitmasks, indexed by PlayerColors value
+        ko(int): the packed mask of ko points for the next move
+        current_color(PlayerColors): the color to move in every game
+        consecutive_passes(list[int]): the number of consecutive passes in each game
+        capture_counts(list[list[int]]): [black, white] captured pieces for each game
+        moves_played(int): the number of steps taken
+    Methods:
+        is_game_over(): returns True if a game has ended
+        active_games(): returns the indexes of the games still being played
+        board(): returns one game as a BitBoard
+        piece_at(): returns the color of the stone at a point of one game
+        legal_mask(): returns the packed mask of legal points for the color to move
+        legal_moves(): returns the legal points of each game as a BitBoard style mask
+        step(): plays one move or pass in every game
+        random_moves(): picks a random legal move for every game
+        calculate_scores(): scores every game
+    """
+    def __init__(self, count: int, size: int = 9):
+        """
+        Initializes a batch of empty boards with black to move
+
+        Args:
+            count(int): the number of games in the batch
+            size(int): the number of rows (and columns) in each board
+        Raises:
+            TypeError: if count or size is not an int
+            ValueError: if count is less than 1 or size is not a valid board length
+        """
+        if not isinstance(count, int) or not isinstance(size, int):
+            raise TypeError('Count and size must be of type int.')
+        if count < 1:
+            raise ValueError('Count must be at least 1.')
+        if size not in VALID_BOARD_LENGTHS:
+            raise ValueError(f"Size must be one of {VALID_BOARD_LENGTHS}.")
+
+        self.count = count
+        self.size = size
+        self.stride = size + 1
+        self.__slot_bytes = ((size + 1) * self.stride + 7) // 8
+        self.slot_bits = self.__slot_bytes * 8
+        self.__board_mask = BitBoard(size).mask
+        self.mask = self.__pack([self.__board_mask] * count)
+
+        self.stones = [0, 0]
+        self.ko = 0
+        self.current_color = PlayerColors.BLACK
+        self.consecutive_passes = [0] * count
+        self.capture_counts = [[0, 0] for _ in range(count)]
+        self.moves_played = 0
+
+        # Legal moves only change when a step is taken
+        self.__legal = None
+
+        # Reused to check the few points that need a per board look
+        self.__scratch = BitBoard(size)
+
+    def __neighbors(self, points: int) -> int:
+        """
+        Returns the packed mask of points next to any point in a packed mask
+        """
+        stride = self.stride
+        return ((points << 1) | (points >> 1) | (points << stride) | (points >> stride)) & self.mask
+
+    def __flood(self, seed: int, within: int) -> int:
+        """
+        Returns every point of a packed mask connected to a seed through that mask, in every board at once
+        """
+        stride = self.stride
+        filled = seed & within
+        while True:
+            grown = (filled | (filled << 1) | (filled >> 1) | (filled << stride) | (filled >> stride)) & within
+            if grown == filled:
+                return filled
+            filled = grown
+
+    def __slice(self, packed: int, game: int) -> int:
+        """
+        Returns one game's part of a packed mask as a BitBoard style mask
+        """
+        return (packed >> (game * self.slot_bits)) & self.__board_mask
+
+    def __slices(self, packed: int) -> list:
+        """
+        Splits a packed mask into one BitBoard style mask per game
+        """
+        slot_bytes = self.__slot_bytes
+        data = packed.to_bytes(slot_bytes * self.count, 'little')
+        return [int.from_bytes(data[start:start + slot_bytes], 'little') for start in range(0, len(data), slot_bytes)]
+
+    def __pack(self, masks: list) -> int:
+        """
+        Joins one BitBoard style mask per game into a packed mask
+        """
+        slot_bytes = self.__slot_bytes
+        return int.from_bytes(b''.join(mask.to_bytes(slot_bytes, 'little') for mask in masks), 'little')
+
+    def is_game_over(self, game: int) -> bool:
+        """
+        Returns True if a game has ended because both players passed or the board is full
+
+        Args:
+            game(int): the index of the game
+        """
+        if self.consecutive_passes[game] >= 2:
+            return True
+        return self.__slice(self.mask & ~(self.stones[0] | self.stones[1]), game) == 0
+
+    def active_games(self) -> list:
+        """
+        Returns the indexes of the games that haven't ended
+        """
+        empty_slices = self.__slices(self.mask & ~(self.stones[0] | self.stones[1]))
+        return [game for game in range(self.count) if self.consecutive_passes[game] < 2 and empty_slices[game]]
+
+    def board(self, game: int) -> BitBoard:
+        """
+        Returns one game as an independent BitBoard
+
+        Args:
+            game(int): the index of the game
+        """
+        bits = BitBoard(self.size)
+        for row in range(self.size):
+            for col in range(self.size):
+                color = self.piece_at(game, row, col)
+                if color is not None:
+                    bits.set(row, col, color)
+        ko = self.__slice(self.ko, game)
+        bits.ko = ko.bit_length() - 1 if ko else -1
+        return bits
+
+    def piece_at(self, game: int, row: int, col: int) -> PlayerColors | None:
+        """
+        Returns the color of the stone at a point of one game, or None if it is empty
+
+        Args:
+            game(int): the index of the game
+            row(int): the row of the point
+            col(int): the column of the point
+        """
+        bit = 1 << (game * self.slot_bits + row * self.stride + col)
+        if self.stones[0] & bit:
+            return PlayerColors.BLACK
+        if self.stones[1] & bit:
+            return PlayerColors.WHITE
+        return None
+
+    def legal_mask(self) -> int:
+        """
+        Returns the packed mask of points the color to move may play at in every game
+        """
+        if self.__legal is not None:
+            return self.__legal
+
+        color = self.current_color
+        empty = self.mask & ~(self.stones[0] | self.stones[1])
+
+        # A point next to an empty point is always legal, which covers almost every point in every game at once
+        legal = empty & self.__neighbors(empty)
+        surrounded = empty & ~legal
+
+        # So is a point next to a friendly chain with two liberties elsewhere, which is found for every chain at once
+        # by starting from the stones that touch two empty points themselves
+        if surrounded:
+            stride = self.stride
+            left, right, up, down = empty << 1, empty >> 1, empty << stride, empty >> stride
+            two_liberties = (left & (right | up | down)) | (right & (up | down)) | (up & down)
+            own = self.stones[color.value]
+            safe = surrounded & self.__neighbors(self.__flood(own & two_liberties, own))
+            legal |= safe
+            surrounded &= ~safe
+
+        # Whether the rest are suicide depends on the chains around them
+        legal_slices = self.__slices(legal)
+        if surrounded:
+            scratch = self.__scratch
+            scratch.ko = -1
+            black_slices = self.__slices(self.stones[0])
+            white_slices = self.__slices(self.stones[1])
+            for game, game_surrounded in enumerate(self.__slices(surrounded)):
+                if not game_surrounded:
+                    continue
+                scratch.stones = [black_slices[game], white_slices[game]]
+                for point in iter_points(game_surrounded):
+                    if scratch.is_legal(point, color):
+                        legal_slices[game] |= 1 << point
+
+        # Nothing can be played in a finished game
+        empty_slices = self.__slices(empty)
+        for game in range(self.count):
+            if self.consecutive_passes[game] >= 2 or not empty_slices[game]:
+                legal_slices[game] = 0
+
+        self.__legal = self.__pack(legal_slices) & ~self.ko
+        return self.__legal
+
+    def legal_moves(self) -> list:
+        """
+        Returns the legal points of each game for the color to move, as BitBoard style masks
+        """
+        return self.__slices(self.legal_mask())
+
+    def step(self, moves: list):
+        """
+        Plays one move in every game for the color to move, then removes captured chains in all games at once
+
+        Args:
+            moves(list): one (row, col) tuple per game, or None to pass (finished games must pass)
+        Raises:
+            ValueError: if the number of moves doesn't match the number of games or a move is illegal
+        """
+        if len(moves) != self.count:
+            raise ValueError('There must be one move per game.')
+
+        legal_slices = self.__slices(self.legal_mask())
+        color = self.current_color.value
+        placed_slices = [0] * self.count
+        for game, move in enumerate(moves):
+            if move is None:
+                self.consecutive_passes[game] += 1
+                continue
+            row, col = move
+            if not (0 <= row < self.size) or not (0 <= col < self.size):
+                raise ValueError(f'Move {move} is off the board in game {game}.')
+            bit = 1 << (row * self.stride + col)
+            if not legal_slices[game] & bit:
+                raise ValueError(f'Move {move} is illegal in game {game}.')
+            placed_slices[game] = bit
+            self.consecutive_passes[game] = 0
+
+        own = self.stones[color] | self.__pack(placed_slices)
+        enemy = self.stones[1 - color]
+
+        # Every enemy chain had a liberty before this step, so any chain that has none now was captured by it
+        empty = self.mask & ~(own | enemy)
+        alive = self.__flood(enemy & self.__neighbors(empty), enemy)
+        captured = enemy & ~alive
+        self.stones[color] = own
+        self.stones[1 - color] = alive
+
+        self.ko = 0
+        if captured:
+            captured_slices = self.__slices(captured)
+            own_slices = self.__slices(own)
+            empty_slices = self.__slices(empty | captured)
+            ko_slices = [0] * self.count
+            scratch = self.__scratch
+            for game, game_captured in enumerate(captured_slices):
+                if not game_captured:
+                    continue
+                self.capture_counts[game][color] += game_captured.bit_count()
+
+                # Ko only happens when a lone stone captures exactly one stone and is left in atari
+                stone_neighbors = scratch.neighbors(placed_slices[game])
+                if game_captured & (game_captured - 1) == 0 and not stone_neighbors & own_slices[game]:
+                    if stone_neighbors & empty_slices[game] == game_captured:
+                        ko_slices[game] = game_captured
+            self.ko = self.__pack(ko_slices)
+
+        self.current_color = self.current_color.opponent()
+        self.moves_played += 1
+        self.__legal = None
+
+    def random_moves(self, rng: random.Random = random) -> list:
+        """
+        Picks a random legal move for every game, or None (a pass) when a game has no legal moves or has ended
+
+        Args:
+            rng(random.Random): the random number generator to use
+        """
+        moves = []
+        for game_legal in self.__slices(self.legal_mask()):
+            if not game_legal:
+                moves.append(None)
+                continue
+
+            moves.append(divmod(choose_point(game_legal, rng), self.stride))
+        return moves
+
+    def calculate_scores(self, komi: float = 6.5) -> list:
+        """
+        Scores every game the same way GoModel.calculate_score does: territory, stones on the board and captures, with
+        the stones in regions settled by the other color taken off as captured
+
+        Finding the settled regions takes Benson's algorithm on each board, so the games are scored one BitBoard at a
+        time through BitBoard.area().
+
+        Args:
+            komi(float): the points given to white for playing second
+        Returns:
+            A list of [black_score, white_score] per game
+        """
+        board = self.__scratch
+        scores = []
+        for game, stones in enumerate(zip(self.__slices(self.stones[0]), self.__slices(self.stones[1]))):
+            board.stones = list(stones)
+            black_area, white_area = board.area()
+            black_captures, white_captures = self.capture_counts[game]
+            scores.append([black_area + black_captures, white_area + white_captures + komi])
+        return scores
@@ -0,0 +1,425 @@
+"""
+Title: GoModel Benchmarks
+Purpose: Times the GoModel hot paths on every board size, writes the results as JSON and compares them against a saved baseline
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from game_piece import stone
+from go_model import GoModel, VALID_BOARD_LENGTHS
+from move_journal import MoveRecord
+from player_colors import PlayerColors
+from position import Position
+from self_play import play_game, random_strategy
+from solver import GoSolver
+
+
+def _game_moves(size: int) -> list:
+    """
+    Returns the moves of a fixed random game, the same on every run
+    """
+    return play_game(0, size, random_strategy, random_strategy, seed=2024)['moves']
+
+
+def _play(model: GoModel, move):
+    """
+    Makes a move (or a pass for None) the same way the GUI does
+    """
+    if move is None:
+        model.pass_turn()
+        return
+    model.set_piece(Position(*move), stone(model.current_player.player_color))
+    model.capture()
+    model.set_next_player()
+
+
+def _midgame(size: int) -> GoModel:
+    """
+    Returns a model part way through the fixed random game
+    """
+    model = GoModel(size, size)
+    for move in _game_moves(size)[:size * size // 2]:
+        _play(model, move)
+    return model
+
+
+def _snake(size: int) -> list:
+    """
+    Returns the points of one snake shaped chain that fills every other row and joins them at alternating ends
+    """
+    points = []
+    for row in range(0, size, 2):
+        points.extend((row, col) for col in range(size))
+        if row + 1 < size:
+            points.append((row + 1, size - 1 if row % 4 == 0 else 0))
+    return points
+
+
+# Each benchmark takes a board size and returns (setup, run, ops): setup() builds fresh state, run(state) is the timed
+# part and ops is the number of operations run() makes, so results are given per operation
+def bench_set_piece(size: int):
+    points = [Position(row, col) for row in range(size) for col in range(size)]
+    pieces = [stone(PlayerColors.BLACK if (row + col) % 2 else PlayerColors.WHITE) for row in range(size) for col in range(size)]
+
+    def run(model):
+        for pos, piece in zip(points, pieces):
+            model.set_piece(pos, piece)
+    return lambda: GoModel(size, size), run, len(points)
+
+
+def bench_record_board_state(size: int):
+    def setup():
+        model = GoModel(size, size)
+        return model, MoveRecord((0, 0), stone(PlayerColors.BLACK), None, model.current_player, 0, -1)
+
+    def run(state):
+        model, record = state
+        for _ in range(1000):
+            model.record_board_state(record)
+    return setup, run, 1000
+
+
+def bench_is_valid_placement(size: int):
+    points = [Position(row, col) for row in range(size) for col in range(size)]
+
+    def run(model):
+        piece = stone(model.current_player.player_color)
+        for pos in points:
+            model.is_valid_placement(pos, piece)
+    return lambda: _midgame(size), run, len(points)
+
+
+def bench_legal_moves(size: int):
+    moves = _game_moves(size)
+
+    def run(model):
+        for move in moves:
+            model.legal_moves()
+            _play(model, move)
+    return lambda: GoModel(size, size), run, len(moves)
+
+
+def bench_check_ko(size: int):
+    def run(model):
+        for potential_hash in range(1000):
+            model.check_ko(potential_hash)
+    return lambda: _midgame(size), run, 1000
+
+
+def bench_check_superko(size: int):
+    moves = _game_moves(size)
+
+    def setup():
+        model = GoModel(size, size, superko=True)
+        for move in moves:
+            _play(model, move)
+        return model
+
+    def run(model):
+        for potential_hash in range(1000):
+            model.check_ko(potential_hash)
+    return setup, run, 1000
+
+
+def bench_play_game_moves(size: int):
+    moves = _game_moves(size)
+
+    def run(model):
+        for move in moves:
+            _play(model, move)
+    return lambda: GoModel(size, size), run, len(moves)
+
+
+def bench_undo(size: int):
+    moves = _game_moves(size)
+
+    def setup():
+        model = GoModel(size, size)
+        for move in moves:
+            _play(model, move)
+        return model
+
+    def run(model):
+        for _ in moves:
+            model.undo()
+    return setup, run, len(moves)
+
+
+def bench_seek(size: int):
+    # Jumps between moves spread over the fixed random game, the way a review tool would
+    moves = _game_moves(size)
+    targets = [(index * 7919) % (len(moves) + 1) for index in range(50)]
+
+    def setup():
+        model = GoModel(size, size)
+        for move in moves:
+            _play(model, move)
+        return model
+
+    def run(model):
+        for target in targets:
+            model.seek(target)
+    return setup, run, len(targets)
+
+
+def bench_fork(size: int):
+    def run(model):
+        for _ in range(1000):
+            model.fork()
+    return lambda: _midgame(size), run, 1000
+
+
+def bench_is_game_over(size: int):
+    def run(model):
+        for _ in range(1000):
+            model.is_game_over()
+    return lambda: _midgame(size), run, 1000
+
+
+def bench_settled_areas(size: int):
+    def setup():
+        model = GoModel(size, size)
+        for move in _game_moves(size):
+            _play(model, move)
+        return model
+
+    def run(model):
+        for _ in range(100):
+            model.settled_areas()
+    return setup, run, 100
+
+
+def bench_solve(size: int):
+    # A fixed depth search of the fixed random game 8 moves before its end, with an empty table every time
+    def setup():
+        model = GoModel(size, size)
+        for move in _game_moves(size)[:-8]:
+            _play(model, move)
+        return model
+    return setup, lambda model: GoSolver(max_depth=4).solve(model), 1
+
+
+def bench_mass_capture(size: int):
+    # White fills the board but one corner, black takes the whole board with one stone
+    def setup():
+        model = GoModel(size, size)
+        for row in range(size):
+            for col in range(size):
+                if (row, col) != (size - 1, size - 1):
+                    model.set_piece(Position(row, col), stone(PlayerColors.WHITE))
+        return model
+
+    def run(model):
+        model.set_piece(Position(size - 1, size - 1), stone(PlayerColors.BLACK))
+        model.capture()
+    return setup, run, 1
+
+
+def bench_snake_build(size: int):
+    points = [Position(*point) for point in _snake(size)]
+    piece = stone(PlayerColors.BLACK)
+
+    def run(model):
+        for pos in points:
+            model.set_piece(pos, piece)
+    return lambda: GoModel(size, size), run, len(points)
+
+
+def bench_snake_valid_placement(size: int):
+    points = [Position(row, col) for row in range(size) for col in range(size)]
+
+    def setup():
+        model = GoModel(size, size)
+        for point in _snake(size):
+            model.set_piece(Position(*point), stone(PlayerColors.BLACK))
+        model.set_next_player()
+        return model
+
+    def run(model):
+        piece = stone(PlayerColors.WHITE)
+        for pos in points:
+            model.is_valid_placement(pos, piece)
+    return setup, run, len(points)
+
+
+def bench_snake_capture(size: int):
+    # White fills every liberty of the snake but one, then captures it by filling the last
+    def setup():
+        model = GoModel(size, size)
+        snake = set(_snake(size))
+        for point in snake:
+            model.set_piece(Position(*point), stone(PlayerColors.BLACK))
+        liberties = [(row, col) for row in range(size) for col in range(size) if (row, col) not in snake]
+        for point in liberties[:-1]:
+            model.set_piece(Position(*point), stone(PlayerColors.WHITE))
+        return model, Position(*liberties[-1])
+
+    def run(state):
+        model, last = state
+        model.set_piece(last, stone(PlayerColors.WHITE))
+        model.capture()
+    return setup, run, 1
+
+
+def bench_random_playout(size: int):
+    return lambda: None, lambda _: play_game(0, size, random_strategy, random_strategy, seed=2024), 1
+
+
+BENCHMARKS = {
+    'set_piece': bench_set_piece,
+    'record_board_state': bench_record_board_state,
+    'is_valid_placement': bench_is_valid_placement,
+    'legal_moves': bench_legal_moves,
+    'check_ko': bench_check_ko,
+    'check_superko': bench_check_superko,
+    'play_move': bench_play_game_moves,
+    'undo': bench_undo,
+    'seek': bench_seek,
+    'fork': bench_fork,
+    'is_game_over': bench_is_game_over,
+    'settled_areas': bench_settled_areas,
+    'solve': bench_solve,
+    'mass_capture': bench_mass_capture,
+    'snake_build': bench_snake_build,
+    'snake_valid_placement': bench_snake_valid_placement,
+    'snake_capture': bench_snake_capture,
+    'random_playout': bench_random_playout,
+}
+
+
+def run_benchmarks(sizes=VALID_BOARD_LENGTHS, names=None, repeat: int = 5) -> dict:
+    """
+    Runs benchmarks and returns the best time per operation of each
+
+    Args:
+        sizes: the board sizes to run every benchmark on
+        names: the names of the benchmarks to run, every benchmark by default
+        repeat(int): the number of times to run each benchmark, keeping the fastest
+    Raises:
+        ValueError: if a name is not a known benchmark or repeat is less than 1
+    Returns:
+        A dict mapping 'name/size' to the best number of microseconds per operation
+    """
+    names = list(BENCHMARKS) if names is None else list(names)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark {name!r}, use any of {sorted(BENCHMARKS)}.")
+    if repeat < 1:
+        raise ValueError('Repeat must be at least 1.')
+
+    results = {}
+    for size in sizes:
+        for name in names:
+            setup, run, ops = BENCHMARKS[name](size)
+            best = None
+            for _ in range(repeat):
+                state = setup()
+                start = time.perf_counter()
+                run(state)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[f'{name}/{size}'] = best / ops * 1e6
+    return results
+
+
+def measure_memory(sizes=VALID_BOARD_LENGTHS, names=None) -> dict:
+    """
+    Runs benchmarks once under tracemalloc and returns how much memory each operation allocates
+
+    Args:
+        sizes: the board sizes to run every benchmark on
+        names: the names of the benchmarks to run, every benchmark by default
+    Raises:
+        ValueError: if a name is not a known benchmark
+    Returns:
+        A dict mapping 'name/size' to {'retained': bytes still held per operation afterwards,
+        'peak': bytes at the highest point of the run per operation}
+    """
+    names = list(BENCHMARKS) if names is None else list(names)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark {name!r}, use any of {sorted(BENCHMARKS)}.")
+
+    results = {}
+    for size in sizes:
+        for name in names:
+            setup, run, ops = BENCHMARKS[name](size)
+            state = setup()
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                run(state)
+                after, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            results[f'{name}/{size}'] = {'retained': (after - before) / ops, 'peak': (peak - before) / ops}
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """
+    Finds the benchmarks that got slower than a baseline by more than a threshold
+
+    Args:
+        results(dict): the results from run_benchmarks()
+        baseline(dict): earlier results to compare against
+        threshold(float): how much slower a benchmark may get, as a fraction of the baseline time
+    Returns:
+        A list of (key, baseline microseconds, new microseconds) for each regression, worst first
+    """
+    regressions = []
+    for key, microseconds in results.items():
+        old = baseline.get(key)
+        if old and microseconds > old * (1 + threshold):
+            regressions.append((key, old, microseconds))
+    return sorted(regressions, key=lambda regression: regression[2] / regression[1], reverse=True)
+
+
+def main(argv: list = None) -> int:
+    """
+    Runs the benchmarks from the command line, writing JSON and returning 1 if anything regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the GoModel hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(VALID_BOARD_LENGTHS), choices=VALID_BOARD_LENGTHS,
+                        help='board sizes to benchmark')
+    parser.add_argument('--only', nargs='+', default=None, choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the fastest is kept')
+    parser.add_argument('--output', default='-', help='file to write the JSON results to (default: stdout)')
+    parser.add_argument('--baseline', default=None, help='JSON results from an earlier run to compare against')
+    parser.add_argument('--memory', action='store_true', help='also measure the bytes each operation allocates')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown against the baseline, 0.2 is 20%%')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.only, args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'unit': 'microseconds per operation',
+        'results': results,
+        'per_second': {key: 1e6 / microseconds for key, microseconds in results.items()},
+    }
+    if args.memory:
+        report['memory'] = measure_memory(args.sizes, args.only)
+    text = json.dumps(report, indent=2) + '\n'
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for key, old, new in regressions:
+        print(f'{key}: {old:.2f}us -> {new:.2f}us ({new / old - 1:+.0%})', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,553 @@
+"""
+Title: BitBoard Class
+Purpose: Stores a board as one integer bitmask per color so liberties, captures and flood fills become shifts, ANDs and ORs
+"""
+from player_colors import PlayerColors
+from zobrist import zobrist_table
+
+# Keys re-indexed by bit position, built once per board size
+_bit_keys: dict = {}
+
+# The XOR of the keys of every set bit of each possible byte of a mask, built once per board size
+_byte_keys: dict = {}
+
+
+def _keys_for(size: int) -> tuple:
+    """
+    Returns the Zobrist keys for a board size indexed by bit position instead of row * size + col
+
+    Args:
+        size(int): the number of rows (and columns) in the board
+    Returns:
+        A tuple with one list of keys per player color
+    """
+    keys = _bit_keys.get(size)
+    if keys is None:
+        table = zobrist_table(size, size)
+        stride = size + 1
+        keys = tuple([0] * (stride * size) for _ in PlayerColors)
+        for color_keys, color_table in zip(keys, table):
+            for row in range(size):
+                for col in range(size):
+                    color_keys[row * stride + col] = color_table[row * size + col]
+        _bit_keys[size] = keys
+    return keys
+
+
+def _byte_keys_for(size: int) -> tuple:
+    """
+    Returns tables for hashing a mask a byte at a time, so a whole board hashes in a few dozen lookups
+
+    Args:
+        size(int): the number of rows (and columns) in the board
+    Returns:
+        A tuple with one list per player color, holding a 256 entry table for each byte of a mask, where
+        table[byte] is the XOR of the keys of the bits set in that byte
+    """
+    tables = _byte_keys.get(size)
+    if tables is None:
+        keys = _keys_for(size)
+        length = (len(keys[0]) + 7) // 8
+        tables = tuple([] for _ in PlayerColors)
+        for color_keys, color_tables in zip(keys, tables):
+            color_keys = color_keys + [0] * (length * 8 - len(color_keys))
+            for byte_index in range(length):
+                table = [0] * 256
+                for byte in range(1, 256):
+                    # Each byte's keys are the keys of the byte without its lowest bit plus the key of that bit
+                    low = byte & -byte
+                    table[byte] = table[byte ^ low] ^ color_keys[byte_index * 8 + low.bit_length() - 1]
+                color_tables.append(table)
+        _byte_keys[size] = tables
+    return tables
+
+
+def iter_points(mask: int):
+    """
+    Yields the bit index of every set bit in a mask, lowest first
+
+    Args:
+        mask(int): the bitmask to walk
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def choose_point(mask: int, rng) -> int:
+    """
+    Returns the bit index of a randomly chosen set bit of a mask
+
+    Args:
+        mask(int): the bitmask to choose from, must not be 0
+        rng(random.Random): the random number generator to use
+    """
+    # Drop a random number of low bits instead of building a list of every point
+    for _ in range(rng.randrange(mask.bit_count())):
+        mask &= mask - 1
+    return (mask & -mask).bit_length() - 1
+
+
+class BitBoard:
+    """
+    Represents a square Go board as a pair of bitmasks
+
+    Each row takes size + 1 bits: one per column plus an always empty guard bit, so shifting a mask left or
+    right by one never wraps a stone onto the next row and shifting by a whole row never leaves the board.
+
+    Attributes:
+        size(int): the number of rows (and columns) in the board
+        stride(int): the number of bits per row
+        mask(int): a mask with a bit set for every point on the board
+        stones(list[int]): the black and white bitmasks, indexed by PlayerColors value
+        ko(int): the bit index of the point that can't be played because of ko, or -1
+        position_hash(int): the Zobrist hash of the stones, the same value GoModel.position_hash gives
+    Methods:
+        point(): returns the bit index of a (row, col)
+        coords(): returns the (row, col) of a bit index
+        get(): returns the color of the stone at a (row, col)
+        set(): puts or removes a stone without applying any rules
+        empty(): returns the mask of empty points
+        empty_count(): returns the number of empty points
+        neighbors(): returns the points next to any point in a mask
+        flood(): returns the points connected to a seed through a mask
+        chain(): returns the chain of stones containing a point
+        liberties(): returns the empty points next to a chain
+        is_legal(): returns True if a color may play at a point
+        playable(): returns the points of a mask a color may play at, leaving out ko
+        legal_moves(): returns the mask of points a color may play at
+        play(): plays a stone, removes captured chains and returns them
+        eye_points(): returns the empty points completely surrounded by one color
+        territory(): returns the empty points surrounded by each color
+        unconditional_life(): returns a color's chains that can't be captured and the regions they settle
+        settled(): returns the points each color owns whatever is played
+        area(): returns the points each color scores on the board
+        rehash(): works out position_hash again after the stones were changed directly
+        copy(): returns an independent copy of the board
+    """
+    def __init__(self, size: int):
+        """
+        Initializes an empty board
+
+        Args:
+            size(int): the number of rows (and columns) in the board
+        Raises:
+            TypeError: if size is not an int
+            ValueError: if size is less than 1
+        """
+        if not isinstance(size, int):
+            raise TypeError('Board size must be of type int.')
+        if size < 1:
+            raise ValueError('Board size must be at least 1.')
+        self.size = size
+        self.stride = size + 1
+        row_mask = (1 << size) - 1
+        self.mask = 0
+        for row in range(size):
+            self.mask |= row_mask << (row * self.stride)
+        self.stones = [0, 0]
+        self.ko = -1
+        self.position_hash = 0
+        self.__keys = _keys_for(size)
+
+    def point(self, row: int, col: int) -> int:
+        """
+        Returns the bit index of a (row, col)
+        """
+        return row * self.stride + col
+
+    def coords(self, point: int) -> tuple[int, int]:
+        """
+        Returns the (row, col) of a bit index
+        """
+        return divmod(point, self.stride)
+
+    def get(self, row: int, col: int) -> PlayerColors | None:
+        """
+        Returns the color of the stone at a (row, col), or None if it is empty
+        """
+        bit = 1 << (row * self.stride + col)
+        if self.stones[0] & bit:
+            return PlayerColors.BLACK
+        if self.stones[1] & bit:
+            return PlayerColors.WHITE
+        return None
+
+    def set(self, row: int, col: int, color: PlayerColors | None):
+        """
+        Puts a stone of a color (or nothing) at a (row, col) without checking captures, suicide or ko
+
+        Args:
+            row(int): the row of the point
+            col(int): the column of the point
+            color(PlayerColors): the color of the stone, or None to empty the point
+        """
+        point = row * self.stride + col
+        bit = 1 << point
+        for value in (0, 1):
+            if self.stones[value] & bit:
+                self.stones[value] ^= bit
+                self.position_hash ^= self.__keys[value][point]
+        if color is not None:
+            self.stones[color.value] |= bit
+            self.position_hash ^= self.__keys[color.value][point]
+
+    def empty(self) -> int:
+        """
+        Returns the mask of empty points
+        """
+        return self.mask & ~(self.stones[0] | self.stones[1])
+
+    def empty_count(self) -> int:
+        """
+        Returns the number of empty points
+        """
+        return self.empty().bit_count()
+
+    def neighbors(self, points: int) -> int:
+        """
+        Returns the mask of points directly above, below, left or right of any point in a mask
+
+        Args:
+            points(int): the mask to grow
+        """
+        stride = self.stride
+        return ((points << 1) | (points >> 1) | (points << stride) | (points >> stride)) & self.mask
+
+    def flood(self, seed: int, within: int) -> int:
+        """
+        Returns every point of a mask that is connected to a seed through that mask
+
+        Args:
+            seed(int): the mask to start from
+            within(int): the mask the fill is allowed to spread through
+        """
+        stride = self.stride
+        filled = seed & within
+        while True:
+            grown = (filled | (filled << 1) | (filled >> 1) | (filled << stride) | (filled >> stride)) & within
+            if grown == filled:
+                return filled
+            filled = grown
+
+    def chain(self, point: int) -> int:
+        """
+        Returns the mask of the chain of stones containing a point, or 0 if the point is empty
+
+        Args:
+            point(int): the bit index of the point
+        """
+        bit = 1 << point
+        for color_stones in self.stones:
+            if color_stones & bit:
+                return self.flood(bit, color_stones)
+        return 0
+
+    def liberties(self, chain: int) -> int:
+        """
+        Returns the mask of empty points next to a chain
+
+        Args:
+            chain(int): the mask of the chain
+        """
+        return self.neighbors(chain) & self.empty()
+
+    def __captures(self, point: int, color: PlayerColors) -> int:
+        """
+        Returns the mask of enemy stones that a stone at a point would capture
+        """
+        bit = 1 << point
+        enemy = self.stones[1 - color.value]
+        empty = self.empty() & ~bit
+        captured = 0
+        candidates = self.neighbors(bit) & enemy
+        while candidates:
+            nb_bit = candidates & -candidates
+            enemy_chain = self.flood(nb_bit, enemy)
+            candidates &= ~enemy_chain
+            if not self.neighbors(enemy_chain) & empty:
+                captured |= enemy_chain
+        return captured
+
+    def is_legal(self, point: int, color: PlayerColors) -> bool:
+        """
+        Returns True if a color may play at a point: it must be empty, not the ko point and not suicide
+
+        Args:
+            point(int): the bit index of the point
+            color(PlayerColors): the color of the stone to play
+        """
+        bit = 1 << point
+        empty = self.empty()
+        if not empty & bit or point == self.ko:
+            return False
+
+        # A point with an empty neighbor can always be played
+        if self.neighbors(bit) & empty:
+            return True
+        return self.__lives(point, color)
+
+    def __lives(self, point: int, color: PlayerColors) -> bool:
+        """
+        Returns True if a stone at an empty point with no empty neighbors would keep a liberty
+        """
+        bit = 1 << point
+        empty = self.empty() & ~bit
+
+        # Connecting to a friendly chain keeps that chain's other liberties
+        own = self.stones[color.value] | bit
+        if self.neighbors(self.flood(bit, own)) & empty:
+            return True
+
+        # Otherwise the stone only lives if it captures something
+        return self.__captures(point, color) != 0
+
+    def legal_moves(self, color: PlayerColors) -> int:
+        """
+        Returns the mask of points a color may play at
+
+        Args:
+            color(PlayerColors): the color of the stone to play
+        """
+        legal = self.playable(self.mask, color)
+        if self.ko >= 0:
+            legal &= ~(1 << self.ko)
+        return legal
+
+    def playable(self, points: int, color: PlayerColors) -> int:
+        """
+        Returns the points of a mask that are empty and wouldn't be suicide for a color, without looking at ko
+
+        Args:
+            points(int): the mask of points to check
+            color(PlayerColors): the color of the stone to play
+        """
+        empty = self.empty()
+        points &= empty
+
+        # Points touching an empty point are always playable, only the rest need a closer look
+        playable = points & self.neighbors(empty)
+        for point in iter_points(points & ~playable):
+            if self.__lives(point, color):
+                playable |= 1 << point
+        return playable
+
+    def play(self, point: int, color: PlayerColors, check: bool = True) -> int:
+        """
+        Plays a stone at a point, removes the enemy chains it captures and updates the ko point
+
+        Args:
+            point(int): the bit index of the point
+            color(PlayerColors): the color of the stone to play
+            check(bool): False to skip the legality check when the caller has already made it
+        Raises:
+            ValueError: if the move is not legal
+        Returns:
+            The mask of captured stones
+        """
+        if check and not self.is_legal(point, color):
+            raise ValueError('Illegal move.')
+        bit = 1 << point
+        captured = self.__captures(point, color)
+        own_keys = self.__keys[color.value]
+        enemy_keys = self.__keys[1 - color.value]
+
+        self.stones[color.value] |= bit
+        self.position_hash ^= own_keys[point]
+        if captured:
+            self.stones[1 - color.value] &= ~captured
+            for captured_point in iter_points(captured):
+                self.position_hash ^= enemy_keys[captured_point]
+
+        # Ko only happens when a lone stone captures exactly one stone and is left in atari
+        self.ko = -1
+        if captured and captured & (captured - 1) == 0:
+            own_chain = self.flood(bit, self.stones[color.value])
+            if own_chain == bit and self.liberties(bit) == captured:
+                self.ko = captured.bit_length() - 1
+        return captured
+
+    def eye_points(self, color: PlayerColors) -> int:
+        """
+        Returns the mask of empty points whose neighbors are all stones of a color, which random play shouldn't fill
+
+        Args:
+            color(PlayerColors): the color surrounding the points
+        """
+        return self.empty() & ~self.neighbors(self.mask & ~self.stones[color.value])
+
+    def territory(self) -> tuple[int, int]:
+        """
+        Splits the empty points into regions and gives each region to the color that borders it alone
+
+        Returns:
+            A (black, white) tuple of territory masks, regions touching both colors or neither belong to nobody
+        """
+        black, white = self.stones
+        remaining = self.empty()
+        territory = [0, 0]
+        while remaining:
+            region = self.flood(remaining & -remaining, remaining)
+            remaining ^= region
+            border = self.neighbors(region)
+            if border & black:
+                if not border & white:
+                    territory[0] |= region
+            elif border & white:
+                territory[1] |= region
+        return territory[0], territory[1]
+
+    def __parts(self, points: int) -> list:
+        """
+        Splits a mask into its connected parts
+        """
+        parts = []
+        while points:
+            part = self.flood(points & -points, points)
+            points ^= part
+            parts.append(part)
+        return parts
+
+    def unconditional_life(self, color: PlayerColors) -> tuple[int, int]:
+        """
+        Finds a color's chains that can't be captured even if the color always passes, with Benson's algorithm
+
+        The color's regions are the connected areas of empty points and opponent stones, and a region is vital to a
+        chain next to it if every empty point of the region is a liberty of the chain. Chains with fewer than two vital
+        regions are dropped, then regions next to a dropped chain are dropped, until nothing changes. The chains left
+        are unconditionally alive.
+
+        A region left over is settled if every one of its points is next to a living chain: the opponent can never
+        make an eye there, and the color can fill every liberty of the opponent's stones without filling its own last
+        one, so the whole region belongs to the color.
+
+        Args:
+            color(PlayerColors): the color whose chains are analyzed
+        Returns:
+            (mask of the unconditionally alive stones, mask of the regions they settle)
+        """
+        own = self.stones[color.value]
+        empty = self.empty()
+        chains = self.__parts(own)
+        regions = self.__parts(self.mask & ~own)
+        liberties = [self.neighbors(chain) & empty for chain in chains]
+
+        # The chains around each region and the ones it is vital to don't change as chains are dropped
+        borders = []
+        vital_to = []
+        vital_counts = [0] * len(chains)
+        for region in regions:
+            around = self.neighbors(region) & own
+            bordering = [index for index, chain in enumerate(chains) if around & chain]
+            region_empty = region & empty
+            vital = [index for index in bordering if region_empty and not region_empty & ~liberties[index]]
+            for index in vital:
+                vital_counts[index] += 1
+            borders.append(bordering)
+            vital_to.append(vital)
+        if max(vital_counts, default=0) < 2:
+            return 0, 0
+
+        alive = set(range(len(chains)))
+        healthy = set(range(len(regions)))
+        while True:
+            vital_counts = [0] * len(chains)
+            for region in healthy:
+                for index in vital_to[region]:
+                    vital_counts[index] += 1
+            dropped = {index for index in alive if vital_counts[index] < 2}
+            if not dropped:
+                break
+            alive -= dropped
+            healthy = {region for region in healthy if all(index in alive for index in borders[region])}
+
+        alive_stones = 0
+        for index in alive:
+            alive_stones |= chains[index]
+        reach = self.neighbors(alive_stones)
+        settled = 0
+        for region in healthy:
+            if not regions[region] & ~reach:
+                settled |= regions[region]
+        return alive_stones, settled
+
+    def settled(self) -> tuple[int, int]:
+        """
+        Returns the points each color owns however the game goes on: its unconditionally alive stones and the regions
+        they settle, including the opponent stones in those regions, which are dead
+
+        Returns:
+            A (black, white) tuple of masks
+        """
+        black = self.unconditional_life(PlayerColors.BLACK)
+        white = self.unconditional_life(PlayerColors.WHITE)
+        return black[0] | black[1], white[0] | white[1]
+
+    def area(self, settled: tuple = None) -> tuple[int, int]:
+        """
+        Returns the points each color scores on the board, counted the way GoModel.calculate_score counts them: its
+        stones and territory, plus the opponent stones in the regions it has settled, which are taken off as captured so
+        their points become its territory too
+
+        Args:
+            settled(tuple[int]): the (black, white) masks given by settled(), if they are already known
+        Returns:
+            (black points, white points), the scores once the capture counts and komi are added
+        """
+        black, white = self.stones
+        settled_black, settled_white = self.settled() if settled is None else settled
+        dead_white = settled_black & white
+        dead_black = settled_white & black
+        board = self
+        if dead_white or dead_black:
+            board = self.copy()
+            board.stones = [black ^ dead_black, white ^ dead_white]
+        black_territory, white_territory = board.territory()
+        return (black_territory.bit_count() + board.stones[0].bit_count() + dead_white.bit_count(),
+                white_territory.bit_count() + board.stones[1].bit_count() + dead_black.bit_count())
+
+    def rehash(self):
+        """
+        Works out position_hash again from the stones, for when the masks in stones were changed directly
+        """
+        position_hash = 0
+        for color_tables, color_stones in zip(_byte_keys_for(self.size), self.stones):
+            for table, byte in zip(color_tables, color_stones.to_bytes(len(color_tables), 'little')):
+                position_hash ^= table[byte]
+        self.position_hash = position_hash
+
+    def copy(self) -> 'BitBoard':
+        """
+        Returns an independent copy of the board
+        """
+        other = BitBoard.__new__(BitBoard)
+        other.size = self.size
+        other.stride = self.stride
+        other.mask = self.mask
+        other.stones = self.stones[:]
+        other.ko = self.ko
+        other.position_hash = self.position_hash
+        other._BitBoard__keys = self.__keys
+        return other
+
+    def __eq__(self, other) -> bool:
+        """
+        Returns True if two boards have the same size, stones and ko point
+        """
+        if not isinstance(other, BitBoard):
+            return NotImplemented
+        return self.size == other.size and self.stones == other.stones and self.ko == other.ko
+
+    def __str__(self) -> str:
+        """
+        Returns the board as rows of B, W and . characters
+        """
+        rows = []
+        for row in range(self.size):
+            line = ''
+            for col in range(self.size):
+                color = self.get(row, col)
+                line += '.' if color is None else color.name[0]
+            rows.append(line)
+        return '\n'.join(rows)
@@ -0,0 +1,96 @@
+"""
+Title: BoardGeometry Class
+Purpose: Works out the neighbors, point numbers and edge and corner points of each board size once, so the rules
+    look them up instead of computing and bounds checking them on every move
+"""
+from functools import lru_cache
+
+VALID_BOARD_LENGTHS = (6, 9, 11, 13, 19)
+
+# A point is classified by how many neighbors it has
+CORNER, EDGE, CENTER = 2, 3, 4
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(nrows: int, ncols: int) -> tuple:
+    """
+    Returns the on-board neighbors of every square of a board of any shape
+
+    Args:
+        nrows(int): the number of rows in the board
+        ncols(int): the number of columns in the board
+    Returns:
+        A tuple of rows, where table[row][col] is a tuple of the (row, col) of each square above, below, left and right
+        of (row, col) that is on the board, in the order left, right, up, down
+    """
+    return tuple(
+        tuple(
+            tuple((nb_r, nb_c) for nb_r, nb_c in ((row, col - 1), (row, col + 1), (row - 1, col), (row + 1, col))
+                  if 0 <= nb_r < nrows and 0 <= nb_c < ncols)
+            for col in range(ncols))
+        for row in range(nrows))
+
+
+class BoardGeometry:
+    """
+    Represents the fixed layout of a square board of one size, shared by every game on that size
+
+    Points are numbered row by row, so (row, col) is point row * size + col.
+
+    Attributes:
+        size(int): the number of rows (and columns) in the board
+        coords(tuple): the (row, col) of each point
+        adjacent(tuple): adjacent[row][col] is a tuple of the (row, col) neighbors of a square, see neighbor_table()
+        neighbor_points(tuple): the point numbers of the neighbors of each point
+        kinds(tuple): CORNER, EDGE or CENTER for each point
+    Methods:
+        point(): returns the point number of a square
+        kind(): returns whether a square is a corner, edge or center square
+    """
+    __slots__ = ('size', 'coords', 'adjacent', 'neighbor_points', 'kinds')
+
+    def __init__(self, size: int):
+        """
+        Initializes the tables of a board size
+
+        Args:
+            size(int): the number of rows (and columns) in the board
+        """
+        self.size = size
+        self.coords = tuple((row, col) for row in range(size) for col in range(size))
+        self.adjacent = neighbor_table(size, size)
+        self.neighbor_points = tuple(tuple(nb_r * size + nb_c for nb_r, nb_c in self.adjacent[row][col])
+                                     for row, col in self.coords)
+        self.kinds = tuple(len(neighbors) for neighbors in self.neighbor_points)
+
+    def point(self, row: int, col: int) -> int:
+        """
+        Returns the point number of a square
+        """
+        return row * self.size + col
+
+    def kind(self, row: int, col: int) -> int:
+        """
+        Returns CORNER, EDGE or CENTER for a square
+        """
+        return self.kinds[row * self.size + col]
+
+
+_GEOMETRIES = {}
+
+
+def geometry(size: int) -> BoardGeometry:
+    """
+    Returns the shared BoardGeometry of a board size, building it the first time it is asked for
+
+    Args:
+        size(int): the number of rows (and columns) in the board
+    Raises:
+        ValueError: if size is not one of the VALID_BOARD_LENGTHS
+    """
+    board_geometry = _GEOMETRIES.get(size)
+    if board_geometry is None:
+        if size not in VALID_BOARD_LENGTHS:
+            raise ValueError(f'Board size must be one of {VALID_BOARD_LENGTHS}.')
+        board_geometry = _GEOMETRIES[size] = BoardGeometry(size)
+    return board_geometry
@@ -0,0 +1,225 @@
+"""
+Title: EvalCache Class
+Purpose: Remembers the scores and other evaluations of positions that have been looked at before, forgetting the least
+    recently used ones once it is full, and can keep them on disk between runs
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from go_model import GoModel
+
+# Bumped whenever the keys or saved layout change, so an old cache file is ignored instead of misread
+FORMAT_VERSION = 1
+
+
+def position_key(model: GoModel, symmetric: bool = False) -> tuple:
+    """
+    Returns a key that is the same for every game that reached the same position, whatever the order of its moves
+
+    The key is the board size, the Zobrist hash of the stones, the color to move and the capture counts, which together
+    are everything calculate_score() and most evaluations depend on.
+
+    Args:
+        model(GoModel): the game
+        symmetric(bool): True to hash the board in its canonical orientation, so all 8 rotations and reflections of a
+            position share a key
+    """
+    position_hash = model.canonical_hash()[0] if symmetric else model.position_hash
+    return (model.nrows, position_hash, model.current_player.player_color.value,
+            model.player_b.capture_count, model.player_w.capture_count)
+
+
+def _score(model: GoModel, komi: float = 6.5) -> tuple:
+    """
+    The evaluation registered as 'score', kept as a tuple so the cached value can't be changed by a caller
+    """
+    return tuple(model.calculate_score(komi))
+
+
+class EvalCache:
+    """
+    Represents a bounded cache of evaluations of positions, with calculate_score() registered as 'score'
+
+    Evaluations are functions taking a GoModel and any extra arguments, and must depend only on the position (see
+    position_key()) and those arguments. Cached values are shared between callers, so they shouldn't be changed. A
+    symmetric cache also shares values between rotations and reflections of a position, so it should only be used for
+    evaluations that don't change when the board is turned, such as scores.
+
+    Attributes:
+        capacity(int): the largest number of values kept
+        path(str): the file the cache is loaded from and saved to, or None to keep it in memory only
+        symmetric(bool): True if rotations and reflections of a position share values
+        hits(int): the number of evaluations answered from the cache
+        misses(int): the number of evaluations that had to be worked out
+        evictions(int): the number of values forgotten to make room
+        __values(OrderedDict): the values by (name, position key, arguments), least recently used first
+        __functions(dict): the registered evaluations by name
+        __lock(threading.Lock): held while the cache is read or changed, so threads can share it
+    Methods:
+        register(): adds an evaluation function under a name
+        evaluate(): returns a registered evaluation of a position, working it out only if it isn't cached
+        score(): returns calculate_score() of a position through the cache
+        stats(): returns the counters as a dict
+        clear(): forgets every value and resets the counters
+        save(): writes the cache to its file
+        load(): reads values saved by save()
+        __len__(): returns the number of values kept
+    """
+    def __init__(self, capacity: int = 100_000, path: str = None, symmetric: bool = False):
+        """
+        Initializes the cache, loading the values saved at path if the file exists
+
+        Args:
+            capacity(int): the largest number of values kept
+            path(str): the file the cache is loaded from and saved to, or None to keep it in memory only
+            symmetric(bool): True to share values between the rotations and reflections of a position
+        Raises:
+            ValueError: if capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1.')
+        self.capacity = capacity
+        self.path = path
+        self.symmetric = symmetric
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__values = OrderedDict()
+        self.__functions = {'score': _score}
+        self.__lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of values kept
+        """
+        return len(self.__values)
+
+    def register(self, name: str, function):
+        """
+        Adds an evaluation function under a name
+
+        Args:
+            name(str): the name the evaluation is asked for by
+            function: called as function(model, *args) and returns the evaluation
+        Raises:
+            ValueError: if another function is already registered under the name
+        """
+        if self.__functions.get(name, function) is not function:
+            raise ValueError(f'An evaluation named {name!r} is already registered.')
+        self.__functions[name] = function
+
+    def evaluate(self, name: str, model: GoModel, *args):
+        """
+        Returns an evaluation of the position, working it out only if the same position and arguments aren't cached
+
+        Args:
+            name(str): the name the evaluation was registered under
+            model(GoModel): the game
+            args: the extra arguments of the evaluation, which must be hashable
+        Raises:
+            KeyError: if no evaluation is registered under the name
+        """
+        function = self.__functions[name]
+        key = (name, position_key(model, self.symmetric), args)
+        with self.__lock:
+            if key in self.__values:
+                self.hits += 1
+                self.__values.move_to_end(key)
+                return self.__values[key]
+            self.misses += 1
+
+        value = function(model, *args)
+        with self.__lock:
+            self.__values[key] = value
+            self.__values.move_to_end(key)
+            while len(self.__values) > self.capacity:
+                self.__values.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def score(self, model: GoModel, komi: float = 6.5) -> list:
+        """
+        Returns [black_score, white_score] the same as model.calculate_score(komi), through the cache
+        """
+        return list(self.evaluate('score', model, float(komi)))
+
+    def stats(self) -> dict:
+        """
+        Returns the hits, misses, evictions, hit rate, size and capacity of the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.__values),
+            'capacity': self.capacity,
+        }
+
+    def clear(self):
+        """
+        Forgets every value and resets the counters
+        """
+        with self.__lock:
+            self.__values.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def save(self, path: str = None):
+        """
+        Writes every value to a file, least recently used first, replacing the file in one step so a crash can't leave
+        half a cache behind
+
+        Args:
+            path(str): the file to write, the cache's own path by default
+        Raises:
+            ValueError: if there is no path to save to
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('The cache has no path to save to.')
+        with self.__lock:
+            entries = list(self.__values.items())
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump({'version': FORMAT_VERSION, 'symmetric': self.symmetric, 'entries': entries}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def load(self, path: str = None) -> int:
+        """
+        Reads values written by save(), as the most recently used, keeping the newest ones if they don't all fit
+
+        The file is unpickled, so only load files this program wrote.
+
+        Args:
+            path(str): the file to read, the cache's own path by default
+        Raises:
+            ValueError: if there is no path to load from or the file isn't a cache file
+        Returns:
+            The number of values read, 0 if the file was saved by an older format or with different symmetry
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('The cache has no path to load from.')
+        with open(path, 'rb') as file:
+            try:
+                saved = pickle.load(file)
+            except (pickle.UnpicklingError, EOFError) as error:
+                raise ValueError(f'{path} is not an evaluation cache.') from error
+        if not isinstance(saved, dict) or 'entries' not in saved:
+            raise ValueError(f'{path} is not an evaluation cache.')
+        if saved.get('version') != FORMAT_VERSION or saved.get('symmetric', False) != self.symmetric:
+            return 0
+
+        with self.__lock:
+            for key, value in saved['entries']:
+                self.__values[key] = value
+                self.__values.move_to_end(key)
+            while len(self.__values) > self.capacity:
+                self.__values.popitem(last=False)
+        return len(saved['entries'])
@@ -0,0 +1,398 @@
+"""
+Title: GameArchive Class
+Purpose: Append-only files of games and of unique positions stored as packed positions, read through mmap so any
+    position can be looked up without reading or copying the rest of the file
+"""
+import mmap
+import os
+import struct
+
+from go_model import GoModel, VALID_BOARD_LENGTHS
+from position_codec import encode, encode_bitboard, decode, record_size
+from symmetry import canonical_form
+
+MAGIC = b'GOARCH1\n'
+
+# Each game starts with its board size and number of positions, followed by that many fixed size records
+GAME_HEADER = struct.Struct('<BxxxI')
+
+# A position archive holds one board size, given once after the magic, followed by one record per unique position
+POSITIONS_MAGIC = b'GOPOS1\n\x00'
+POSITIONS_HEADER = struct.Struct('<8sB7x')
+
+
+class GameArchive:
+    """
+    Represents an archive file of games, each a list of positions packed by position_codec
+
+    The file is only ever appended to, so the offsets found when it is opened stay valid and a reader only has to map
+    the part written since it last looked.
+
+    Attributes:
+        path(str): the path of the archive file
+        __offsets(list[int]): the file offset of the first record of each game
+        __lengths(list[int]): the number of positions in each game
+        __sizes(list[int]): the board size of each game
+        __end(int): the offset just past the last complete game
+        __file: the file, opened for reading and appending
+        __map(mmap): a read only map of the file up to __end, or None before anything needs it
+    Methods:
+        append_game(): adds a game to the end of the archive
+        position(): returns the packed bytes of one position without copying them
+        decode(): returns one position as a GoModel
+        game_length(): returns the number of positions in a game
+        board_size(): returns the board size of a game
+        close(): closes the file
+    """
+    def __init__(self, path: str):
+        """
+        Opens an archive, creating it if it doesn't exist
+
+        Args:
+            path(str): the path of the archive file
+        Raises:
+            ValueError: if the file exists but isn't an archive
+        """
+        self.path = path
+        self.__offsets = []
+        self.__lengths = []
+        self.__sizes = []
+        self.__map = None
+        self.__file = open(path, 'a+b')
+        self.__file.seek(0, os.SEEK_END)
+        if self.__file.tell() == 0:
+            self.__file.write(MAGIC)
+            self.__file.flush()
+        self.__end = len(MAGIC)
+        self.__scan()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of games in the archive
+        """
+        return len(self.__offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __scan(self):
+        """
+        Reads the game headers written since the last scan, which only reads a few bytes per game
+        """
+        self.__file.flush()
+        self.__file.seek(0)
+        if self.__file.read(len(MAGIC)) != MAGIC:
+            self.__file.close()
+            raise ValueError(f'{self.path} is not a game archive.')
+        file_size = os.fstat(self.__file.fileno()).st_size
+        offset = self.__end
+        while offset + GAME_HEADER.size <= file_size:
+            self.__file.seek(offset)
+            size, length = GAME_HEADER.unpack(self.__file.read(GAME_HEADER.size))
+            if size not in VALID_BOARD_LENGTHS:
+                raise ValueError(f'{self.path} has a game with an invalid board size at byte {offset}.')
+            end = offset + GAME_HEADER.size + length * record_size(size)
+            if end > file_size:
+                # A game still being written by another process, it is picked up by a later scan
+                break
+            self.__offsets.append(offset + GAME_HEADER.size)
+            self.__lengths.append(length)
+            self.__sizes.append(size)
+            offset = end
+        self.__end = offset
+
+    def __mapped(self) -> mmap.mmap:
+        """
+        Returns a map of the file that covers every known game, mapping it again if the file has grown
+        """
+        if self.__map is None or len(self.__map) < self.__end:
+            self.__release_map()
+            self.__map = mmap.mmap(self.__file.fileno(), self.__end, access=mmap.ACCESS_READ)
+        return self.__map
+
+    def append_game(self, positions) -> int:
+        """
+        Adds a game to the end of the archive
+
+        Args:
+            positions: the positions of the game in order, each packed bytes from position_codec or a GoModel
+        Raises:
+            ValueError: if the game has no positions or its positions aren't all on one board size
+        Returns:
+            The index of the new game
+        """
+        records = [encode(position) if isinstance(position, GoModel) else bytes(position) for position in positions]
+        if not records:
+            raise ValueError('A game needs at least one position.')
+        size = records[0][0]
+        if size not in VALID_BOARD_LENGTHS or any(len(record) != record_size(size) or record[0] != size for record in records):
+            raise ValueError('Every position of a game must be packed for the same board size.')
+
+        self.__scan()
+        self.__file.seek(0, os.SEEK_END)
+        self.__file.write(GAME_HEADER.pack(size, len(records)) + b''.join(records))
+        self.__file.flush()
+        self.__scan()
+        return len(self.__offsets) - 1
+
+    def __check(self, game: int, k: int):
+        """
+        Raises IndexError if game or position k of it doesn't exist, looking for games added by other writers first
+        """
+        if not 0 <= game < len(self.__offsets):
+            self.__scan()
+        if not 0 <= game < len(self.__offsets):
+            raise IndexError(f'There is no game {game}, the archive has {len(self.__offsets)}.')
+        if not 0 <= k < self.__lengths[game]:
+            raise IndexError(f'Game {game} has no position {k}, it has {self.__lengths[game]}.')
+
+    def position(self, game: int, k: int) -> memoryview:
+        """
+        Returns the packed bytes of a position straight out of the mapped file
+
+        Args:
+            game(int): the index of the game
+            k(int): the index of the position in the game, 0 for the first
+        Raises:
+            IndexError: if the game or position doesn't exist
+        Returns:
+            A read only memoryview of the record, valid until the archive is closed
+        """
+        self.__check(game, k)
+        size = record_size(self.__sizes[game])
+        start = self.__offsets[game] + k * size
+        return memoryview(self.__mapped())[start:start + size]
+
+    def decode(self, game: int, k: int, superko: bool = False) -> GoModel:
+        """
+        Returns a position as a new game that starts from it
+
+        Args:
+            game(int): the index of the game
+            k(int): the index of the position in the game, 0 for the first
+            superko(bool): True to forbid recreating any previous position instead of only the last one
+        Raises:
+            IndexError: if the game or position doesn't exist
+        """
+        view = self.position(game, k)
+        try:
+            return decode(view, superko)
+        finally:
+            view.release()
+
+    def game_length(self, game: int) -> int:
+        """
+        Returns the number of positions in a game
+
+        Raises:
+            IndexError: if the game doesn't exist
+        """
+        self.__check(game, 0)
+        return self.__lengths[game]
+
+    def board_size(self, game: int) -> int:
+        """
+        Returns the board size of a game
+
+        Raises:
+            IndexError: if the game doesn't exist
+        """
+        self.__check(game, 0)
+        return self.__sizes[game]
+
+    def close(self):
+        """
+        Closes the map and the file
+        """
+        self.__release_map()
+        self.__file.close()
+
+    def __release_map(self):
+        """
+        Closes the current map, or leaves it for the garbage collector while memoryviews of it are still in use
+        """
+        if self.__map is not None:
+            try:
+                self.__map.close()
+            except BufferError:
+                pass
+            self.__map = None
+
+
+class PositionArchive:
+    """
+    Represents an archive file of unique positions of one board size, where all 8 rotations and reflections of a
+    position are stored once, in their canonical orientation (see symmetry.py)
+
+    Only one process may add positions to an archive at a time, since the index of stored positions is kept in memory.
+
+    Attributes:
+        path(str): the path of the archive file
+        size(int): the number of rows (and columns) in the board
+        __record_size(int): the number of bytes in each position
+        __index(dict): maps the packed bytes of each stored position to its number
+        __file: the file, opened for reading and appending
+        __map(mmap): a read only map of the file, or None before anything needs it
+    Methods:
+        add(): stores a position unless it or one of its rotations or reflections is already stored
+        find(): returns the number of a stored position and the transform to its stored orientation
+        position(): returns the packed bytes of a stored position without copying them
+        decode(): returns a stored position as a GoModel
+        close(): closes the file
+    """
+    def __init__(self, path: str, size: int = None):
+        """
+        Opens an archive, creating it if it doesn't exist, and indexes the positions in it
+
+        Args:
+            path(str): the path of the archive file
+            size(int): the board size, needed to create the archive and checked against an existing one
+        Raises:
+            ValueError: if the file exists but isn't a position archive of the size, or a new archive has no valid size
+        """
+        self.path = path
+        self.__map = None
+        self.__file = open(path, 'a+b')
+        self.__file.seek(0, os.SEEK_END)
+        if self.__file.tell() == 0:
+            if size not in VALID_BOARD_LENGTHS:
+                self.__file.close()
+                raise ValueError(f'A new position archive needs a board size from {VALID_BOARD_LENGTHS}.')
+            self.__file.write(POSITIONS_HEADER.pack(POSITIONS_MAGIC, size))
+            self.__file.flush()
+
+        self.__file.seek(0)
+        magic, stored_size = POSITIONS_HEADER.unpack(self.__file.read(POSITIONS_HEADER.size).ljust(POSITIONS_HEADER.size))
+        if magic != POSITIONS_MAGIC or stored_size not in VALID_BOARD_LENGTHS or size not in (None, stored_size):
+            self.__file.close()
+            raise ValueError(f'{path} is not a position archive' + (f' of {size}x{size} boards.' if size else '.'))
+        self.size = stored_size
+        self.__record_size = record_size(stored_size)
+
+        # Index every complete record, a partly written last record is left for the next add() to overwrite
+        self.__index = {}
+        records = (os.fstat(self.__file.fileno()).st_size - POSITIONS_HEADER.size) // self.__record_size
+        if records:
+            self.__file.truncate(POSITIONS_HEADER.size + records * self.__record_size)
+            data = self.__mapped()
+            for number in range(records):
+                start = POSITIONS_HEADER.size + number * self.__record_size
+                self.__index[data[start:start + self.__record_size]] = number
+
+    def __len__(self) -> int:
+        """
+        Returns the number of positions stored
+        """
+        return len(self.__index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __canonical_record(self, model: GoModel) -> tuple:
+        """
+        Returns the packed bytes of a game's position in its canonical orientation, and the transform to it
+        """
+        if model.nrows != self.size:
+            raise ValueError(f'The archive holds {self.size}x{self.size} positions, not {model.nrows}x{model.ncols}.')
+        canonical, transform = canonical_form(model.to_bitboard())
+        record = encode_bitboard(canonical, model.current_player.player_color,
+                                 (model.player_b.capture_count, model.player_w.capture_count), model.consecutive_passes)
+        return record, transform
+
+    def add(self, model: GoModel) -> tuple:
+        """
+        Stores a game's current position, unless it or one of its rotations or reflections is already stored
+
+        Args:
+            model(GoModel): the game
+        Raises:
+            ValueError: if the game's board isn't the archive's size
+        Returns:
+            (position number, transform from the game's board to the stored one, True if the position was new)
+        """
+        record, transform = self.__canonical_record(model)
+        number = self.__index.get(record)
+        if number is not None:
+            return number, transform, False
+        number = len(self.__index)
+        self.__file.seek(0, os.SEEK_END)
+        self.__file.write(record)
+        self.__file.flush()
+        self.__index[record] = number
+        return number, transform, True
+
+    def find(self, model: GoModel) -> tuple | None:
+        """
+        Returns (position number, transform from the game's board to the stored one) for a game's current position,
+        or None if neither it nor any of its rotations or reflections is stored
+
+        Raises:
+            ValueError: if the game's board isn't the archive's size
+        """
+        record, transform = self.__canonical_record(model)
+        number = self.__index.get(record)
+        return None if number is None else (number, transform)
+
+    def __mapped(self) -> mmap.mmap:
+        """
+        Returns a map of the file that covers every stored position, mapping it again if positions were added
+        """
+        end = POSITIONS_HEADER.size + len(self.__index) * self.__record_size
+        if self.__map is None or len(self.__map) < max(end, 1):
+            self.__release_map()
+            self.__file.flush()
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__map
+
+    def position(self, number: int) -> memoryview:
+        """
+        Returns the packed bytes of a stored position straight out of the mapped file
+
+        Args:
+            number(int): the position number given by add() or find()
+        Raises:
+            IndexError: if there is no such position
+        Returns:
+            A read only memoryview of the record, valid until the archive is closed
+        """
+        if not 0 <= number < len(self.__index):
+            raise IndexError(f'There is no position {number}, the archive has {len(self.__index)}.')
+        start = POSITIONS_HEADER.size + number * self.__record_size
+        return memoryview(self.__mapped())[start:start + self.__record_size]
+
+    def decode(self, number: int, superko: bool = False) -> GoModel:
+        """
+        Returns a stored position, in its canonical orientation, as a new game that starts from it
+
+        Raises:
+            IndexError: if there is no such position
+        """
+        view = self.position(number)
+        try:
+            return decode(view, superko)
+        finally:
+            view.release()
+
+    def close(self):
+        """
+        Closes the map and the file
+        """
+        self.__release_map()
+        self.__file.close()
+
+    def __release_map(self):
+        """
+        Closes the current map, or leaves it for the garbage collector while memoryviews of it are still in use
+        """
+        if self.__map is not None:
+            try:
+                self.__map.close()
+            except BufferError:
+                pass
+            self.__map = None
@@ -4,6 +4,7 @@ date: 3/23/2025
 Title: GamePiece Class inherits Placeble
 Purpose: Initializes the Game Piece as an instance of PlayerColors and continues valid placement checks
 """
+from board_geometry import neighbor_table
 from placeble import Placeble
 from player_colors import PlayerColors
 from position import Position
@@ -12,45 +13,32 @@ class GamePiece(Placeble):
     """
     Represents a game piece that is and instance of PlayerColors
 
+    Game pieces hold nothing but their color and never change, so one piece of each color (see stone()) can be shared
+    by every square of every board.
+
     Attributes:
         color (PlayerColors): An instance of PlayerColors either BLACK or WHITE
-        flag (bool): True if the game piece has been flagged for capture
     Methods:
-        raise_flag(): sets the flag to True
-        lower_flag(): sets the flag to False
         is_valid_placement(): returns True if the game piece has a valid placement
         __eq__(): returns the boolean value of the equality of two class objects
         __str__(): returns the string representation of the game piece
         __repr__(): returns the string representation of the game piece when printing the board
 
     """
+    __slots__ = ()
+
     def __init__(self, color: PlayerColors):
         """
         Initializes the game piece object and inherits the placeble initializer
 
         Args:
             color (PlayerColors): An instance of PlayerColors either BLACK or WHITE
-            flag (bool): True if the game piece has a flag
         Raises:
             TypeError: if color is not an instance of PlayerColors
             ValueError: if color is not an instance of BLACK or WHITE of PlayerColors
         """
         super().__init__(color)
 
-        self.flag = False
-
-    def raise_flag(self):
-        """
-        Sets the flag to True
-        """
-        self.flag = True
-
-    def lower_flag(self):
-        """
-        Sets the flag to False
-        """
-        self.flag = False
-
     def is_valid_placement(self, pos: Position, board):
         """
         Returns True or False if the position is a valid placement
@@ -69,26 +57,15 @@ class GamePiece(Placeble):
         if not super().is_valid_placement(pos, board):
             return False
 
-        is_possible = False
-
-        neighbor_positions = [Position(pos.row - 1, pos.col), Position(pos.row, pos.col - 1), Position(pos.row + 1, pos.col), Position(pos.row, pos.col + 1)]
-        for nb_pos in neighbor_positions:
+        # The table only has the neighbors that are on the board, so edges need no checks
+        for nb_row, nb_col in neighbor_table(len(board), len(board[0]))[pos.row][pos.col]:
 
-            # Check if the neighboring position is off the board, which means the piece is being placed on the edge
-            if not 0 <= nb_pos.row < len(board):
-                continue
-            if not 0 <= nb_pos.col < len(board[0]):
-                continue
+            # Check if there is an empty space or a piece of the same color nearby
+            nb_piece = board[nb_row][nb_col]
+            if nb_piece is None or nb_piece.color == self.color:
+                return True
 
-            # Check if there is an empty space nearby
-            if board[nb_pos.row][nb_pos.col] is None:
-                is_possible = True
-
-            # Check if there is a piece of the same color nearby
-            elif board[nb_pos.row][nb_pos.col].color == self.color:
-                is_possible = True
-
-        return is_possible
+        return False
 
     def __eq__(self, other):
         """
@@ -112,3 +89,24 @@ class GamePiece(Placeble):
         """
         representation = f'{self.color.name[0:4]}'
         return representation
+
+
+# The shared piece of each color, see stone()
+STONES = {color: GamePiece(color) for color in (PlayerColors.BLACK, PlayerColors.WHITE)}
+
+
+def stone(color: PlayerColors) -> GamePiece:
+    """
+    Returns the shared game piece of a color instead of making a new one
+
+    Args:
+        color (PlayerColors): An instance of PlayerColors either BLACK or WHITE
+    Raises:
+        TypeError: if color is not an instance of PlayerColors
+        ValueError: if color is not an instance of BLACK or WHITE of PlayerColors
+    """
+    piece = STONES.get(color)
+    if piece is None:
+        # Let the GamePiece checks raise the usual errors
+        return GamePiece(color)
+    return piece
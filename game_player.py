@@ -20,6 +20,8 @@ class GamePlayer:
         skip_count(): A property and property setter that can set and return the number of skipped turns
         __str__(): Returns the string representation of the game player
     """
+    __slots__ = ('__player_color', '__capture_count', '__skip_count')
+
     def __init__(self, player_color: PlayerColors, capture_count: int = 0, skip_count: int = 0):
         """
         Initializes the game player with an instance of PlayerColors, a number for capture count, and a number for skip count
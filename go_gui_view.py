@@ -0,0 +1,451 @@
+"""
+Title: GUI Class
+Purpose: Draws the game with pygame, only redrawing the squares that changed and sleeping until there is something to react to
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+
+import pygame as pg
+import pygame_gui as gui
+
+from go_model import GoModel, UndoException
+from game_piece import stone
+from mcts_player import MCTSPlayer
+from ownership import OwnershipEstimator
+from player_colors import PlayerColors
+from position import Position
+
+BOARD_SIZE = 19  # Default size (Change as needed)
+CELL_SIZE = 40
+GRID_COLOR = (0, 0, 0)
+BOARD_COLOR = (255, 200, 100)
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+STONE_RADIUS = 12
+
+# Screen settings
+SCREEN_WIDTH = 900
+SCREEN_HEIGHT = 700
+BOARD_WIDTH = BOARD_SIZE * CELL_SIZE
+BOARD_HEIGHT = BOARD_SIZE * CELL_SIZE
+SIDE_BOX_WIDTH = 350 # side terminal width
+SIDE_BOX_HEIGHT = 550 # side terminal height
+
+
+# Buttons sizes
+BUTTON_WIDTH = 120
+BUTTON_HEIGHT = 40
+
+# The longest the loop sleeps without an event, so the UI (e.g. the text box) still gets to update now and then
+IDLE_TIMEOUT_MS = 500
+
+# Posted when the computer player has chosen a move
+AI_MOVE_EVENT = pg.USEREVENT + 1
+
+# The game over screen decides which stones are dead with at most this many random playouts, stopping after this many
+# seconds, spread over every core
+SCORING_PLAYOUTS = 2000
+SCORING_SECONDS = 2.0
+DEAD_MARK_COLOR = (200, 0, 0)
+
+class StoneColor(Enum):
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+
+
+class GUI:
+    """
+    Represents the window the game is played in
+
+    The board's background and grid are drawn once into a cached surface and each stone color is drawn once into a
+    sprite. After every change to the model only the squares whose stone changed are redrawn and pushed to the screen,
+    along with the UI elements when an event may have changed them, and the loop sleeps in pg.event.wait() until a
+    click, a UI event or the computer player's move wakes it up.
+
+    Attributes:
+        board_x_offset(int): the x coordinate of the board's top left corner
+        board_y_offset(int): the y coordinate of the board's top left corner
+        __model(GoModel): the game being played
+        __ai_player(MCTSPlayer): the computer player, or None when both sides are played by hand
+        __ai_color(PlayerColors): the color the computer plays
+        __ai_executor(ProcessPoolExecutor): runs the computer player's search away from the drawing loop
+        __ai_thinking(bool): True while the computer player is choosing a move
+        __ai_request(int): counts the searches started, so a search made stale by an undo or reset can be ignored
+        __board_surface(pg.Surface): the board's background and grid lines
+        __stone_sprites(dict): the pre-drawn stone for each PlayerColors
+        __drawn(list[int]): the black and white BitBoard masks of the stones on screen
+    Methods:
+        get_board_position(): converts a mouse position to a board position
+        run_game(): runs the game until the window is closed or the game ends
+    """
+    def __init__(self, ai_player: MCTSPlayer = None, ai_color: PlayerColors = PlayerColors.WHITE):
+        """
+        Initializes the window, the cached board drawings and the buttons
+
+        Args:
+            ai_player(MCTSPlayer): the computer player, or None to play both sides by hand
+            ai_color(PlayerColors): the color the computer plays
+        """
+        pg.init()
+        self.__model = GoModel(BOARD_SIZE, BOARD_SIZE)
+        self._screen = pg.display.set_mode((SCREEN_WIDTH + SIDE_BOX_WIDTH, SCREEN_HEIGHT + SIDE_BOX_HEIGHT))
+        pg.display.set_caption("Laker's Go Game")
+        self._ui_manager = gui.UIManager((SCREEN_WIDTH + SIDE_BOX_WIDTH, SCREEN_HEIGHT + SIDE_BOX_HEIGHT))
+
+        # Board positioning
+        self.board_x_offset = 50
+        self.board_y_offset = 50
+
+        # The computer player searches in its own process so the window stays responsive while it thinks
+        self.__ai_player = ai_player
+        self.__ai_color = ai_color
+        self.__ai_executor = ProcessPoolExecutor(max_workers=1) if ai_player is not None else None
+        self.__ai_thinking = False
+        self.__ai_request = 0
+        self.__rng = random.Random()
+
+        # Everything about the board that never changes is drawn once
+        self.__board_surface = self.__render_board_surface()
+        self.__stone_sprites = {color: self.__render_stone(StoneColor[color.name].value) for color in PlayerColors}
+        self.__drawn = [0, 0]
+
+        # Status line above the side box, read from the model's counters after each change
+        self._status_label = gui.elements.UILabel(
+            relative_rect=pg.Rect((SCREEN_WIDTH - 10, 15), (SIDE_BOX_WIDTH, 30)),
+            text=self.__status_text(),
+            manager=self._ui_manager
+        )
+
+        # Side Box (Game Info)
+        self._side_box = gui.elements.UITextBox(
+            f'{self.__model.message}<br />',
+            relative_rect=pg.Rect((SCREEN_WIDTH - 10, 50), (SIDE_BOX_WIDTH, SIDE_BOX_HEIGHT)),
+            manager=self._ui_manager
+        )
+
+        # Buttons (Below Board)
+        button_y = self.board_y_offset + BOARD_HEIGHT + 30  # Extra spacing between board and buttons
+
+        self._undo_button = gui.elements.UIButton(
+            relative_rect=pg.Rect((100, button_y), (BUTTON_WIDTH, BUTTON_HEIGHT)),
+            text='Undo',
+            manager=self._ui_manager
+        )
+        self._restart_button = gui.elements.UIButton(
+            relative_rect=pg.Rect((250, button_y), (BUTTON_WIDTH, BUTTON_HEIGHT)),
+            text='Reset',
+            manager=self._ui_manager
+        )
+        self._pass_button = gui.elements.UIButton(
+            relative_rect=pg.Rect((400, button_y), (BUTTON_WIDTH, BUTTON_HEIGHT)),
+            text='Pass Turn',
+            manager=self._ui_manager
+        )
+
+    def get_board_position(self, mouse_pos) -> Position | None:
+        """
+        Converts a mouse position to the board position under it
+
+        Args:
+            mouse_pos(tuple[int]): the (x, y) of the mouse
+        Returns:
+            The Position clicked (x is the row and y is the column, matching how stones are drawn), or None if the
+            click was outside the board
+        """
+        mouse_x, mouse_y = mouse_pos
+
+        # Adjust for board offset
+        board_x = (mouse_x - self.board_x_offset) // CELL_SIZE
+        board_y = (mouse_y - self.board_y_offset) // CELL_SIZE
+
+        # Ensure click is inside the board
+        if 0 <= board_x < BOARD_SIZE and 0 <= board_y < BOARD_SIZE:
+            return Position(board_x, board_y)
+        self._side_box.append_html_text(f"Clicked outside..<br />")
+        return None
+
+    def __render_board_surface(self) -> pg.Surface:
+        """
+        Draws the board's background and grid lines into a surface the size of the board
+        """
+        surface = pg.Surface((BOARD_WIDTH, BOARD_HEIGHT))
+        surface.fill(BOARD_COLOR)
+        for x in range(BOARD_SIZE):
+            line = CELL_SIZE // 2 + x * CELL_SIZE
+            pg.draw.line(surface, GRID_COLOR, (line, CELL_SIZE // 2), (line, BOARD_HEIGHT - CELL_SIZE // 2))
+            pg.draw.line(surface, GRID_COLOR, (CELL_SIZE // 2, line), (BOARD_WIDTH - CELL_SIZE // 2, line))
+        return surface
+
+    def __render_stone(self, color: tuple) -> pg.Surface:
+        """
+        Draws one stone into a transparent surface the size of a square
+        """
+        sprite = pg.Surface((CELL_SIZE, CELL_SIZE), pg.SRCALPHA)
+        pg.draw.circle(sprite, color, (CELL_SIZE // 2, CELL_SIZE // 2), STONE_RADIUS)
+        return sprite
+
+    def __cell_rect(self, row: int, col: int) -> pg.Rect:
+        """
+        Returns the screen rectangle of a square, rows run left to right and columns top to bottom
+        """
+        return pg.Rect(self.board_x_offset + row * CELL_SIZE, self.board_y_offset + col * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+
+    def __draw_full_board(self):
+        """
+        Draws the whole empty board from the cached surface, so every stone is drawn by the next __draw_board__()
+        """
+        self._screen.blit(self.__board_surface, (self.board_x_offset, self.board_y_offset))
+        self.__drawn = [0, 0]
+
+    def __draw_board__(self) -> list:
+        """
+        Redraws only the squares whose stone changed since the last draw
+
+        Returns:
+            The screen rectangles that were redrawn
+        """
+        bits = self.__model.to_bitboard()
+        changed = (bits.stones[0] ^ self.__drawn[0]) | (bits.stones[1] ^ self.__drawn[1])
+        dirty = []
+        while changed:
+            low = changed & -changed
+            changed ^= low
+            row, col = bits.coords(low.bit_length() - 1)
+            rect = self.__cell_rect(row, col)
+
+            # Put the board back under the square, then the stone on top if there is one
+            self._screen.blit(self.__board_surface, rect, pg.Rect(rect.x - self.board_x_offset,
+                                                                  rect.y - self.board_y_offset, CELL_SIZE, CELL_SIZE))
+            for color in PlayerColors:
+                if bits.stones[color.value] & low:
+                    self._screen.blit(self.__stone_sprites[color], rect)
+            dirty.append(rect)
+        self.__drawn = bits.stones[:]
+        return dirty
+
+    def __display_game_over__(self):
+        """Displays 'Game Over' message in the center of the screen."""
+        # Random playouts from the final position decide which stones are dead, within a fixed time
+        estimator = OwnershipEstimator(SCORING_PLAYOUTS, SCORING_SECONDS, os.cpu_count() or 1)
+        try:
+            dead_stones = estimator.estimate(self.__model).dead_stones
+        finally:
+            estimator.close()
+        scores = self.__model.calculate_score(dead_stones=dead_stones)
+        for row, col in dead_stones:
+            rect = self.__cell_rect(row, col)
+            pg.draw.line(self._screen, DEAD_MARK_COLOR, rect.topleft, rect.bottomright, 3)
+            pg.draw.line(self._screen, DEAD_MARK_COLOR, rect.topright, rect.bottomleft, 3)
+
+        # Font setup
+        font = pg.font.SysFont("Arial", 36)
+
+        # Multiline text
+        winner = "BLACK" if scores[0] > scores[1] else "WHITE"
+        lines = ["Game Over!", f"BLACK: {scores[0]}  WHITE: {scores[1]}", f"Winner: {winner}",
+                 f"Dead stones: {len(dead_stones)}"]
+
+        # Calculate the total height of the text block
+        line_spacing = 10
+        text_surfaces = [font.render(line, True, WHITE) for line in lines]
+        text_height = sum(text.get_height() for text in text_surfaces) + (len(lines) - 1) * line_spacing
+
+        # Full-width rectangle, centered vertically
+        bg_rect = pg.Rect(0, (SCREEN_HEIGHT // 2 - text_height // 2 - 20),
+                          SCREEN_WIDTH + 350,
+                          text_height + 40)
+        pg.draw.rect(self._screen, BLACK, bg_rect)  # Draw background
+
+        # Render each line and center it horizontally
+        y_offset = SCREEN_HEIGHT // 2 - text_height // 2
+        for text in text_surfaces:
+            text_x = (SCREEN_WIDTH - text.get_width()) // 2
+            self._screen.blit(text, (text_x, y_offset))
+            y_offset += text.get_height() + line_spacing  # Move to next line
+
+        # Update screen and keep message displayed for 3 seconds
+        pg.display.flip()
+        time.sleep(3)
+
+    def __start_ai_turn(self):
+        """
+        Starts the computer player's search if it is its turn, posting AI_MOVE_EVENT when a move has been chosen
+        """
+        if self.__ai_player is None or self.__ai_thinking or self.__model.is_game_over():
+            return
+        if self.__model.current_player.player_color != self.__ai_color:
+            return
+        self.__ai_thinking = True
+        self.__ai_request += 1
+        request = self.__ai_request
+        self._side_box.append_html_text("Computer is thinking...<br />")
+
+        # The search runs in the executor's worker process on a pickled fork of the game, so an undo or reset made
+        # while it thinks can't change the board under it
+        future = self.__ai_executor.submit(self.__ai_player.choose_move, self.__model.fork(),
+                                           random.Random(self.__rng.getrandbits(64)))
+
+        # The callback runs on the thread that collects the worker process's results, pg.event.post is safe to call
+        # from there and wakes the loop up
+        future.add_done_callback(lambda done: pg.event.post(pg.event.Event(AI_MOVE_EVENT, future=done, request=request)))
+
+    def __cancel_ai_turn(self):
+        """
+        Forgets the search in progress, its move will be ignored when it arrives
+        """
+        self.__ai_request += 1
+        self.__ai_thinking = False
+
+    def __finish_ai_turn(self, event) -> bool:
+        """
+        Makes the move the computer player chose, unless the game was reset or undone while it was thinking
+
+        Returns:
+            True if the board changed
+        """
+        if event.request != self.__ai_request:
+            return False
+        self.__ai_thinking = False
+        pos = event.future.result()
+        if pos is None:
+            self.__model.pass_turn()
+        else:
+            self.__play(pos)
+        self._side_box.append_html_text(f"{self.__model.message}<br />")
+        return True
+
+    def __status_text(self) -> str:
+        """
+        Returns the stones, captures and empty squares of each side, all kept as counters by the model
+        """
+        black, white = self.__model.stone_counts
+        return (f'Black {black} ({self.__model.player_b.capture_count} captured)  '
+                f'White {white} ({self.__model.player_w.capture_count} captured)  '
+                f'Empty {self.__model.empty_count}')
+
+    def __play(self, pos: Position) -> bool:
+        """
+        Plays a piece for the current player at a position if it is a valid placement
+
+        Returns:
+            True if the piece was played
+        """
+        if self.__model.piece_at(pos) is not None:
+            return False
+        piece = stone(self.__model.current_player.player_color)
+        if not self.__model.is_valid_placement(pos, piece):
+            return False
+        self.__model.set_piece(pos, piece)
+        self.__model.capture()
+        self.__model.set_next_player()
+        return True
+
+    def __handle_click(self, event, undo_button: pg.Rect, reset_button: pg.Rect, pass_button: pg.Rect) -> bool:
+        """
+        Reacts to a left click on a button or the board
+
+        Returns:
+            True if the model changed
+        """
+        if undo_button.collidepoint(event.pos):
+            self.__cancel_ai_turn()
+            try:
+                self.__model.undo()
+
+                # Take back the computer's reply as well so it is the person's turn again
+                if self.__ai_player is not None and self.__model.current_player.player_color == self.__ai_color:
+                    self.__model.undo()
+                self._side_box.append_html_text(f"{self.__model.message}<br />")
+            except UndoException:
+                self._side_box.append_html_text(f"Cannot Undo anymore..<br />")
+            return True
+        if reset_button.collidepoint(event.pos):
+            self.__model = GoModel(BOARD_SIZE, BOARD_SIZE)
+            self.__cancel_ai_turn()
+            self._side_box.append_html_text(f"Restarting game...<br />")
+            return True
+        if self.__ai_thinking:
+            return False
+        if pass_button.collidepoint(event.pos):
+            self.__model.pass_turn()
+            self._side_box.append_html_text(f"{self.__model.message}<br />")
+            return True
+
+        # click on board
+        pos = self.get_board_position(event.pos)
+        if pos is None:
+            return False
+        played = self.__play(pos)
+        self._side_box.append_html_text(f"{self.__model.message}<br />")
+        return played
+
+    def run_game(self):
+        """
+        Runs the game until the window is closed or the game ends, sleeping whenever nothing is happening
+        """
+        running = True
+        clock = pg.time.Clock()
+        button_y = self.board_y_offset + BOARD_HEIGHT + 30
+        undo_button = pg.Rect(100, button_y, BUTTON_WIDTH, BUTTON_HEIGHT)
+        reset_button = pg.Rect(250, button_y, BUTTON_WIDTH, BUTTON_HEIGHT)
+        pass_button = pg.Rect(400, button_y, BUTTON_WIDTH, BUTTON_HEIGHT)
+        ui_rects = [element.rect for element in (self._status_label, self._side_box, self._undo_button,
+                                                 self._restart_button, self._pass_button)]
+
+        # The whole window is pushed to the screen once, after that only the rectangles that changed are
+        self._screen.fill(WHITE)
+        self.__draw_full_board()
+        self.__start_ai_turn()
+        self.__draw_board__()
+        self._ui_manager.update(clock.tick() / 1000.0)
+        self._ui_manager.draw_ui(self._screen)
+        pg.display.flip()
+        try:
+            while running:
+                # Sleep until something happens, then take everything else that is waiting as well
+                events = [pg.event.wait(IDLE_TIMEOUT_MS)] + pg.event.get()
+                changed = False
+                for event in events:
+                    if event.type == pg.QUIT:
+                        running = False
+                    elif event.type == AI_MOVE_EVENT:
+                        changed |= self.__finish_ai_turn(event)
+                    elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1: # Left click
+                        changed |= self.__handle_click(event, undo_button, reset_button, pass_button)
+                    self._ui_manager.process_events(event)
+
+                if changed:
+                    self._status_label.set_text(self.__status_text())
+                    if self.__model.is_game_over():
+                        self.__draw_board__()
+                        self.__display_game_over__()
+                        break
+                    self.__start_ai_turn()
+
+                # Only the squares that changed are drawn again, the UI draws over its own area and its elements only
+                # change in response to an event, so an idle wake-up with no new stones pushes nothing to the screen
+                dirty = self.__draw_board__()
+                self._ui_manager.update(clock.tick() / 1000.0)
+                self._ui_manager.draw_ui(self._screen)
+                if changed or any(event.type != pg.NOEVENT for event in events):
+                    dirty.extend(ui_rects)
+                if dirty:
+                    pg.display.update(dirty)
+        finally:
+            if self.__ai_executor is not None:
+                self.__ai_executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Go in a window.")
+    parser.add_argument('--ai', choices=[color.name for color in PlayerColors], default=None,
+                        help='let the computer play this color')
+    parser.add_argument('--ai-seconds', type=float, default=3.0, help='seconds the computer thinks per move')
+    args = parser.parse_args()
+    ai = MCTSPlayer(playouts=1_000_000, time_budget=args.ai_seconds) if args.ai else None
+    g = GUI(ai_player=ai, ai_color=PlayerColors[args.ai] if args.ai else PlayerColors.WHITE)
+    g.run_game()
@@ -4,11 +4,33 @@ date: 3/23/2025
 Title: GoModel Class
 Purpose: Creates the board and handles most of the games logic for placing pieces and performing captures
 """
-from game_piece import GamePiece
+from game_piece import GamePiece, stone
 from game_player import GamePlayer
 from player_colors import PlayerColors
 from position import Position
-from copy import copy, deepcopy
+from stone_chain import StoneChain
+from bit_board import BitBoard, iter_points
+from zobrist import zobrist_table
+from move_journal import MoveRecord, MoveJournal, Keyframe
+from instrumentation import Profiler
+from board_geometry import VALID_BOARD_LENGTHS, geometry, neighbor_table
+from symmetry import canonical_hash
+
+# Loading a keyframe takes about as long as one undo or redo for every this many stones on the board, seek() only
+# loads one when that saves time over stepping
+STONES_PER_STEP = 6
+
+# Methods measured by enable_profiling(), by stat name. Removing captured pieces is done by __remove_chain, which took
+# the place of remove_flagged_pieces when chains started being tracked as the game goes
+PROFILED_METHODS = {
+    'is_valid_placement': 'is_valid_placement',
+    'legal_moves': 'legal_moves',
+    'check_ko': 'check_ko',
+    'capture': 'capture',
+    'find_group': 'find_group',
+    'remove_chain': '_GoModel__remove_chain',
+    'record_board_state': 'record_board_state',
+}
 
 class UndoException(Exception):
     """
@@ -19,6 +41,15 @@ class UndoException(Exception):
     """
     pass
 
+class ConsistencyError(Exception):
+    """
+    Exception to be raised when the counters a GoModel keeps don't match its board
+
+    Raises:
+        ConsistencyError: when a counter doesn't match a full scan of the board
+    """
+    pass
+
 def are_boards_identical(board1, board2) -> bool:
     """
     Compares the contents of two boards and returns true if they are the same
@@ -48,42 +79,80 @@ class GoModel:
         nrows(int): The number of rows in the board
         ncols(int): The number of columns in the board
         __board(list[list]): the current board that is a list of a list
-        __past_boards(list): contains instances of previous board states
+        __journal(MoveJournal): the changes made by each move, used to undo and redo moves
+        __position_hash(int): the Zobrist hash of the current board
+        __position_hashes(list): the hash of the board after each move, starting with the empty board
+        __base_hashes(tuple): the start of __position_hashes before the first move in the journal
+        __seen_positions(dict): how many times each hash in __position_hashes has occurred
+        __chains(dict): maps the (row, col) of every piece on the board to the StoneChain it belongs to
+        __chain_owner(object): marks the chains this game made and may change in place, others are shared with a fork
+        __bits(BitBoard): the same board stored as bitmasks, kept in step with __board
+        __adjacent(tuple): the on-board neighbors of each square, shared by every board of the same size
+        __playable(list): for each color, the mask of points that were empty and not suicide when last worked out, or None
+        __changed(list): for each color, the mask of points that have changed since __playable was worked out
+        __ataris(list): for each color, the mask of the enemy pieces whose chains had one liberty when __playable was
+            worked out
+        __stone_counts(list): the number of pieces of each color on the board
+        __base_captures(tuple): the (black, white) capture counts before the first move in the journal
+        consistency_checks(bool): True to check every counter against a full scan of the board after each change
+        superko(bool): True if any previous position may not be recreated, False for simple ko
         consecutive_passes(int): tracks number of consecutive passes
         message(str): contains the message for the games message board
     Methods:
         current_player(): returns the current player
-        board_history(): returns the list of past boards
-        record_board_state(): appends the current board state to the board history list
+        board_history(): returns the records of the moves made so far
+        history_length(): returns the number of moves that can be undone
+        line_length(): returns the number of moves made plus the number that can be redone
+        keyframe_interval(): returns the number of moves between the positions the journal keeps in full
+        position_hash(): returns the Zobrist hash of the current board
+        record_board_state(): appends the record of a move to the move journal
         nrows(): returns the number of rows in the board
         ncols(): returns the number of columns in the board
         board(): returns the current board that is a list of a list
+        to_bitboard(): returns a copy of the current board as a BitBoard
+        canonical_hash(): returns the hash of the board turned to its canonical orientation and the transform used
         message(): a property and property setter that sets and/or returns the message for the games message board
         piece_at(): returns the piece at a given position
+        chain_at(): returns the chain of pieces at a given position
         set_piece(): sets the piece at a given position
         set_next_player(): sets current player to the opposite player color
         pass_turn(): sets the current player to the opposite player color, incriments consecutive passes, and updates the message
+        stone_counts(): returns the number of black and white pieces on the board
+        empty_count(): returns the number of empty squares
+        occupied(): returns the squares that have a piece on them
         is_game_over(): returns true or false if the game end conditions are met
         is_valid_placement(): returns true or false if a piece can be played at a given position
-        check_ko(): returns true or false when comparing boards to see if a capture has taken place
+        legal_moves(): returns the mask of every point the current player can play at
+        check_ko(): returns true or false if a position hash would repeat a previous board
+        settled_areas(): returns the points each player owns however the game goes on
         calculate_score(): calculates each players score for the game
-        undo(): sets the board to the previous board state and removes the current board from the board history
-        clear_all_flags(): clears all flags for the game
-        find_group(): tracks if the surrounding pieces are the same player color
-        capture(): detects if the placement of a piece results in a capture
+        restore_position(): replaces the game with a position given as a BitBoard, with no moves to undo
+        check_consistency(): checks the counters against a full scan of the board
+        undo(): reverses the most recent move in the move journal
+        redo(): replays the most recently undone move
+        seek(): undoes or redoes moves until a given number of moves have been made
+        fork(): returns an independent copy of the game that shares the history of moves
+        find_group(): finds the pieces of a color connected to a square on any board
+        capture(): removes the enemy chains left without liberties by the last placement
+        enable_profiling(): starts measuring calls, wall time and squares visited of the PROFILED_METHODS
+        disable_profiling(): stops measuring, keeping what was measured
+        stats(): returns a snapshot of the measurements
+        reset_stats(): forgets the measurements
 
     """
-    def __init__(self, nrows: int = 6, ncols: int = 6):
+    def __init__(self, nrows: int = 6, ncols: int = 6, superko: bool = False, keyframe_interval: int = 32):
         """
         Initializes the game model by creatiing the board and setting player colors and the current player
 
         Args:
             nrows(int): The number of rows in the board
             ncols(int): The number of columns in the board
+            superko(bool): True to forbid recreating any previous position instead of only the last one
+            keyframe_interval(int): the number of moves between the positions the journal keeps in full for seek()
             __current_player(GamePlayer): the current player an instance of player colors
             valid_board_lengths(set): a set of valid board lengths
             __board(list[list]): the current board that is a list of a list
-            __past_boards(list): contains instances of previous board states
+            __journal(MoveJournal): the changes made by each move, used to undo and redo moves
             consecutive_passes(int): tracks number of consecutive passes
             message(str): contains the message for the games message board
         Raises:
@@ -99,7 +168,7 @@ class GoModel:
         self.__current_player = self.player_b
 
         # Board dimensions
-        self.valid_board_lengths = (6, 9, 11, 13, 19)
+        self.valid_board_lengths = VALID_BOARD_LENGTHS
 
         # Check for invalid rows and columns
         if not isinstance(nrows, int):
@@ -118,16 +187,47 @@ class GoModel:
         self.__nrows = nrows
         self.__ncols = ncols
 
+        # Neighbors are looked up in the size's table, so the rules never bounds check a square
+        self.__adjacent = geometry(nrows).adjacent
+
         # Generate an empty board based on dimensions
         self.__board = []
         for _ in range(nrows):
             self.__board.append([None for _ in range(ncols)])
 
-        # List of previous board states
-        self.__past_boards: list = []
+        # The changes made by each move, so undo doesn't need copies of the board, and a copy every few moves for seek()
+        self.__journal = MoveJournal(keyframe_interval)
+
+        # Zobrist hashing, kept up to date on every change to the board so ko checks don't compare whole boards
+        self.__zobrist = zobrist_table(nrows, ncols)
+        self.__position_hash = 0
+        self.__position_hashes: list = [0]
+        self.__base_hashes: tuple = (0,)
+        self.__seen_positions: dict = {0: 1}
+        self.superko = superko
+
+        # Chains of connected pieces and their liberties, updated as pieces are put on and taken off the board
+        self.__chains: dict = {}
+        self.__chain_owner = object()
+
+        # Bitmask copy of the board for whole board checks and fast rollouts, __board stays the view the GUI uses
+        self.__bits = BitBoard(nrows)
+
+        # Legal moves are only worked out again around the points that changed since the last call
+        self.__playable: list = [None, None]
+        self.__changed: list = [0, 0]
+        self.__ataris: list = [0, 0]
+
+        # Counters kept up to date as pieces come and go, so nothing needs to scan the board to read them
+        self.__stone_counts: list = [0, 0]
+        self.__base_captures: tuple = (0, 0)
+        self.consistency_checks = False
 
         self.prev_placement = None
 
+        # Made by enable_profiling(), nothing is measured until then
+        self.__profiler = None
+
         # Tracks the number of consecutive passes, game ends after both players pass
         self.consecutive_passes = 0
 
@@ -142,21 +242,49 @@ class GoModel:
         return self.__current_player
 
     @property
-    def board_history(self):
+    def board_history(self) -> tuple:
+        """
+        Returns the records of the moves made so far, oldest first
+        """
+        return self.__journal.records
+
+    @property
+    def history_length(self) -> int:
+        """
+        Returns the number of moves that can be undone
+        """
+        return len(self.__journal)
+
+    @property
+    def line_length(self) -> int:
+        """
+        Returns the number of moves made plus the number of undone moves that can be redone
+        """
+        return self.__journal.line_length
+
+    @property
+    def keyframe_interval(self) -> int:
+        """
+        Returns the number of moves between the positions the journal keeps in full
+        """
+        return self.__journal.keyframe_interval
+
+    @property
+    def position_hash(self) -> int:
         """
-        Returns the list of past boards
+        Returns the Zobrist hash of the current board
         """
-        return self.__past_boards
+        return self.__position_hash
 
-    def record_board_state(self, board):
+    def record_board_state(self, record: MoveRecord):
         """
-        Appends the current board state to the board history list
+        Appends the record of a move to the move journal, which clears any moves waiting to be redone
 
         Args:
-            board(list[list]): the current board that is a list of a list
+            record(MoveRecord): the changes made by the move
 
         """
-        self.board_history.append(deepcopy(board))
+        self.__journal.push(record)
 
     @property
     def nrows(self) -> int:
@@ -172,6 +300,27 @@ class GoModel:
         """
         return self.__ncols
 
+    @property
+    def stone_counts(self) -> tuple:
+        """
+        Returns the (black, white) number of pieces on the board
+        """
+        return tuple(self.__stone_counts)
+
+    @property
+    def empty_count(self) -> int:
+        """
+        Returns the number of empty squares
+        """
+        return self.nrows * self.ncols - self.__stone_counts[0] - self.__stone_counts[1]
+
+    @property
+    def occupied(self):
+        """
+        Returns a live, read only set of the (row, col) of every piece on the board
+        """
+        return self.__chains.keys()
+
     @property
     def board(self):
         """
@@ -179,6 +328,19 @@ class GoModel:
         """
         return self.__board
 
+    def to_bitboard(self) -> BitBoard:
+        """
+        Returns an independent copy of the current board as a BitBoard, including the ko point
+        """
+        return self.__bits.copy()
+
+    def canonical_hash(self) -> tuple[int, int]:
+        """
+        Returns the Zobrist hash the board has when turned to the orientation all 8 of its rotations and reflections
+        share, and the transform (see symmetry.py) from this board to it, so moves found on it can be mapped back
+        """
+        return canonical_hash(self.__bits)
+
     @property
     def message(self):
         """
@@ -220,6 +382,23 @@ class GoModel:
             raise ValueError('Position out of bounds.')
         return self.board[pos.row][pos.col]
 
+    def chain_at(self, pos: Position) -> StoneChain | None:
+        """
+        Returns the chain of connected pieces at a given position
+
+        Args:
+            pos(Position): the position to check
+        Raises:
+            TypeError: if pos is not a Position
+            ValueError: if pos is not in the boards bounds
+        Returns:
+            The StoneChain containing the piece at pos, or None if the square is empty
+
+        """
+        if self.piece_at(pos) is None:
+            return None
+        return self.__chains[(pos.row, pos.col)]
+
     def set_piece(self, pos: Position, piece: GamePiece = None):
         """
         Sets a given piece at a given position
@@ -242,16 +421,225 @@ class GoModel:
         if not isinstance(piece, (GamePiece, type(None))):
             raise TypeError('Piece must be of type GamePiece or None.')
 
-        self.__board[pos.row][pos.col] = piece
+        self.__keep_keyframe()
+        record = MoveRecord((pos.row, pos.col), piece, self.__board[pos.row][pos.col], self.__current_player,
+                            self.consecutive_passes, self.__bits.ko)
+        self.__put(pos.row, pos.col, piece)
 
         # Setting a piece clears any streak of passes
         self.consecutive_passes = 0
 
         # Record the position for capturing
         self.prev_placement = (piece, (pos.row, pos.col))
+        self.__bits.ko = -1
 
-        # Record the board state for undo/ko
-        self.record_board_state(self.board)
+        # Record the move for undo/ko
+        self.record_board_state(record)
+        self.__record_position_hash()
+        if self.consistency_checks:
+            self.check_consistency()
+
+    def __put(self, row: int, col: int, piece: GamePiece | None):
+        """
+        Puts a piece (or None) on the board and keeps the position hash and chains in sync
+
+        Args:
+            row(int): the row of the square
+            col(int): the column of the square
+            piece(GamePiece): the piece to put, or None to empty the square
+        """
+        if self.__board[row][col] is not None:
+            self.__remove_stone(row, col)
+        if piece is not None:
+            self.__add_stone(row, col, piece)
+
+    def __neighbors(self, row: int, col: int) -> tuple:
+        """
+        Returns the coordinates of the squares above, below, left and right of a square that are on the board
+
+        Args:
+            row(int): the row of the square
+            col(int): the column of the square
+        """
+        return self.__adjacent[row][col]
+
+    def __add_stone(self, row: int, col: int, piece: GamePiece):
+        """
+        Puts a piece on an empty square, joining it to any friendly chains it touches
+
+        Args:
+            row(int): the row of the square
+            col(int): the column of the square
+            piece(GamePiece): the piece to put
+        """
+        self.__board[row][col] = piece
+        self.__bits.set(row, col, piece.color)
+        self.__stone_counts[piece.color.value] += 1
+        self.__mark_changed(row, col)
+        self.__position_hash ^= self.__zobrist[piece.color.value][row * self.ncols + col]
+
+        chain = StoneChain(piece.color, {(row, col)}, owner=self.__chain_owner)
+        self.__chains[(row, col)] = chain
+        neighbors = self.__neighbors(row, col)
+
+        # The square is no longer a liberty of the chains around it
+        for nb_coord in neighbors:
+            nb_chain = self.__chains.get(nb_coord)
+            if nb_chain is None:
+                chain.liberties.add(nb_coord)
+            else:
+                self.__own(nb_chain).liberties.discard((row, col))
+
+        for nb_coord in neighbors:
+            nb_chain = self.__chains.get(nb_coord)
+            if nb_chain is not None and nb_chain.color == piece.color:
+                chain = self.__join_chains(chain, nb_chain)
+
+    def __own(self, chain: StoneChain) -> StoneChain:
+        """
+        Returns a chain this game may change in place, first copying it for this game if it is shared with a fork
+
+        Args:
+            chain(StoneChain): a chain on the board
+        Returns:
+            The chain itself, or the copy that has taken its place on every one of its squares
+        """
+        if chain.owner is self.__chain_owner:
+            return chain
+        chain = chain.copy()
+        chain.owner = self.__chain_owner
+        self.__chains.update(dict.fromkeys(chain.stones, chain))
+        return chain
+
+    def __mark_changed(self, row: int, col: int):
+        """
+        Notes that a square changed so legal_moves() looks at the squares around it again
+        """
+        bit = 1 << self.__bits.point(row, col)
+        self.__changed[0] |= bit
+        self.__changed[1] |= bit
+
+    def __join_chains(self, chain: StoneChain, other: StoneChain) -> StoneChain:
+        """
+        Merges two chains of the same color, keeping the larger one
+
+        Args:
+            chain(StoneChain): the first chain
+            other(StoneChain): the second chain
+        Returns:
+            The merged chain
+        """
+        if chain is other:
+            return chain
+        if len(chain) < len(other):
+            chain, other = other, chain
+        chain = self.__own(chain)
+        chain.merge(other)
+        for coord in other.stones:
+            self.__chains[coord] = chain
+        return chain
+
+    def __remove_stone(self, row: int, col: int):
+        """
+        Takes a single piece off the board, splitting its chain if the piece was holding it together
+
+        Args:
+            row(int): the row of the square
+            col(int): the column of the square
+        """
+        chain = self.__chains[(row, col)]
+        piece = self.__board[row][col]
+        self.__board[row][col] = None
+        self.__bits.set(row, col, None)
+        self.__stone_counts[piece.color.value] -= 1
+        self.__mark_changed(row, col)
+        self.__position_hash ^= self.__zobrist[piece.color.value][row * self.ncols + col]
+
+        # Rebuild whatever is left of the chain, which may now be several chains
+        for coord in chain.stones:
+            del self.__chains[coord]
+        for coord in chain.stones:
+            if coord != (row, col) and coord not in self.__chains:
+                self.__build_chain(coord)
+
+        for nb_coord in self.__neighbors(row, col):
+            nb_chain = self.__chains.get(nb_coord)
+            if nb_chain is not None:
+                self.__own(nb_chain).liberties.add((row, col))
+
+    def __remove_chain(self, chain: StoneChain):
+        """
+        Takes a whole chain off the board and gives its squares back to the chains around it as liberties
+
+        Args:
+            chain(StoneChain): the chain to remove
+        """
+        key = self.__zobrist[chain.color.value]
+        self.__stone_counts[chain.color.value] -= len(chain)
+        for row, col in chain.stones:
+            self.__board[row][col] = None
+            self.__bits.set(row, col, None)
+            self.__mark_changed(row, col)
+            self.__position_hash ^= key[row * self.ncols + col]
+            del self.__chains[(row, col)]
+
+        for row, col in chain.stones:
+            for nb_coord in self.__neighbors(row, col):
+                nb_chain = self.__chains.get(nb_coord)
+                if nb_chain is not None:
+                    self.__own(nb_chain).liberties.add((row, col))
+
+    def __build_chain(self, coord: tuple) -> StoneChain:
+        """
+        Builds the chain containing the piece at a square by searching the board
+
+        Args:
+            coord(tuple[int]): the (row, col) of a piece on the board
+        Returns:
+            The new StoneChain
+        """
+        color = self.__board[coord[0]][coord[1]].color
+        chain = StoneChain(color, owner=self.__chain_owner)
+        stack = [coord]
+        while stack:
+            current = stack.pop()
+            if current in chain.stones:
+                continue
+            chain.stones.add(current)
+            self.__chains[current] = chain
+            for nb_r, nb_c in self.__neighbors(*current):
+                nb_piece = self.__board[nb_r][nb_c]
+                if nb_piece is None:
+                    chain.liberties.add((nb_r, nb_c))
+                elif nb_piece.color == color and (nb_r, nb_c) not in chain.stones:
+                    stack.append((nb_r, nb_c))
+        return chain
+
+    def __keep_keyframe(self):
+        """
+        Gives the journal a copy of the position before the next move when it is due for one
+        """
+        if self.__journal.wants_keyframe:
+            self.__journal.add_keyframe(Keyframe(self.__bits.copy(), self.__current_player,
+                                                 (self.player_b.capture_count, self.player_w.capture_count),
+                                                 self.consecutive_passes))
+
+    def __record_position_hash(self):
+        """
+        Appends the current position hash to the list of previous positions and to the record of the newest move
+        """
+        self.__journal.top.position_hash = self.__position_hash
+        self.__position_hashes.append(self.__position_hash)
+        self.__seen_positions[self.__position_hash] = self.__seen_positions.get(self.__position_hash, 0) + 1
+
+    def __forget_position_hash(self):
+        """
+        Removes the most recent position hash from the list of previous positions
+        """
+        old_hash = self.__position_hashes.pop()
+        self.__seen_positions[old_hash] -= 1
+        if self.__seen_positions[old_hash] == 0:
+            del self.__seen_positions[old_hash]
 
     def set_next_player(self):
         """
@@ -268,8 +656,13 @@ class GoModel:
         """
         Incriments consecutive_passes, Sets next player, and sets previous placement to none
         """
+        self.__keep_keyframe()
+        self.record_board_state(MoveRecord(None, None, None, self.__current_player, self.consecutive_passes, self.__bits.ko))
         self.consecutive_passes += 1
         self.prev_placement = None
+
+        # The ko point only ever applies to the very next move
+        self.__bits.ko = -1
         self.set_next_player()
 
     def is_game_over(self):
@@ -281,11 +674,7 @@ class GoModel:
             return True
 
         # Check if there are any more places to play
-        for r_index, row in enumerate(self.board):
-            for c_index, ele in enumerate(row):
-                if ele is None:
-                    return False
-        return True
+        return self.empty_count == 0
 
     def is_valid_placement(self, pos: Position, piece: GamePiece) -> bool:
         """
@@ -297,165 +686,556 @@ class GoModel:
         Returns:
             True or False depending on if the piece can be placed
         """
-        if not piece.is_valid_placement(pos, self.board):
+        if not isinstance(pos, Position) or not isinstance(piece, GamePiece):
             return False
-
-        potential_board = copy(self.board)
-        potential_board[pos.row][pos.col] = piece
-
-        if self.check_ko(potential_board):
+        if not (0 <= pos.row < self.nrows) or not (0 <= pos.col < self.ncols):
+            return False
+        if self.board[pos.row][pos.col] is not None:
             return False
 
         # You can also place a piece if it captures an enemy group
         # The enemy group must be in atari (only one liberty)
+        # Otherwise it needs a liberty of its own or through a friendly chain, which also covers the
+        # neighbor checks of GamePiece.is_valid_placement()
+        captured = self.__captured_by(pos.row, pos.col, piece.color)
+        if not captured and not self.__keeps_a_liberty(pos, piece):
+            return False
 
+        if self.check_ko(self.__hash_after(pos.row, pos.col, piece.color, captured)):
+            return False
 
+        return True
 
+    def legal_moves(self) -> int:
+        """
+        Returns every point the current player can play at, taking suicide, captures and ko into account the same way
+        is_valid_placement() does
 
+        Only the squares around the stones that changed since the last call are checked again, so calling this after
+        every move costs about as much as the move itself.
 
+        Returns:
+            A BitBoard style mask, the bit for (row, col) is to_bitboard().point(row, col)
+        """
+        color = self.current_player.player_color
+        bits = self.__bits
+        playable = self.__playable[color.value]
+        changed = self.__changed[color.value]
+        enemy = bits.stones[color.opponent().value]
+        if playable is None:
+            playable = self.__playable_points(bits.mask, color)
+            self.__ataris[color.value] = self.__chains_in_atari(enemy, enemy)
+        elif changed:
+            # A square's legality only depends on its neighbors and the liberties of the chains next to it, so only
+            # the changed squares, their neighbors and the liberties of every chain touching them need another look
+            region = changed | bits.neighbors(changed)
+            black, white = bits.stones
+            touched = bits.flood(region & black, black) | bits.flood(region & white, white)
+            empty = bits.empty()
+            stale = (region | bits.neighbors(touched)) & empty
+            playable = (playable & empty & ~stale) | self.__playable_points(stale, color)
+
+            # Only the touched enemy chains can have gained or lost liberties
+            self.__ataris[color.value] = ((self.__ataris[color.value] & enemy & ~touched)
+                                          | self.__chains_in_atari(touched & enemy, enemy))
+        self.__playable[color.value] = playable
+        self.__changed[color.value] = 0
+
+        # Only a capture can bring back the previous board, with superko any move might repeat an older one
+        if self.superko:
+            candidates = playable
+        else:
+            candidates = bits.neighbors(self.__ataris[color.value]) & playable
+
+        legal = playable
+        for point in iter_points(candidates):
+            row, col = bits.coords(point)
+            if self.check_ko(self.__hash_after(row, col, color, self.__captured_by(row, col, color))):
+                legal &= ~(1 << point)
+        return legal
+
+    def __chains_in_atari(self, stones: int, same_color: int) -> int:
+        """
+        Returns the pieces of the chains with only one liberty, out of the chains with a piece in a BitBoard style mask
 
-    def check_ko(self, potential_board) -> bool:
+        Args:
+            stones(int): the mask of pieces whose chains should be checked
+            same_color(int): the mask of every piece of their color
         """
-        Checks if placing a piece will cause a previous board state that ended up as a capture
+        bits = self.__bits
+        empty = bits.empty()
+        ataris = 0
+        while stones:
+            chain = bits.flood(stones & -stones, same_color)
+            stones &= ~chain
+            if (bits.neighbors(chain) & empty).bit_count() == 1:
+                ataris |= chain
+        return ataris
+
+    def __playable_points(self, points: int, color: PlayerColors) -> int:
+        """
+        Returns the points of a BitBoard style mask that are empty and wouldn't be suicide for a color, without looking at ko
 
         Args:
-            potential_board(list[list]): a copy of the current board with the next placed piece
+            points(int): the mask of points to check
+            color(PlayerColors): the color of the piece to place
+        """
+        bits = self.__bits
+        empty = bits.empty()
+        points &= empty
+
+        # Points touching an empty point are always playable, the rest only need the liberty counts of the chains around them
+        playable = points & bits.neighbors(empty)
+        for point in iter_points(points & ~playable):
+            row, col = bits.coords(point)
+            for nb_coord in self.__neighbors(row, col):
+                chain = self.__chains[nb_coord]
+                liberties = len(chain.liberties)
+                if (chain.color == color and liberties > 1) or (chain.color != color and liberties == 1):
+                    playable |= 1 << point
+                    break
+        return playable
+
+    def __captured_by(self, row: int, col: int, color: PlayerColors) -> set:
+        """
+        Finds the enemy pieces that would be captured if a piece was placed at a given square
+
+        Args:
+            row(int): the row of the placement
+            col(int): the column of the placement
+            color(PlayerColors): the color of the piece to place
         Returns:
-            True or False depending on if the future board will be the same as the board from the current players last turn
+            A set of (row, col) coordinates of the enemy pieces that would be removed
+        """
+        captured = set()
+        coord = (row, col)
+        for nb_coord in self.__neighbors(row, col):
+            chain = self.__chains.get(nb_coord)
 
+            # An enemy chain is captured if the placed piece fills its last liberty
+            if chain is not None and chain.color != color and len(chain.liberties) == 1 and coord in chain.liberties:
+                captured |= chain.stones
+        return captured
+
+    def __hash_after(self, row: int, col: int, color: PlayerColors, captured: set) -> int:
         """
-        # Ko isn't actually possible until 2 moves have been made
-        if len(self.board_history) > 2:
-            # REVIEW: is -2 the right index???
-            if are_boards_identical(potential_board, self.board_history[-2]):
+        Works out the hash of the board after a placement and its captures without changing the board
+
+        Args:
+            row(int): the row of the placement
+            col(int): the column of the placement
+            color(PlayerColors): the color of the piece to place
+            captured(set): the (row, col) of every piece the placement captures
+        """
+        potential_hash = self.__position_hash ^ self.__zobrist[color.value][row * self.ncols + col]
+        for r, c in captured:
+            potential_hash ^= self.__zobrist[self.board[r][c].color.value][r * self.ncols + c]
+        return potential_hash
+
+    def __keeps_a_liberty(self, pos: Position, piece: GamePiece) -> bool:
+        """
+        Checks that a placed piece would have at least one liberty, either its own or through a friendly chain
+
+        Args:
+            pos(Position): the position of the placement
+            piece(GamePiece): the piece to place
+        Returns:
+            True if the placement is not suicide
+        """
+        for nb_coord in self.__neighbors(pos.row, pos.col):
+            chain = self.__chains.get(nb_coord)
+            if chain is None:
+                return True
+            if chain.color == piece.color and len(chain.liberties) > 1:
                 return True
         return False
 
-    def calculate_score(self) -> list:
+    def check_ko(self, potential_hash: int) -> bool:
+        """
+        Checks if placing a piece would recreate a previous board state
+
+        Args:
+            potential_hash(int): the Zobrist hash of the board after the placement and its captures
+        Returns:
+            True or False depending on if the future board will be the same as the board from the current players last turn,
+            or any previous board when superko is on
+
         """
-        Calculates the score of the game
+        if self.superko:
+            return potential_hash in self.__seen_positions
+
+        # Ko isn't actually possible until 2 moves have been made
+        if len(self.__position_hashes) >= 2:
+            return potential_hash == self.__position_hashes[-2]
+        return False
+
+    def settled_areas(self) -> tuple[int, int]:
         """
-        pass
+        Returns the points each player owns however the game goes on, found with Benson's algorithm: the chains that
+        can't be captured even if their player always passes, and the regions they enclose that the opponent can't live
+        in, dead opponent stones included
 
-    def undo(self):
+        Returns:
+            A (black, white) tuple of BitBoard style masks, the bit for (row, col) is to_bitboard().point(row, col)
         """
-        Undoes a single turn by setting the board to the previous state and changing current player
+        return self.__bits.settled()
+
+    def calculate_score(self, komi: float = 6.5, dead_stones=None) -> list:
         """
-        # Check that undoing is possible
-        if len(self.board_history) == 0:
-            raise UndoException("No moves left to undo.")
+        Calculates the score of the game from territory, pieces on the board and captured pieces
 
-        # Go back one move and remove it from the history
-        self.__board = self.board_history.pop()
+        Dead stones are taken off a copy of the board and counted as captured by the other player before territory is
+        worked out, so the points around them can count as territory. Stones in a region settled by the opponent's
+        unconditionally alive chains (see BitBoard.settled()) are dead whatever is played, so they are always taken off
+        too. The game itself isn't changed.
 
-    def lower_all_flags(self):
+        Args:
+            komi(float): the points given to white for playing second
+            dead_stones: the (row, col) of the stones agreed to be dead, such as OwnershipMap.dead_stones
+        Returns:
+            [black_score, white_score]
         """
-        Sets flag value of remaining pieces to false
+        bits = self.__bits
+        captures = [self.player_b.capture_count, self.player_w.capture_count]
+        if dead_stones:
+            bits = bits.copy()
+            for row, col in dead_stones:
+                color = bits.get(row, col)
+                if color is not None:
+                    bits.set(row, col, None)
+                    captures[color.opponent().value] += 1
+        black_area, white_area = bits.area()
+        return [black_area + captures[0], white_area + captures[1] + komi]
+
+    def restore_position(self, bits: BitBoard, to_move: PlayerColors, captures: tuple = (0, 0),
+                         consecutive_passes: int = 0):
         """
-        for row_i, row in enumerate(self.board):
-            for col_i, ele in enumerate(row):
-                if isinstance(ele, GamePiece):
-                    ele.lower_flag()
+        Replaces the game with a position, as if it had just been reached: there are no moves to undo or redo
 
-    def capture(self):
+        If the position has a ko point, the position before the ko capture is put back into the history so check_ko()
+        still forbids the immediate recapture.
+
+        Args:
+            bits(BitBoard): the stones and ko point of the position
+            to_move(PlayerColors): the color of the player to move
+            captures(tuple[int]): the (black, white) capture counts
+            consecutive_passes(int): the number of consecutive passes that led to the position
+        Raises:
+            ValueError: if the BitBoard isn't the size of the board
+        """
+        if bits.size != self.nrows:
+            raise ValueError(f'Position is {bits.size}x{bits.size} but the board is {self.nrows}x{self.ncols}.')
+
+        self.__load(bits, self.__player_for(to_move), captures, consecutive_passes)
+        self.__journal = MoveJournal(self.__journal.keyframe_interval)
+        self.__position_hashes = [self.__position_hash]
+        if bits.ko >= 0:
+            # The capturing stone is the lone stone in atari next to the ko point, before the capture the ko point
+            # held a stone of the player to move and the capturing stone wasn't there
+            ko_coord = bits.coords(bits.ko)
+            capturer = to_move.opponent()
+            for nb_coord in self.__neighbors(*ko_coord):
+                chain = self.__chains.get(nb_coord)
+                if chain is not None and chain.color == capturer and len(chain) == 1 and chain.liberties == {ko_coord}:
+                    previous_hash = (self.__position_hash
+                                     ^ self.__zobrist[capturer.value][nb_coord[0] * self.ncols + nb_coord[1]]
+                                     ^ self.__zobrist[to_move.value][ko_coord[0] * self.ncols + ko_coord[1]])
+                    self.__position_hashes.insert(0, previous_hash)
+                    break
+        self.__base_hashes = tuple(self.__position_hashes)
+        self.__seen_positions = {}
+        for position_hash in self.__position_hashes:
+            self.__seen_positions[position_hash] = self.__seen_positions.get(position_hash, 0) + 1
+        self.__base_captures = tuple(captures)
+        self.message = f"Position restored. It's {to_move.name}'s turn."
+        if self.consistency_checks:
+            self.check_consistency()
+
+    def __load(self, bits: BitBoard, player: GamePlayer, captures: tuple, consecutive_passes: int):
         """
-        Checks if placing a piece will cause the capture of the enemies piece or pieces, lowers all flags, and records the board state.
+        Replaces the board, player to move, capture counts and passes with a position, leaving the journal and the
+        list of previous positions alone
 
         Args:
-            prev_piece(GamePiece): the previously placed piece
-            prev_pos(Position): the position previously placed piece
-        Returns:
-            Nothing if there is no capture occuring, otherwise the piece or pieces will be removed from the board and capture count will be incremented
+            bits(BitBoard): the stones and ko point of the position, copied so it isn't changed
+            player(GamePlayer): the player to move
+            captures(tuple[int]): the (black, white) capture counts
+            consecutive_passes(int): the number of consecutive passes that led to the position
+        """
+        self.__board = [[None for _ in range(self.ncols)] for _ in range(self.nrows)]
+        self.__bits = bits.copy()
+        self.__bits.rehash()
+        self.__position_hash = self.__bits.position_hash
+        self.__playable = [None, None]
+        self.__changed = [0, 0]
+        self.__ataris = [0, 0]
+        self.__stone_counts = [bits.stones[0].bit_count(), bits.stones[1].bit_count()]
+
+        # Each chain and its liberties are found with whole board masks instead of searching square by square
+        self.__chains = {}
+        stride = bits.stride
+        empty = bits.empty()
+        for color in PlayerColors:
+            piece = stone(color)
+            remaining = bits.stones[color.value]
+            while remaining:
+                chain_mask = bits.flood(remaining & -remaining, remaining)
+                remaining ^= chain_mask
+                chain = StoneChain(color, {divmod(point, stride) for point in iter_points(chain_mask)},
+                                   {divmod(point, stride) for point in iter_points(bits.neighbors(chain_mask) & empty)},
+                                   self.__chain_owner)
+                for row, col in chain.stones:
+                    self.__board[row][col] = piece
+                    self.__chains[(row, col)] = chain
+
+        self.__current_player = player
+        self.player_b.capture_count, self.player_w.capture_count = captures
+        self.consecutive_passes = consecutive_passes
+        self.prev_placement = None
 
+    def check_consistency(self):
         """
-        # look for groups of stones connected vertically and horizontally - NOT DIAGONALLY
-        # if any of them are completely surrounded with no liberties, then they are captureable
+        Checks the stone counts, occupied squares and capture counts against a full scan of the board and journal
 
-        if self.prev_placement is None:
-            return
+        Raises:
+            ConsistencyError: if any counter doesn't match, naming every counter that is off
+        """
+        counts = [0, 0]
+        occupied = set()
+        for row, pieces in enumerate(self.__board):
+            for col, piece in enumerate(pieces):
+                if piece is not None:
+                    counts[piece.color.value] += 1
+                    occupied.add((row, col))
+
+        captures = list(self.__base_captures)
+        for record in self.__journal.records:
+            if record.captured:
+                captures[record.piece.color.value] += len(record.captured)
+
+        problems = []
+        if self.__stone_counts != counts:
+            problems.append(f'stone counts are {self.__stone_counts} but the board has {counts}')
+        if [mask.bit_count() for mask in self.__bits.stones] != counts:
+            problems.append(f'the BitBoard does not have the {counts} pieces on the board')
+        if self.occupied != occupied:
+            problems.append(f'{len(self.occupied ^ occupied)} squares are wrongly marked occupied or empty')
+        if [self.player_b.capture_count, self.player_w.capture_count] != captures:
+            problems.append(f'capture counts are {[self.player_b.capture_count, self.player_w.capture_count]} '
+                            f'but the moves captured {captures}')
+        if problems:
+            raise ConsistencyError('; '.join(problems) + '.')
 
-        prev_piece = self.prev_placement[0]
-        prev_coord = self.prev_placement[1]
+    def undo(self):
+        """
+        Undoes a single turn by reversing the changes it made and giving the turn back to the player who made it
 
-        # We want to capture the pieces of the opponent of whoever played the last stone
-        target_color: PlayerColors = prev_piece.color.opponent()
+        Raises:
+            UndoException: if there are no moves left to undo
+        """
+        # Check that undoing is possible
+        if len(self.__journal) == 0:
+            raise UndoException("No moves left to undo.")
 
-        left_coord = (prev_coord[0], prev_coord[1] - 1)
-        right_coord = (prev_coord[0], prev_coord[1] + 1)
-        up_coord = (prev_coord[0] - 1, prev_coord[1])
-        down_coord = (prev_coord[0] + 1, prev_coord[1])
+        record = self.__journal.undo()
+        if not record.is_pass:
+            # Put back the piece that was replaced and the exact pieces that were captured
+            row, col = record.coord
+            self.__put(row, col, record.replaced)
+            for (cap_row, cap_col), piece in record.captured:
+                self.__put(cap_row, cap_col, piece)
+            if record.captured:
+                self.__player_for(record.piece.color).capture_count -= len(record.captured)
+            self.__forget_position_hash()
+
+        self.__bits.ko = record.ko
+        self.consecutive_passes = record.consecutive_passes
+        self.prev_placement = None
+        self.__current_player = self.__player_for(record.player.player_color)
+        self.message = f"Move undone. Now it's {self.current_player.player_color.name}'s turn."
+        if self.consistency_checks:
+            self.check_consistency()
 
-        # look for groups of opponents in all 4 cardinal directions
-        # group elements are tuples in the format: (piece, (row, col))
-        left_group = self.find_group(
-            board = self.board,
-            target_color = target_color,
-            target_coords = left_coord)
+    def redo(self):
+        """
+        Replays the most recently undone turn
 
-        right_group = self.find_group(
-            board = self.board,
-            target_color = target_color,
-            target_coords = right_coord)
+        Raises:
+            UndoException: if there are no undone moves to redo
+        """
+        if not self.__journal.can_redo:
+            raise UndoException("No moves left to redo.")
+
+        record = self.__journal.redo()
+        self.__current_player = self.__player_for(record.player.player_color)
+        if record.is_pass:
+            self.consecutive_passes = record.consecutive_passes + 1
+            self.__bits.ko = -1
+        else:
+            row, col = record.coord
+            self.__put(row, col, record.piece)
+            for coord, _ in record.captured:
+                if coord in self.__chains:
+                    self.__remove_chain(self.__chains[coord])
+            if record.captured:
+                self.__player_for(record.piece.color).capture_count += len(record.captured)
+            self.consecutive_passes = 0
+            self.__update_ko(record.coord, len(record.captured))
+            self.__record_position_hash()
+        self.prev_placement = None
+        self.set_next_player()
+        if self.consistency_checks:
+            self.check_consistency()
 
-        up_group = self.find_group(
-            board = self.board,
-            target_color = target_color,
-            target_coords = up_coord)
+    def seek(self, move_number: int):
+        """
+        Undoes or redoes moves until a given number of moves of the game's line have been made
 
-        down_group = self.find_group(
-            board = self.board,
-            target_color = target_color,
-            target_coords = down_coord)
+        Short hops undo or redo one move at a time. Longer ones load the nearest keyframe at or before the move and
+        redo the moves after it, so reaching any move costs at most one keyframe load and keyframe_interval redos
+        however long the game is.
 
-        groups = (left_group, right_group, up_group, down_group)
+        Args:
+            move_number(int): the number of moves to leave made, from 0 for the start of the game to line_length
+        Raises:
+            TypeError: if move_number is not an integer
+            ValueError: if move_number is negative or more than line_length
+        """
+        if not isinstance(move_number, int):
+            raise TypeError('Move number must be an integer.')
+        if not 0 <= move_number <= self.line_length:
+            raise ValueError(f'Move number must be between 0 and {self.line_length}.')
+
+        keyframe_number, keyframe = self.__journal.keyframe_before(move_number)
+        if keyframe is not None:
+            load_cost = (keyframe.bits.stones[0] | keyframe.bits.stones[1]).bit_count() // STONES_PER_STEP
+            use_keyframe = move_number - keyframe_number + load_cost < abs(move_number - len(self.__journal))
+        else:
+            use_keyframe = False
+        if use_keyframe:
+            self.__load(keyframe.bits, self.__player_for(keyframe.player.player_color), keyframe.captures,
+                        keyframe.consecutive_passes)
+            self.__journal.jump(keyframe_number)
+            self.__position_hashes = list(self.__base_hashes)
+            self.__position_hashes.extend(record.position_hash for record in self.__journal.records if not record.is_pass)
+            self.__seen_positions = {}
+            for position_hash in self.__position_hashes:
+                self.__seen_positions[position_hash] = self.__seen_positions.get(position_hash, 0) + 1
+
+        while len(self.__journal) > move_number:
+            self.undo()
+        while len(self.__journal) < move_number:
+            self.redo()
+        self.message = f"At move {move_number} of {self.line_length}. It's {self.current_player.player_color.name}'s turn."
+        if self.consistency_checks:
+            self.check_consistency()
+
+    def fork(self) -> 'GoModel':
+        """
+        Returns an independent copy of the game, for searching or trying out moves without touching this one
 
-        # Find the neighboring spaces of all the pieces in the group
-        for group in groups:
-            found_empty = False
+        The board and counters are copied, which takes time in proportion to the size of the board. Everything else
+        is shared and copied on write: both games stop owning their chains, so whichever changes a chain first gets
+        its own copy, and the copy gets its own lists of move records while the records and keyframes themselves are
+        the same objects, see MoveJournal.fork(). The copy has its own players, so moves, undos and seeks in either
+        game never change the other. It isn't being profiled even if this game is.
+        """
+        child = GoModel.__new__(GoModel)
+        child.player_b = GamePlayer(PlayerColors.BLACK, self.player_b.capture_count, self.player_b.skip_count)
+        child.player_w = GamePlayer(PlayerColors.WHITE, self.player_w.capture_count, self.player_w.skip_count)
+        child.__current_player = child.__player_for(self.__current_player.player_color)
+        child.valid_board_lengths = self.valid_board_lengths
+        child.__nrows = self.__nrows
+        child.__ncols = self.__ncols
+        child.__adjacent = self.__adjacent
+        child.__board = [row[:] for row in self.__board]
+        child.__journal = self.__journal.fork()
+        child.__zobrist = self.__zobrist
+        child.__position_hash = self.__position_hash
+        child.__position_hashes = self.__position_hashes[:]
+        child.__base_hashes = self.__base_hashes
+        child.__seen_positions = self.__seen_positions.copy()
+        child.superko = self.superko
+
+        # Neither game owns the chains they now share, see __own()
+        child.__chains = self.__chains.copy()
+        child.__chain_owner = object()
+        self.__chain_owner = object()
+
+        child.__bits = self.__bits.copy()
+        child.__playable = self.__playable[:]
+        child.__changed = self.__changed[:]
+        child.__ataris = self.__ataris[:]
+        child.__stone_counts = self.__stone_counts[:]
+        child.__base_captures = self.__base_captures
+        child.consistency_checks = self.consistency_checks
+        child.prev_placement = self.prev_placement
+        child.__profiler = None
+        child.consecutive_passes = self.consecutive_passes
+        child.__message = self.__message
+        return child
+
+    def __player_for(self, color: PlayerColors) -> GamePlayer:
+        """
+        Returns the player who plays a given color
+        """
+        return self.player_b if color == PlayerColors.BLACK else self.player_w
 
-            for data_pair in group:
-                piece, pos = data_pair
-                r, c = pos
+    def __update_ko(self, coord: tuple, captured_count: int):
+        """
+        Sets the ko point left behind by a placement, if there is one
 
-                left_nb = (r, c - 1)
-                right_nb = (r, c + 1)
-                up_nb = (r - 1, c)
-                down_nb = (r + 1, c)
+        Args:
+            coord(tuple[int]): the (row, col) of the placed piece
+            captured_count(int): the number of pieces the placement captured
+        """
+        # A lone piece that captured a lone piece and sits in atari leaves a ko point behind
+        own_chain = self.__chains.get(coord)
+        if captured_count == 1 and own_chain is not None and len(own_chain) == 1 and len(own_chain.liberties) == 1:
+            ko_row, ko_col = next(iter(own_chain.liberties))
+            self.__bits.ko = self.__bits.point(ko_row, ko_col)
+        else:
+            self.__bits.ko = -1
 
-                neighbors = (left_nb, right_nb, up_nb, down_nb)
+    def capture(self):
+        """
+        Removes the enemy chains left without liberties by the last placed piece and adds them to the placing player's capture count
 
-                # Check if any of the neighboring spaces are empty. If none of the pieces are touching an empty space, the group is surrounded.
-                for nb_coord in neighbors:
-                    try:
-                        if self.piece_at(Position(*nb_coord)) is None:
-                            found_empty = True
-                            break # don't need to keep going
+        Returns:
+            Nothing if there is no capture occuring, otherwise the piece or pieces will be removed from the board and capture count will be incremented
 
-                    # Ignore out of bounds error because board edges count towards being surrounded
-                    except ValueError:
-                        pass
+        """
+        if self.prev_placement is None:
+            return
 
-            # If the group is surrounded raise its pieces' flags
-            if not found_empty:
-                for data_pair in group:
-                    piece, pos = data_pair
-                    piece.raise_flag()
+        prev_piece, prev_coord = self.prev_placement
+        self.prev_placement = None
+        if prev_piece is None:
+            return
 
-            self.remove_flagged_pieces()
+        # We want to capture the pieces of the opponent of whoever played the last stone
+        target_color: PlayerColors = prev_piece.color.opponent()
 
-            self.prev_placement  = None
+        # Only the chains touching the placed piece can have lost their last liberty
+        record = self.__journal.top
+        captured_count = 0
+        for nb_coord in self.__neighbors(*prev_coord):
+            chain = self.__chains.get(nb_coord)
+            if chain is not None and chain.color == target_color and not chain.liberties:
+                captured_count += len(chain)
+                record.captured.extend((coord, self.__board[coord[0]][coord[1]]) for coord in chain.stones)
+                self.__remove_chain(chain)
 
-    def remove_flagged_pieces(self):
-        """
-        Removes pieces with a true flag value from the board
-        """
-        # Remove all flagged stones from board
-        for row_i, row in enumerate(self.board):
-            for col_i, ele in enumerate(row):
-                if isinstance(ele, GamePiece):
-                    self.current_player.capture_count += 1
-                    if ele.flag:
-                        self.board[row_i][col_i] = None
+        if captured_count:
+            self.__player_for(prev_piece.color).capture_count += captured_count
+
+        self.__update_ko(prev_coord, captured_count)
+
+        # The move is finished, so the position it left behind replaces the one recorded by set_piece
+        self.__forget_position_hash()
+        self.__record_position_hash()
+        if self.consistency_checks:
+            self.check_consistency()
 
     def find_group(self, board, target_color: PlayerColors, target_coords: tuple[int, int], group = None) -> list:
         """
@@ -465,34 +1245,81 @@ class GoModel:
             board(list[list]): the current board
             target_color(PlayerColor): the color of the piece
             target_coords(tuple[int]): the coordinates of the piece who's neighbors will be checked
-            group(list): a list of horizontally and vertically adjacent pieces
+            group(list): a list of horizontally and vertically adjacent pieces to add to
+        Returns:
+            A list of (piece, (row, col)) tuples for every piece in the group
 
         """
-        r, c = target_coords
-
         if group is None:
             group = []
+        seen = {coord for _, coord in group}
 
-        if (0 <= r < len(board)) and (0 <= c < len(board)):
+        r, c = target_coords
+        if not (0 <= r < len(board)) or not (0 <= c < len(board[0])):
+            return group
+        adjacent = neighbor_table(len(board), len(board[0]))
+
+        # Search with a stack instead of recursion so large groups can't hit the recursion limit
+        stack = [target_coords]
+        while stack:
+            r, c = stack.pop()
+            if (r, c) in seen:
+                continue
             piece = board[r][c]
 
-            if piece is None or (piece, (r, c)) in group:
-             pass
+            # if the piece is the color we are looking for
+            if isinstance(piece, GamePiece) and piece.color == target_color:
+                seen.add((r, c))
+                group.append((piece, (r, c)))
+                stack.extend(adjacent[r][c])
+        return group
+
+    def enable_profiling(self, window: int = 10_000):
+        """
+        Starts measuring the call count, wall time and squares visited of each of the PROFILED_METHODS
+
+        The methods are only wrapped while profiling is on, so a model that isn't being profiled runs exactly as fast as
+        one that never was.
 
-        # if the piece is the color we are looking for
-            elif isinstance(piece, GamePiece):
-                if piece.color == target_color:
-                    group.append((piece, (r, c)))
+        Args:
+            window(int): the number of recent calls kept per method for the p50 and p99 times
+        """
+        if self.__profiler is None:
+            # Every square the model looks at goes through __neighbors, except in find_group, which walks a board
+            # that may not be the model's and pushes at most 4 squares for each piece it finds
+            self.__profiler = Profiler(self, PROFILED_METHODS, '_GoModel__neighbors',
+                                       {'find_group': lambda group: 4 * len(group) + 1}, window)
+        self.__profiler.enable()
+
+    def disable_profiling(self):
+        """
+        Stops measuring and puts the unmeasured methods back, keeping what has been measured so far
+        """
+        if self.__profiler is not None:
+            self.__profiler.disable()
 
-                    # look left
-                    self.find_group(board, target_color, (r, c - 1), group)
+    @property
+    def profiling(self) -> bool:
+        """
+        Returns True while the PROFILED_METHODS are being measured
+        """
+        return self.__profiler is not None and self.__profiler.enabled
 
-                    # look right
-                    self.find_group(board, target_color, (r, c + 1), group)
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the measurements made since profiling was first enabled or last reset
 
-                    # look up
-                    self.find_group(board, target_color, (r - 1, c), group)
+        Returns:
+            A dict mapping each name in PROFILED_METHODS to its calls, total_seconds, mean_seconds, p50_seconds,
+            p99_seconds and cells_visited, or an empty dict if profiling was never enabled
+        """
+        if self.__profiler is None:
+            return {}
+        return self.__profiler.stats()
 
-                    # look down
-                    self.find_group(board, target_color, (r + 1, c), group)
-        return group
+    def reset_stats(self):
+        """
+        Forgets every measurement, profiling stays on if it was on
+        """
+        if self.__profiler is not None:
+            self.__profiler.reset()
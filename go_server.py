@@ -0,0 +1,518 @@
+"""
+Title: GoServer Class
+Purpose: Hosts many GoModel games in one asyncio process behind a JSON lines socket protocol, with a load generator to measure it
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from eval_cache import EvalCache
+from game_piece import stone
+from go_model import GoModel, UndoException, VALID_BOARD_LENGTHS
+from mcts_player import MCTSPlayer
+from position import Position
+
+
+class Session:
+    """
+    Represents one game hosted by the server
+
+    Attributes:
+        model(GoModel): the game
+        lock(asyncio.Lock): held while a command runs, so commands for the same game never overlap
+        last_used(float): the event loop time of the last command, used to evict idle sessions
+    """
+    __slots__ = ('model', 'lock', 'last_used')
+
+    def __init__(self, model: GoModel, now: float):
+        """
+        Initializes a session around a new game
+        """
+        self.model = model
+        self.lock = asyncio.Lock()
+        self.last_used = now
+
+
+class GoServer:
+    """
+    Represents a server hosting many games at once
+
+    Each request is one JSON object on its own line, such as {"id": 1, "cmd": "place", "session": "3", "row": 2,
+    "col": 4}, and each reply is one JSON line with the same id, "ok" and either the result or an "error".
+
+    Commands:
+        new: starts a game ("size", "superko") and returns its "session" and state
+        place: plays the current player's piece at "row", "col"
+        pass: passes the current player's turn
+        undo: undoes the last move
+        seek: undoes or redoes moves until "move" moves of the game have been made, for reviewing a game
+        state: returns the board, the player to move, the capture counts and whether the game is over
+        legal: returns the [row, col] of every valid placement for the player to move
+        score: scores the game ("komi"), answering from the evaluation cache when the position was scored before
+        ai: lets the computer choose and play the current player's move ("playouts")
+        close: ends the game
+
+    Attributes:
+        idle_timeout(float): the number of seconds a session may go unused before it is evicted
+        max_sessions(int): the largest number of sessions hosted at once
+        sessions(dict): the sessions by id
+        sockets(list): the sockets being listened on, once serve() has started
+        eval_cache(EvalCache): the scores of positions already scored, shared by every session
+        __ids: counts up the session ids
+        __ai_workers(int): the number of processes used for computer moves
+        __ai_executor(ProcessPoolExecutor): runs computer moves, made when the first one is asked for
+    Methods:
+        handle(): runs one request and returns the reply
+        handle_client(): serves the requests of one connection until it closes
+        evict_idle(): removes the sessions that have been idle too long
+        serve(): listens on a TCP port or Unix socket until cancelled
+        close(): shuts down the computer move processes and saves the evaluation cache if it has a file
+    """
+    def __init__(self, idle_timeout: float = 600.0, max_sessions: int = 10_000, ai_workers: int = 1,
+                 eval_cache: EvalCache = None):
+        """
+        Initializes a server with no sessions
+
+        Args:
+            idle_timeout(float): the number of seconds a session may go unused before it is evicted
+            max_sessions(int): the largest number of sessions hosted at once
+            ai_workers(int): the number of processes used for computer moves
+            eval_cache(EvalCache): the cache scores go through, by default a new in-memory cache keyed by the plain
+                position hash, since hashing a position's canonical orientation costs more than most scores save
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: dict = {}
+        self.sockets: list = []
+        self.eval_cache = eval_cache if eval_cache is not None else EvalCache()
+        self.__ids = itertools.count(1)
+        self.__ai_workers = ai_workers
+        self.__ai_executor = None
+        self.__commands = {
+            'new': self.__new,
+            'place': self.__place,
+            'pass': self.__pass,
+            'undo': self.__undo,
+            'seek': self.__seek,
+            'state': self.__state,
+            'legal': self.__legal,
+            'score': self.__score,
+            'ai': self.__ai,
+            'close': self.__close,
+        }
+
+    async def handle(self, request: dict) -> dict:
+        """
+        Runs one request and returns the reply, turning any problem with the request into an error reply
+
+        Args:
+            request(dict): the decoded request
+        Returns:
+            The reply, with the request's id
+        """
+        reply = {'id': request.get('id') if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object.')
+            command = self.__commands.get(request.get('cmd'))
+            if command is None:
+                raise ValueError(f"Unknown command {request.get('cmd')!r}, use one of {sorted(self.__commands)}.")
+            reply.update(await command(request))
+            reply['ok'] = True
+        except (ValueError, TypeError, KeyError, UndoException) as error:
+            reply['ok'] = False
+            reply['error'] = str(error) if not isinstance(error, KeyError) else f'Missing or unknown {error}.'
+        except Exception as error:
+            # A bug in one command mustn't take down the connection and every other request on it
+            reply['ok'] = False
+            reply['error'] = f'Internal error: {type(error).__name__}: {error}'
+        return reply
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves the requests of one connection in order until it closes
+
+        A line longer than the reader's limit gets an error reply and ends the connection, since the rest of the line
+        can't be told apart from the next request.
+
+        Args:
+            reader(asyncio.StreamReader): the connection's incoming side
+            writer(asyncio.StreamWriter): the connection's outgoing side
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    reply = {'id': None, 'ok': False, 'error': 'Request line is too long.'}
+                    writer.write(json.dumps(reply).encode() + b'\n')
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as error:
+                    reply = {'id': None, 'ok': False, 'error': f'Invalid JSON: {error}.'}
+                else:
+                    reply = await self.handle(request)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def evict_idle(self, now: float = None) -> int:
+        """
+        Removes the sessions that haven't been used for idle_timeout seconds and aren't running a command
+
+        Args:
+            now(float): the event loop time to measure idleness from, the current time by default
+        Returns:
+            The number of sessions removed
+        """
+        if now is None:
+            now = asyncio.get_running_loop().time()
+        idle = [session_id for session_id, session in self.sessions.items()
+                if now - session.last_used > self.idle_timeout and not session.lock.locked()]
+        for session_id in idle:
+            del self.sessions[session_id]
+        return len(idle)
+
+    async def __evict_forever(self):
+        """
+        Evicts idle sessions a few times per idle_timeout
+        """
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.01))
+            self.evict_idle()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, path: str = None, ready: asyncio.Event = None):
+        """
+        Listens for connections until cancelled
+
+        Args:
+            host(str): the address to listen on
+            port(int): the TCP port to listen on, 0 picks a free one
+            path(str): the path of a Unix socket to listen on instead of TCP
+            ready(asyncio.Event): set once the server is listening, with the server's sockets in self.sockets
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        self.sockets = server.sockets
+        evictor = asyncio.create_task(self.__evict_forever())
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+            self.close()
+
+    def close(self):
+        """
+        Shuts down the computer move processes and saves the evaluation cache if it has a file
+        """
+        if self.__ai_executor is not None:
+            self.__ai_executor.shutdown(cancel_futures=True)
+            self.__ai_executor = None
+        if self.eval_cache.path is not None:
+            self.eval_cache.save()
+
+    def __session(self, request: dict) -> Session:
+        """
+        Returns the session a request is for and marks it as used
+
+        Raises:
+            ValueError: if there is no such session
+        """
+        session = self.sessions.get(str(request.get('session')))
+        if session is None:
+            raise ValueError(f"No session {request.get('session')!r}, it may have been evicted.")
+        session.last_used = asyncio.get_running_loop().time()
+        return session
+
+    def __describe(self, model: GoModel) -> dict:
+        """
+        Returns the state of a game as a JSON friendly dict
+        """
+        return {
+            'board': str(model.to_bitboard()).split('\n'),
+            'to_move': model.current_player.player_color.name,
+            'captures': [model.player_b.capture_count, model.player_w.capture_count],
+            'stones': list(model.stone_counts),
+            'empty': model.empty_count,
+            'moves': model.history_length,
+            'line': model.line_length,
+            'game_over': model.is_game_over(),
+            'message': model.message,
+        }
+
+    async def __new(self, request: dict) -> dict:
+        """
+        Starts a game and returns its session id and state
+        """
+        size = request.get('size', 9)
+        if size not in VALID_BOARD_LENGTHS:
+            raise ValueError(f"Size must be one of {VALID_BOARD_LENGTHS}.")
+        if len(self.sessions) >= self.max_sessions:
+            self.evict_idle()
+            if len(self.sessions) >= self.max_sessions:
+                raise ValueError('The server is hosting as many games as it can.')
+        session_id = str(next(self.__ids))
+        model = GoModel(size, size, bool(request.get('superko', False)))
+        self.sessions[session_id] = Session(model, asyncio.get_running_loop().time())
+        return {'session': session_id, **self.__describe(model)}
+
+    async def __place(self, request: dict) -> dict:
+        """
+        Plays the current player's piece at a position and returns the new state
+        """
+        session = self.__session(request)
+        if not isinstance(request.get('row'), int) or not isinstance(request.get('col'), int):
+            raise TypeError('Row and col must be integers.')
+        async with session.lock:
+            model = session.model
+            pos = Position(request['row'], request['col'])
+            piece = stone(model.current_player.player_color)
+            if model.is_game_over():
+                raise ValueError('The game is over.')
+            if not model.is_valid_placement(pos, piece):
+                raise ValueError(f'Invalid placement at ({pos.row}, {pos.col}).')
+            model.set_piece(pos, piece)
+            model.capture()
+            model.set_next_player()
+            return self.__describe(model)
+
+    async def __pass(self, request: dict) -> dict:
+        """
+        Passes the current player's turn and returns the new state
+        """
+        session = self.__session(request)
+        async with session.lock:
+            if session.model.is_game_over():
+                raise ValueError('The game is over.')
+            session.model.pass_turn()
+            return self.__describe(session.model)
+
+    async def __undo(self, request: dict) -> dict:
+        """
+        Undoes the last move and returns the new state
+        """
+        session = self.__session(request)
+        async with session.lock:
+            session.model.undo()
+            return self.__describe(session.model)
+
+    async def __seek(self, request: dict) -> dict:
+        """
+        Moves to a move of the game and returns the state there
+        """
+        session = self.__session(request)
+        async with session.lock:
+            session.model.seek(request['move'])
+            return self.__describe(session.model)
+
+    async def __state(self, request: dict) -> dict:
+        """
+        Returns the state of the game
+        """
+        session = self.__session(request)
+        async with session.lock:
+            return self.__describe(session.model)
+
+    async def __legal(self, request: dict) -> dict:
+        """
+        Returns every valid placement for the player to move
+        """
+        session = self.__session(request)
+        async with session.lock:
+            model = session.model
+            bits = model.to_bitboard()
+            legal = model.legal_moves() if not model.is_game_over() else 0
+            return {'legal': [list(bits.coords(point)) for point in range(legal.bit_length()) if legal >> point & 1]}
+
+    async def __score(self, request: dict) -> dict:
+        """
+        Scores the game
+        """
+        session = self.__session(request)
+        async with session.lock:
+            # Scoring floods the whole board, so it runs off the event loop, positions scored before come from the cache
+            loop = asyncio.get_running_loop()
+            komi = float(request.get('komi', 6.5))
+            score = await loop.run_in_executor(None, self.eval_cache.score, session.model, komi)
+            return {'score': score}
+
+    async def __ai(self, request: dict) -> dict:
+        """
+        Lets the computer choose and play the current player's move, returning the move and the new state
+        """
+        session = self.__session(request)
+        async with session.lock:
+            model = session.model
+            if model.is_game_over():
+                raise ValueError('The game is over.')
+            if self.__ai_executor is None:
+                self.__ai_executor = ProcessPoolExecutor(max_workers=self.__ai_workers)
+
+            # The search runs in another process on a copy of the game, the lock keeps the game still meanwhile
+            player = MCTSPlayer(playouts=int(request.get('playouts', 500)))
+            loop = asyncio.get_running_loop()
+            pos = await loop.run_in_executor(self.__ai_executor, player.choose_move, model, random.Random())
+            if pos is None:
+                model.pass_turn()
+            else:
+                model.set_piece(pos, stone(model.current_player.player_color))
+                model.capture()
+                model.set_next_player()
+            return {'move': None if pos is None else [pos.row, pos.col], **self.__describe(model)}
+
+    async def __close(self, request: dict) -> dict:
+        """
+        Ends the game once any command running on it has finished
+        """
+        session = self.__session(request)
+        async with session.lock:
+            key = str(request['session'])
+            if self.sessions.get(key) is session:
+                del self.sessions[key]
+        return {}
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: dict) -> dict:
+    """
+    Sends one request and waits for its reply
+
+    Args:
+        reader(asyncio.StreamReader): the connection's incoming side
+        writer(asyncio.StreamWriter): the connection's outgoing side
+        message(dict): the request
+    Returns:
+        The decoded reply
+    """
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def _load_client(host: str, port: int, path: str, size: int, moves: int, seed: int, latencies: list):
+    """
+    Plays random games over one connection, adding the latency of every request to latencies
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(seed)
+
+    async def timed(message: dict) -> dict:
+        start = time.perf_counter()
+        reply = await request(reader, writer, message)
+        latencies.append(time.perf_counter() - start)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    try:
+        session = (await timed({'cmd': 'new', 'size': size}))['session']
+        for _ in range(moves):
+            legal = (await timed({'cmd': 'legal', 'session': session}))['legal']
+            if legal:
+                row, col = rng.choice(legal)
+                state = await timed({'cmd': 'place', 'session': session, 'row': row, 'col': col})
+            else:
+                state = await timed({'cmd': 'pass', 'session': session})
+            if state['game_over']:
+                await timed({'cmd': 'score', 'session': session})
+                await timed({'cmd': 'close', 'session': session})
+                session = (await timed({'cmd': 'new', 'size': size}))['session']
+        await timed({'cmd': 'close', 'session': session})
+    finally:
+        writer.close()
+
+
+async def run_load(clients: int = 100, moves: int = 50, size: int = 9, host: str = '127.0.0.1', port: int = 8765,
+                   path: str = None, seed: int = 0) -> dict:
+    """
+    Plays random games from many connections at once against a running server
+
+    Args:
+        clients(int): the number of connections, each playing its own game
+        moves(int): the number of moves each connection makes
+        size(int): the size of the boards
+        host(str): the server's address
+        port(int): the server's TCP port
+        path(str): the server's Unix socket, used instead of TCP if given
+        seed(int): the seed for the clients' moves
+    Returns:
+        A dict with the number of requests, requests per second and the p50, p99 and max latency in milliseconds
+    """
+    latencies: list = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(host, port, path, size, moves, seed + client, latencies)
+                           for client in range(clients)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'seconds': seconds,
+        'requests_per_second': len(latencies) / seconds if seconds else 0,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv: list = None):
+    """
+    Runs the server or the load generator from the command line
+    """
+    parser = argparse.ArgumentParser(description='Host many Go games behind a JSON lines socket.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the server')
+    load = commands.add_parser('load', help='run the load generator against a running server')
+    for command in (serve, load):
+        command.add_argument('--host', default='127.0.0.1', help='address to listen on or connect to')
+        command.add_argument('--port', type=int, default=8765, help='TCP port')
+        command.add_argument('--unix', default=None, help='Unix socket path to use instead of TCP')
+    serve.add_argument('--idle-timeout', type=float, default=600.0, help='seconds before an unused game is evicted')
+    serve.add_argument('--max-sessions', type=int, default=10_000, help='largest number of games hosted at once')
+    serve.add_argument('--ai-workers', type=int, default=1, help='processes used for computer moves')
+    serve.add_argument('--eval-cache', default=None, help='file to load scores from and save them to on shutdown')
+    serve.add_argument('--symmetric-eval-cache', action='store_true',
+                       help='share cached scores between rotations and reflections of a position')
+    serve.add_argument('--eval-cache-size', type=int, default=100_000, help='largest number of scores cached')
+    load.add_argument('--clients', type=int, default=100, help='number of connections')
+    load.add_argument('--moves', type=int, default=50, help='moves per connection')
+    load.add_argument('--size', type=int, default=9, choices=VALID_BOARD_LENGTHS, help='board size')
+    load.add_argument('--seed', type=int, default=0, help='seed for the random moves')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        server = GoServer(args.idle_timeout, args.max_sessions, args.ai_workers,
+                          EvalCache(args.eval_cache_size, args.eval_cache, args.symmetric_eval_cache))
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(run_load(args.clients, args.moves, args.size, args.host, args.port, args.unix, args.seed))
+        print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
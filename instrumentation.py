@@ -0,0 +1,188 @@
+"""
+Title: MethodStats and Profiler Classes
+Purpose: Opt-in call counts, wall times and squares visited for chosen methods of one object, with nothing left running while it is off
+"""
+import time
+from collections import deque
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    """
+    Returns the nearest rank percentile of sorted samples, or 0.0 if there are none
+    """
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class MethodStats:
+    """
+    Represents the measurements of one method
+
+    Attributes:
+        calls(int): the number of calls
+        total(float): the number of seconds spent in the method, including the methods it called
+        cells(int): the number of squares the method looked at
+        samples(deque): the wall time of the most recent calls, used for the percentiles
+    Methods:
+        add(): records one call
+        snapshot(): returns the measurements as a dict
+    """
+    __slots__ = ('calls', 'total', 'cells', 'samples')
+
+    def __init__(self, window: int):
+        """
+        Initializes the measurements with no calls
+
+        Args:
+            window(int): the number of recent calls kept for the percentiles
+        """
+        self.calls = 0
+        self.total = 0.0
+        self.cells = 0
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds: float, cells: int):
+        """
+        Records one call
+
+        Args:
+            seconds(float): how long the call took
+            cells(int): the number of squares the call looked at
+        """
+        self.calls += 1
+        self.total += seconds
+        self.cells += cells
+        self.samples.append(seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Returns the call count, total, mean, p50 and p99 wall time in seconds and the squares visited
+        """
+        samples = sorted(self.samples)
+        return {
+            'calls': self.calls,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.calls if self.calls else 0.0,
+            'p50_seconds': _percentile(samples, 0.50),
+            'p99_seconds': _percentile(samples, 0.99),
+            'cells_visited': self.cells,
+        }
+
+
+class Profiler:
+    """
+    Measures methods of one object by putting timing wrappers on the instance, which hide the class's methods until
+    they are taken off again. While the profiler is off the wrappers don't exist, so the methods cost exactly what they
+    did before.
+
+    Attributes:
+        enabled(bool): True while the wrappers are on the object
+        cells(int): the running count of squares visited, read before and after each call
+        __target: the object being measured
+        __methods(dict): maps each stat name to the attribute name of the method it measures
+        __cell_source(str): the attribute name of a method that returns the squares it visits, or None
+        __cell_counts(dict): maps stat names to functions giving the squares visited from a call's return value, for
+            methods that don't go through __cell_source
+        __stats(dict): the MethodStats of each stat name
+    Methods:
+        enable(): puts the wrappers on the object
+        disable(): takes the wrappers off, keeping the measurements
+        stats(): returns a snapshot of every method's measurements
+        reset(): forgets every measurement
+    """
+    def __init__(self, target, methods: dict, cell_source: str = None, cell_counts: dict = None, window: int = 10_000):
+        """
+        Initializes a profiler that isn't on yet
+
+        Args:
+            target: the object to measure
+            methods(dict): maps each stat name to the attribute name of the method it measures
+            cell_source(str): the attribute name of a method that returns the squares it visits, or None
+            cell_counts(dict): maps stat names to functions giving the squares visited from a call's return value
+            window(int): the number of recent calls kept per method for the percentiles
+        Raises:
+            ValueError: if window is less than 1
+        """
+        if window < 1:
+            raise ValueError('Window must be at least 1.')
+        self.enabled = False
+        self.cells = 0
+        self.__target = target
+        self.__methods = dict(methods)
+        self.__cell_source = cell_source
+        self.__cell_counts = dict(cell_counts or {})
+        self.__window = window
+        self.__stats = {name: MethodStats(window) for name in self.__methods}
+
+    def enable(self):
+        """
+        Puts the timing wrappers on the object
+        """
+        if self.enabled:
+            return
+        target = self.__target
+        if self.__cell_source is not None:
+            setattr(target, self.__cell_source, self.__count_cells(getattr(target, self.__cell_source)))
+        for name, attribute in self.__methods.items():
+            setattr(target, attribute, self.__wrap(self.__stats[name], getattr(target, attribute),
+                                                   self.__cell_counts.get(name)))
+        self.enabled = True
+
+    def disable(self):
+        """
+        Takes the wrappers off so the class's methods are used again, keeping the measurements
+        """
+        if not self.enabled:
+            return
+        target = self.__target
+        for attribute in (*self.__methods.values(), *([self.__cell_source] if self.__cell_source else [])):
+            delattr(target, attribute)
+        self.enabled = False
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the measurements of every method, by stat name
+        """
+        return {name: stats.snapshot() for name, stats in self.__stats.items()}
+
+    def reset(self):
+        """
+        Forgets every measurement
+        """
+        self.cells = 0
+        self.__stats = {name: MethodStats(self.__window) for name in self.__methods}
+        if self.enabled:
+            self.disable()
+            self.enable()
+
+    def __count_cells(self, method):
+        """
+        Wraps the method that looks up squares so every square it returns is counted
+        """
+        def counted(*args, **kwargs):
+            result = method(*args, **kwargs)
+            self.cells += len(result)
+            return result
+        return counted
+
+    def __wrap(self, stats: MethodStats, method, cell_count):
+        """
+        Wraps a method so each call's wall time and squares visited are added to its stats, even if the call raises
+        """
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            cells = self.cells
+            start = perf_counter()
+            result = None
+            try:
+                result = method(*args, **kwargs)
+                return result
+            finally:
+                elapsed = perf_counter() - start
+                visited = self.cells - cells
+                if cell_count is not None and result is not None:
+                    visited += cell_count(result)
+                stats.add(elapsed, visited)
+        return timed
@@ -0,0 +1,361 @@
+"""
+Title: MCTSPlayer Class
+Purpose: A computer opponent that picks moves with Monte Carlo Tree Search over BitBoard copies of the game
+"""
+import math
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from bit_board import BitBoard, choose_point
+from game_piece import stone
+from go_model import GoModel
+from player_colors import PlayerColors
+from position import Position
+
+# Move number used for passing in the search tree
+PASS = -1
+
+
+class SearchNode:
+    """
+    Represents the statistics of one position in the search tree
+
+    Attributes:
+        moves(list[int]): the bit index of each move that can be tried from the position, PASS for a pass
+        visits(list[int]): the number of playouts that went through each move
+        wins(list[float]): the number of those playouts won by the player making the move
+        total(int): the number of playouts that went through the position
+    """
+    __slots__ = ('moves', 'visits', 'wins', 'total')
+
+    def __init__(self, moves: list):
+        """
+        Initializes the statistics of a position that hasn't been searched yet
+
+        Args:
+            moves(list[int]): the moves that can be tried from the position
+        """
+        self.moves = moves
+        self.visits = [0] * len(moves)
+        self.wins = [0.0] * len(moves)
+        self.total = 0
+
+
+class TranspositionTable:
+    """
+    Keeps search nodes by position, forgetting the least recently used ones once it is full
+
+    Attributes:
+        capacity(int): the largest number of nodes kept
+        __nodes(OrderedDict): the nodes, least recently used first
+    Methods:
+        get(): returns the node for a key and marks it as recently used
+        put(): adds a node, evicting the oldest one if the table is full
+        __len__(): returns the number of nodes kept
+    """
+    def __init__(self, capacity: int):
+        """
+        Initializes an empty table
+
+        Args:
+            capacity(int): the largest number of nodes kept
+        Raises:
+            ValueError: if capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1.')
+        self.capacity = capacity
+        self.__nodes = OrderedDict()
+
+    def get(self, key) -> SearchNode | None:
+        """
+        Returns the node for a key, or None, and marks it as recently used
+        """
+        node = self.__nodes.get(key)
+        if node is not None:
+            self.__nodes.move_to_end(key)
+        return node
+
+    def put(self, key, node: SearchNode):
+        """
+        Adds a node, evicting the least recently used node if the table is full
+        """
+        self.__nodes[key] = node
+        if len(self.__nodes) > self.capacity:
+            self.__nodes.popitem(last=False)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of nodes kept
+        """
+        return len(self.__nodes)
+
+
+def _winner(bits: BitBoard, captures: list, komi: float) -> int:
+    """
+    Returns the PlayerColors value of the winner of a finished position, scored the same way as GoModel.calculate_score
+    """
+    black_area, white_area = bits.area()
+    black = black_area + captures[0]
+    white = white_area + captures[1] + komi
+    return PlayerColors.BLACK.value if black > white else PlayerColors.WHITE.value
+
+
+def search(bits: BitBoard, color: PlayerColors, passes: int, captures: list, playouts: int, time_budget: float = None,
+           exploration: float = 1.4, table_size: int = 100_000, komi: float = 6.5, seed=None) -> dict:
+    """
+    Runs Monte Carlo Tree Search from a position and returns how often each move at the root was tried
+
+    Args:
+        bits(BitBoard): the position to search from, it is not changed
+        color(PlayerColors): the color to move
+        passes(int): the number of consecutive passes before the position
+        captures(list[int]): the [black, white] capture counts so far, used for scoring
+        playouts(int): the largest number of playouts to run
+        time_budget(float): the largest number of seconds to search for, or None for no limit
+        exploration(float): the UCT exploration constant
+        table_size(int): the largest number of positions kept in the transposition table
+        komi(float): the points given to white for playing second
+        seed: the seed for the search's random number generator
+    Returns:
+        A dict mapping each root move (bit index or PASS) to its (visits, wins) and the number of playouts run under 'playouts'
+    """
+    rng = random.Random(seed)
+    table = TranspositionTable(table_size)
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    max_rollout = bits.size * bits.size * 2
+
+    def expand(state: BitBoard, to_move: PlayerColors) -> SearchNode:
+        candidates = state.legal_moves(to_move) & ~state.eye_points(to_move)
+        moves = []
+        while candidates:
+            low = candidates & -candidates
+            moves.append(low.bit_length() - 1)
+            candidates ^= low
+        moves.append(PASS)
+        return SearchNode(moves)
+
+    root_key = (bits.position_hash, color.value, bits.ko, passes)
+    root = expand(bits, color)
+    table.put(root_key, root)
+
+    completed = 0
+    while completed < playouts and (deadline is None or time.perf_counter() < deadline):
+        state = bits.copy()
+        to_move = color
+        state_passes = passes
+        state_captures = list(captures)
+        path = []
+        node = root
+
+        # Selection: follow the best UCT move until reaching a position that isn't in the table
+        while True:
+            if state_passes >= 2:
+                winner = _winner(state, state_captures, komi)
+                break
+            log_total = math.log(node.total + 1)
+            best, best_value = 0, -1.0
+            for index, visits in enumerate(node.visits):
+                if visits == 0:
+                    best = index
+                    break
+                value = node.wins[index] / visits + exploration * math.sqrt(log_total / visits)
+                if value > best_value:
+                    best, best_value = index, value
+            path.append((node, best, to_move.value))
+
+            move = node.moves[best]
+            if move == PASS:
+                state_passes += 1
+                state.ko = -1
+            else:
+                state_captures[to_move.value] += state.play(move, to_move, check=False).bit_count()
+                state_passes = 0
+            to_move = to_move.opponent()
+
+            key = (state.position_hash, to_move.value, state.ko, state_passes)
+            child = table.get(key)
+            if child is None:
+                # Expansion and a random playout from the new position
+                if state_passes < 2:
+                    table.put(key, expand(state, to_move))
+                winner = _rollout(state, to_move, state_passes, state_captures, komi, rng, max_rollout)
+                break
+            node = child
+
+        # Backpropagation: a playout counts as a win for every move made by the winner
+        for path_node, index, mover in path:
+            path_node.visits[index] += 1
+            path_node.total += 1
+            if mover == winner:
+                path_node.wins[index] += 1
+        completed += 1
+
+    stats = {move: (visits, wins) for move, visits, wins in zip(root.moves, root.visits, root.wins)}
+    stats['playouts'] = completed
+    return stats
+
+
+def _rollout(state: BitBoard, to_move: PlayerColors, passes: int, captures: list, komi: float, rng: random.Random,
+             max_moves: int, frozen: int = 0) -> int:
+    """
+    Plays random moves that don't fill the mover's own eyes until both players pass, then returns the winner's color value
+
+    No moves are played on the frozen points, which are left as they are, such as the regions BitBoard.settled() says
+    can't change owner.
+    """
+    # Toggle between the colors by value, PlayerColors.opponent() is too slow for the inner loop
+    colors = (PlayerColors.BLACK, PlayerColors.WHITE)
+    value = to_move.value
+    moves = 0
+    while passes < 2 and moves < max_moves:
+        color = colors[value]
+        candidates = state.empty() & ~state.eye_points(color) & ~frozen
+        played = False
+        while candidates:
+            point = choose_point(candidates, rng)
+            if state.is_legal(point, color):
+                captures[value] += state.play(point, color, check=False).bit_count()
+                played = True
+                break
+            candidates &= ~(1 << point)
+        if played:
+            passes = 0
+        else:
+            passes += 1
+            state.ko = -1
+        value ^= 1
+        moves += 1
+    return _winner(state, captures, komi)
+
+
+def _search_worker(args: tuple) -> dict:
+    """
+    Runs one independent search inside a worker process for root parallel search
+    """
+    return search(*args)
+
+
+class MCTSPlayer:
+    """
+    Represents a computer player that chooses moves for the current player of a GoModel with Monte Carlo Tree Search
+
+    Attributes:
+        playouts(int): the largest number of playouts per move
+        time_budget(float): the largest number of seconds per move, or None for no limit
+        workers(int): the number of processes searching in parallel, each with its own tree, 1 searches in this process
+        exploration(float): the UCT exploration constant
+        table_size(int): the largest number of positions kept in each transposition table
+        komi(float): the points given to white for playing second
+        last_playouts(int): the number of playouts run for the last move
+    Methods:
+        choose_move(): returns the Position to play for the current player, or None to pass
+        play_turn(): chooses a move and makes it on the model the same way the GUI does
+        close(): shuts down the worker processes
+        __call__(): lets the player be used as a self_play strategy
+    """
+    def __init__(self, playouts: int = 1000, time_budget: float = None, workers: int = 1, exploration: float = 1.4,
+                 table_size: int = 100_000, komi: float = 6.5, seed=None):
+        """
+        Initializes the player's search settings
+
+        Args:
+            playouts(int): the largest number of playouts per move
+            time_budget(float): the largest number of seconds per move, or None for no limit
+            workers(int): the number of processes searching in parallel
+            exploration(float): the UCT exploration constant
+            table_size(int): the largest number of positions kept in each transposition table
+            komi(float): the points given to white for playing second
+            seed: the seed for the player's random number generator
+        Raises:
+            ValueError: if playouts or workers is less than 1
+        """
+        if playouts < 1 or workers < 1:
+            raise ValueError('Playouts and workers must be at least 1.')
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers
+        self.exploration = exploration
+        self.table_size = table_size
+        self.komi = komi
+        self.last_playouts = 0
+        self.__rng = random.Random(seed)
+        self.__executor = None
+
+    def choose_move(self, model: GoModel, rng: random.Random = None) -> Position | None:
+        """
+        Searches the model's current position and returns the most visited move
+
+        Args:
+            model(GoModel): the game to choose a move in, it is not changed
+            rng(random.Random): the random number generator to seed the search from, the player's own by default
+        Returns:
+            The Position to play at for the current player, or None to pass
+        """
+        color = model.current_player.player_color
+        bits = model.to_bitboard()
+        captures = [model.player_b.capture_count, model.player_w.capture_count]
+        base = (bits, color, model.consecutive_passes, captures)
+        settings = (self.exploration, self.table_size, self.komi)
+        rng = self.__rng if rng is None else rng
+
+        if self.workers == 1:
+            results = [search(*base, self.playouts, self.time_budget, *settings, rng.getrandbits(64))]
+        else:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+            share = -(-self.playouts // self.workers)
+            jobs = [(*base, share, self.time_budget, *settings, rng.getrandbits(64)) for _ in range(self.workers)]
+            results = list(self.__executor.map(_search_worker, jobs))
+
+        # Root parallel search: add up the visits from every independent tree
+        totals: dict = {}
+        self.last_playouts = 0
+        for result in results:
+            self.last_playouts += result.pop('playouts')
+            for move, (visits, _) in result.items():
+                totals[move] = totals.get(move, 0) + visits
+
+        # The model has the final say on legality, e.g. superko, so fall back to the next most visited move
+        piece = stone(color)
+        for move in sorted(totals, key=totals.get, reverse=True):
+            if move == PASS:
+                return None
+            pos = Position(*bits.coords(move))
+            if model.is_valid_placement(pos, piece):
+                return pos
+        return None
+
+    def play_turn(self, model: GoModel) -> Position | None:
+        """
+        Chooses a move for the current player and makes it, passing if the search prefers to
+
+        Args:
+            model(GoModel): the game to play in
+        Returns:
+            The Position played at, or None if the player passed
+        """
+        pos = self.choose_move(model)
+        if pos is None:
+            model.pass_turn()
+        else:
+            model.set_piece(pos, stone(model.current_player.player_color))
+            model.capture()
+            model.set_next_player()
+        return pos
+
+    def close(self):
+        """
+        Shuts down the worker processes used for parallel search
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def __call__(self, model: GoModel, rng: random.Random = None) -> Position | None:
+        """
+        Lets the player be used as a self_play strategy, seeding the search from the game's random number generator
+        """
+        return self.choose_move(model, rng)
@@ -0,0 +1,293 @@
+"""
+Title: MoveRecord and MoveJournal Classes
+Purpose: Records each move as the handful of changes it made to the board so moves can be undone and redone without board copies,
+    with a full copy of the position every few moves so any move of a long game can be reached quickly
+"""
+from bit_board import BitBoard
+from game_piece import GamePiece
+from game_player import GamePlayer
+
+class MoveRecord:
+    """
+    Represents the changes one move made to the game
+
+    Attributes:
+        coord(tuple[int]): the (row, col) the piece was set at, or None for a pass
+        piece(GamePiece): the piece that was set, or None if the square was cleared
+        replaced(GamePiece): the piece that was on the square before, or None
+        captured(list): (coord, piece) pairs for every piece the move captured
+        player(GamePlayer): the player whose turn it was when the move was made
+        consecutive_passes(int): the number of consecutive passes before the move
+        ko(int): the BitBoard ko point before the move
+        position_hash(int): the Zobrist hash of the board after the move and its captures, None for a pass
+    Methods:
+        is_pass(): returns True if the move was a pass
+        copy(): returns a record of the same move with its own list of captures
+    """
+    __slots__ = ('coord', 'piece', 'replaced', 'captured', 'player', 'consecutive_passes', 'ko', 'position_hash')
+
+    def __init__(self, coord: tuple | None, piece: GamePiece | None, replaced: GamePiece | None, player: GamePlayer,
+                 consecutive_passes: int, ko: int):
+        """
+        Initializes the record of a move before any captures are known
+
+        Args:
+            coord(tuple[int]): the (row, col) the piece was set at, or None for a pass
+            piece(GamePiece): the piece that was set, or None if the square was cleared
+            replaced(GamePiece): the piece that was on the square before, or None
+            player(GamePlayer): the player whose turn it was when the move was made
+            consecutive_passes(int): the number of consecutive passes before the move
+            ko(int): the BitBoard ko point before the move
+        """
+        self.coord = coord
+        self.piece = piece
+        self.replaced = replaced
+        self.captured: list = []
+        self.player = player
+        self.consecutive_passes = consecutive_passes
+        self.ko = ko
+        self.position_hash = None
+
+    @property
+    def is_pass(self) -> bool:
+        """
+        Returns True if the move was a pass
+        """
+        return self.coord is None
+
+    def copy(self) -> 'MoveRecord':
+        """
+        Returns a record of the same move with its own list of captures
+        """
+        other = MoveRecord(self.coord, self.piece, self.replaced, self.player, self.consecutive_passes, self.ko)
+        other.captured = self.captured[:]
+        other.position_hash = self.position_hash
+        return other
+
+    def __repr__(self) -> str:
+        """
+        Returns the string representation of the move record
+        """
+        if self.is_pass:
+            return f'MoveRecord(pass, {self.player.player_color.name})'
+        return f'MoveRecord({self.coord}, {self.piece!r}, captured={len(self.captured)})'
+
+
+class Keyframe:
+    """
+    Represents a full copy of the position before a move, so the game can jump there without undoing every move since
+
+    Attributes:
+        bits(BitBoard): the stones and ko point
+        player(GamePlayer): the player to move
+        captures(tuple[int]): the (black, white) capture counts
+        consecutive_passes(int): the number of consecutive passes that led to the position
+    """
+    __slots__ = ('bits', 'player', 'captures', 'consecutive_passes')
+
+    def __init__(self, bits: BitBoard, player: GamePlayer, captures: tuple, consecutive_passes: int):
+        """
+        Initializes a keyframe, the BitBoard is kept as it is so it shouldn't be changed afterwards
+
+        Args:
+            bits(BitBoard): the stones and ko point
+            player(GamePlayer): the player to move
+            captures(tuple[int]): the (black, white) capture counts
+            consecutive_passes(int): the number of consecutive passes that led to the position
+        """
+        self.bits = bits
+        self.player = player
+        self.captures = captures
+        self.consecutive_passes = consecutive_passes
+
+
+class MoveJournal:
+    """
+    Keeps the moves that have been made, newest last, and the moves that have been undone so they can be redone
+
+    The made moves followed by the undone ones, most recently undone first, are the line of the game. Every
+    keyframe_interval moves along the line a Keyframe of the position is kept, so reaching move n takes loading the
+    keyframe at or before it and replaying fewer than keyframe_interval moves. A smaller interval makes jumps faster and
+    keeps more positions, each about as big as a few dozen moves.
+
+    Attributes:
+        keyframe_interval(int): the number of moves between keyframes
+        __records(list): the moves that have been made
+        __undone(list): the moves that have been undone, most recently undone last
+        __keyframes(dict): the Keyframe before each move number that is a multiple of keyframe_interval
+    Methods:
+        push(): adds a new move and forgets the undone moves
+        top(): returns the newest move
+        undo(): removes the newest move and keeps it for redo
+        redo(): brings back the most recently undone move
+        can_redo(): returns True if there is a move to redo
+        records(): returns the moves that have been made
+        line_length(): returns the number of moves in the line, made and undone
+        wants_keyframe(): returns True if the position before the next move should be kept as a keyframe
+        add_keyframe(): keeps the position before the next move
+        keyframe_before(): returns the nearest keyframe at or before a move number
+        keyframes(): returns the number of keyframes kept
+        jump(): makes or undoes moves without replaying them, so the first n moves of the line are made
+        fork(): returns an independent journal that shares the records and keyframes
+        __len__(): returns the number of moves that have been made
+    """
+    def __init__(self, keyframe_interval: int = 32):
+        """
+        Initializes an empty journal
+
+        Args:
+            keyframe_interval(int): the number of moves between keyframes
+        Raises:
+            ValueError: if keyframe_interval is less than 1
+        """
+        if keyframe_interval < 1:
+            raise ValueError('Keyframe interval must be at least 1.')
+        self.keyframe_interval = keyframe_interval
+        self.__records: list = []
+        self.__undone: list = []
+        self.__keyframes: dict = {}
+
+    def push(self, record: MoveRecord):
+        """
+        Adds a new move, which makes the undone moves impossible to redo and drops the keyframes after it
+
+        Args:
+            record(MoveRecord): the move to add
+        """
+        if self.__undone:
+            self.__undone.clear()
+            made = len(self.__records)
+            self.__keyframes = {number: keyframe for number, keyframe in self.__keyframes.items() if number <= made}
+        self.__records.append(record)
+
+    @property
+    def top(self) -> MoveRecord | None:
+        """
+        Returns the newest move, or None if no moves have been made
+        """
+        return self.__records[-1] if self.__records else None
+
+    def undo(self) -> MoveRecord:
+        """
+        Removes the newest move and keeps it for redo
+
+        Raises:
+            IndexError: if no moves have been made
+        Returns:
+            The removed MoveRecord
+        """
+        record = self.__records.pop()
+        self.__undone.append(record)
+        return record
+
+    def redo(self) -> MoveRecord:
+        """
+        Brings back the most recently undone move
+
+        Raises:
+            IndexError: if there is nothing to redo
+        Returns:
+            The restored MoveRecord
+        """
+        record = self.__undone.pop()
+        self.__records.append(record)
+        return record
+
+    @property
+    def can_redo(self) -> bool:
+        """
+        Returns True if there is a move to redo
+        """
+        return len(self.__undone) > 0
+
+    @property
+    def records(self) -> tuple:
+        """
+        Returns the moves that have been made, oldest first
+        """
+        return tuple(self.__records)
+
+    @property
+    def line_length(self) -> int:
+        """
+        Returns the number of moves in the line, the made moves and the ones that can be redone
+        """
+        return len(self.__records) + len(self.__undone)
+
+    @property
+    def wants_keyframe(self) -> bool:
+        """
+        Returns True if the next move is a multiple of keyframe_interval whose position hasn't been kept yet
+        """
+        made = len(self.__records)
+        return made % self.keyframe_interval == 0 and made not in self.__keyframes
+
+    def add_keyframe(self, keyframe: Keyframe):
+        """
+        Keeps the position before the next move as a keyframe
+
+        Args:
+            keyframe(Keyframe): the current position
+        """
+        self.__keyframes[len(self.__records)] = keyframe
+
+    def keyframe_before(self, move_number: int) -> tuple:
+        """
+        Returns the nearest keyframe at or before a move number
+
+        Args:
+            move_number(int): the number of moves made in the position wanted
+        Returns:
+            (the number of moves made in the keyframe's position, Keyframe), or (0, None) if there is no keyframe
+        """
+        number = move_number - move_number % self.keyframe_interval
+        while number > 0 and number not in self.__keyframes:
+            number -= self.keyframe_interval
+        return number, self.__keyframes.get(number)
+
+    @property
+    def keyframes(self) -> int:
+        """
+        Returns the number of keyframes kept
+        """
+        return len(self.__keyframes)
+
+    def jump(self, move_number: int):
+        """
+        Moves records between the made and undone moves, without replaying them, so the first move_number moves of the
+        line are made
+
+        Args:
+            move_number(int): the number of moves to leave made
+        Raises:
+            ValueError: if move_number is outside the line
+        """
+        if not 0 <= move_number <= self.line_length:
+            raise ValueError(f'Move number must be between 0 and {self.line_length}.')
+        while len(self.__records) > move_number:
+            self.__undone.append(self.__records.pop())
+        while len(self.__records) < move_number:
+            self.__records.append(self.__undone.pop())
+
+    def fork(self) -> 'MoveJournal':
+        """
+        Returns an independent journal with the same moves and keyframes
+
+        Only the lists and dict holding the moves are copied, a pointer per move. The records and keyframes are
+        shared, which is safe because neither is changed once its move is finished. The exception is the newest
+        record, which capture() still fills in after the move is set, so the new journal gets its own copy of it.
+        """
+        other = MoveJournal.__new__(MoveJournal)
+        other.keyframe_interval = self.keyframe_interval
+        other.__records = self.__records[:]
+        if other.__records:
+            other.__records[-1] = other.__records[-1].copy()
+        other.__undone = self.__undone[:]
+        other.__keyframes = self.__keyframes.copy()
+        return other
+
+    def __len__(self) -> int:
+        """
+        Returns the number of moves that have been made
+        """
+        return len(self.__records)
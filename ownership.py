@@ -0,0 +1,221 @@
+"""
+Title: OwnershipEstimator Class
+Purpose: Estimates who owns each point of a finished game by playing it out randomly many times, in parallel and within
+    a time budget, and proposes which stones are dead so the game can be scored without them
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bit_board import BitBoard, iter_points
+from go_model import GoModel
+from mcts_player import _rollout
+from player_colors import PlayerColors
+
+
+class OwnershipMap:
+    """
+    Represents how often each point of a board ended up belonging to each player in random playouts
+
+    A point belongs to a player at the end of a playout if it holds one of their stones or is territory surrounded by
+    their stones only.
+
+    Attributes:
+        size(int): the number of rows (and columns) in the board
+        playouts(int): the number of playouts the estimate is based on
+        black(list[list[float]]): black[row][col] is the fraction of playouts the point ended up black's
+        white(list[list[float]]): white[row][col] is the fraction of playouts the point ended up white's
+        dead_stones(set): the (row, col) of every stone proposed as dead
+    Methods:
+        ownership(): returns how strongly a point belongs to black (1) or white (-1)
+        owner(): returns the color a point belongs to in most playouts, or None
+    """
+    def __init__(self, size: int, playouts: int, black: list, white: list, dead_stones: set):
+        """
+        Initializes the map from finished counts
+
+        Args:
+            size(int): the number of rows (and columns) in the board
+            playouts(int): the number of playouts the estimate is based on
+            black(list[list[float]]): the fraction of playouts each point ended up black's
+            white(list[list[float]]): the fraction of playouts each point ended up white's
+            dead_stones(set): the (row, col) of every stone proposed as dead
+        """
+        self.size = size
+        self.playouts = playouts
+        self.black = black
+        self.white = white
+        self.dead_stones = dead_stones
+
+    def ownership(self, row: int, col: int) -> float:
+        """
+        Returns the fraction of playouts a point ended up black's minus the fraction it ended up white's, from -1 to 1
+        """
+        return self.black[row][col] - self.white[row][col]
+
+    def owner(self, row: int, col: int) -> PlayerColors | None:
+        """
+        Returns the color a point belonged to in more than half the playouts, or None if neither
+        """
+        if self.black[row][col] > 0.5:
+            return PlayerColors.BLACK
+        if self.white[row][col] > 0.5:
+            return PlayerColors.WHITE
+        return None
+
+
+def playout_ownership(bits: BitBoard, color: PlayerColors, playouts: int, deadline: float = None, seed=None) -> tuple:
+    """
+    Plays a position out randomly a number of times and counts who each point belonged to at the end
+
+    The points BitBoard.settled() gives a color are frozen: no playout moves there and every playout counts them as
+    that color's, dead stones included, so the playouts are shorter and only spent on what is still undecided.
+
+    Args:
+        bits(BitBoard): the position, it is not changed
+        color(PlayerColors): the color to move
+        playouts(int): the largest number of playouts to run
+        deadline(float): the time.time() after which no new playout is started, or None for no limit
+        seed: the seed for the random number generator
+    Returns:
+        (black counts, white counts, playouts run), where the counts are lists indexed by BitBoard bit index
+    """
+    rng = random.Random(seed)
+    length = bits.size * bits.stride
+    black = [0] * length
+    white = [0] * length
+    max_moves = bits.size * bits.size * 2
+    settled_black, settled_white = bits.settled()
+    frozen = settled_black | settled_white
+    completed = 0
+    while completed < playouts and (deadline is None or time.time() < deadline):
+        # The game is played on from the final position as if neither player had passed
+        state = bits.copy()
+        _rollout(state, color, 0, [0, 0], 0.0, rng, max_moves, frozen)
+        black_territory, white_territory = state.territory()
+        for point in iter_points((state.stones[0] | black_territory) & ~frozen):
+            black[point] += 1
+        for point in iter_points((state.stones[1] | white_territory) & ~frozen):
+            white[point] += 1
+        completed += 1
+    for point in iter_points(settled_black):
+        black[point] += completed
+    for point in iter_points(settled_white):
+        white[point] += completed
+    return black, white, completed
+
+
+def _ownership_worker(args: tuple) -> tuple:
+    """
+    Runs playout_ownership() inside a worker process
+    """
+    return playout_ownership(*args)
+
+
+class OwnershipEstimator:
+    """
+    Represents a Monte Carlo estimator of who owns each point of a game and which stones are dead
+
+    The playouts are split between worker processes, which all stop starting new playouts at the same deadline, so an
+    estimate takes at most about time_budget seconds plus one playout however many playouts are asked for.
+
+    Attributes:
+        playouts(int): the largest number of playouts per estimate
+        time_budget(float): the largest number of seconds per estimate, or None for no limit
+        workers(int): the number of processes playing out in parallel, 1 plays out in this process
+        dead_threshold(float): a chain is proposed as dead when its points ended up the opponent's in more than this
+            fraction of the playouts, on average
+        __rng(random.Random): seeds the playouts
+        __executor(ProcessPoolExecutor): the worker processes, made when the first parallel estimate is asked for
+    Methods:
+        estimate(): returns the OwnershipMap of a game's current position
+        close(): shuts down the worker processes
+    """
+    def __init__(self, playouts: int = 1000, time_budget: float = None, workers: int = 1, dead_threshold: float = 0.5,
+                 seed=None):
+        """
+        Initializes the estimator's settings
+
+        Args:
+            playouts(int): the largest number of playouts per estimate
+            time_budget(float): the largest number of seconds per estimate, or None for no limit
+            workers(int): the number of processes playing out in parallel
+            dead_threshold(float): the average opponent ownership above which a chain is proposed as dead
+            seed: the seed for the estimator's random number generator
+        Raises:
+            ValueError: if playouts or workers is less than 1, or dead_threshold isn't between 0 and 1
+        """
+        if playouts < 1 or workers < 1:
+            raise ValueError('Playouts and workers must be at least 1.')
+        if not 0 <= dead_threshold < 1:
+            raise ValueError('Dead threshold must be at least 0 and less than 1.')
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers
+        self.dead_threshold = dead_threshold
+        self.__rng = random.Random(seed)
+        self.__executor = None
+
+    def estimate(self, model: GoModel) -> OwnershipMap:
+        """
+        Plays the game's current position out randomly and returns how often each point ended up each player's
+
+        Args:
+            model(GoModel): the game, usually just after both players passed, it is not changed
+        Returns:
+            The OwnershipMap, with the chains whose points mostly ended up the opponent's as its dead_stones
+        """
+        bits = model.to_bitboard()
+        color = model.current_player.player_color
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
+
+        if self.workers == 1:
+            results = [playout_ownership(bits, color, self.playouts, deadline, self.__rng.getrandbits(64))]
+        else:
+            if self.__executor is None:
+                self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+            share = -(-self.playouts // self.workers)
+            jobs = [(bits, color, share, deadline, self.__rng.getrandbits(64)) for _ in range(self.workers)]
+            results = list(self.__executor.map(_ownership_worker, jobs))
+
+        length = bits.size * bits.stride
+        black = [0] * length
+        white = [0] * length
+        completed = 0
+        for black_counts, white_counts, playouts in results:
+            completed += playouts
+            for point in range(length):
+                black[point] += black_counts[point]
+                white[point] += white_counts[point]
+
+        # Ownership is reported row by row, dividing by at least 1 so an estimate with no playouts is all zeros
+        total = max(completed, 1)
+        black_rows = [[black[bits.point(row, col)] / total for col in range(bits.size)] for row in range(bits.size)]
+        white_rows = [[white[bits.point(row, col)] / total for col in range(bits.size)] for row in range(bits.size)]
+        dead_stones = self.__dead_stones(bits, black_rows, white_rows) if completed else set()
+        return OwnershipMap(bits.size, completed, black_rows, white_rows, dead_stones)
+
+    def __dead_stones(self, bits: BitBoard, black: list, white: list) -> set:
+        """
+        Returns the stones of every chain whose points ended up the opponent's more than dead_threshold of the time
+
+        Whole chains are judged together, so a chain is never split into living and dead stones.
+        """
+        dead = set()
+        for color, opponent_share in ((PlayerColors.BLACK, white), (PlayerColors.WHITE, black)):
+            remaining = bits.stones[color.value]
+            while remaining:
+                chain = bits.flood(remaining & -remaining, remaining)
+                remaining ^= chain
+                stones = [bits.coords(point) for point in iter_points(chain)]
+                if sum(opponent_share[row][col] for row, col in stones) / len(stones) > self.dead_threshold:
+                    dead.update(stones)
+        return dead
+
+    def close(self):
+        """
+        Shuts down the worker processes used for parallel estimates
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
@@ -18,6 +18,8 @@ class Placeble(ABC):
         color(): return the private variable color
         is_valid_placement(): returns Ture or False for basic placement conditions
     """
+    __slots__ = ('__color',)
+
     def __init__(self, color: PlayerColors):
         """
         Initialize the placeble class as an instance of PlayerColors
@@ -0,0 +1,34 @@
+"""
+Title: Position Class
+Purpose: A row and column on the board, slotted so the many short lived positions made during play stay small
+"""
+
+
+class Position:
+    """
+    Represents a square on the board
+
+    Attributes:
+        row(int): the row of the square
+        col(int): the column of the square
+    """
+    __slots__ = ('row', 'col')
+
+    def __init__(self, row, col):
+        """
+        Initializes the position
+
+        Args:
+            row(int): the row of the square
+            col(int): the column of the square
+        Raises:
+            TypeError: if row or col is not an int
+        """
+        if not isinstance(row, int) or not isinstance(col, int):
+            raise TypeError
+        self.row = row
+        self.col = col
+
+    def __str__(self):
+        output = f'Placed Go Game piece at [{self.row}, {self.col}]'
+        return output
@@ -0,0 +1,164 @@
+"""
+Title: Packed Position Codec
+Purpose: Packs a position into a few dozen bytes, 2 bits per point plus the player to move, capture counts and ko point, and back
+"""
+import struct
+
+from bit_board import BitBoard
+from go_model import GoModel, VALID_BOARD_LENGTHS
+from player_colors import PlayerColors
+
+# size, flags (bit 0 is set when white is to move, bits 1-2 are the consecutive passes), black captures,
+# white captures, ko point (row * size + col, or NO_KO)
+HEADER = struct.Struct('<BBHHH')
+NO_KO = 0xFFFF
+
+# Points are stored row by row, 2 bits each: 0 for empty, 1 for black and 2 for white
+EMPTY, BLACK, WHITE = 0, 1, 2
+
+# SPREAD[byte] puts each bit of a byte in the low bit of its own 2 bit slot, COMPACT[byte] does the opposite for
+# the low bits of the 4 slots in a byte
+SPREAD = [sum(((byte >> bit) & 1) << (2 * bit) for bit in range(8)).to_bytes(2, 'little') for byte in range(256)]
+COMPACT = [sum(((byte >> (2 * slot)) & 1) << slot for slot in range(4)) for byte in range(256)]
+_LOW_BITS = {}
+
+
+def record_size(size: int) -> int:
+    """
+    Returns the number of bytes a position on a board of a size takes
+
+    Args:
+        size(int): the number of rows (and columns) in the board
+    """
+    return HEADER.size + (size * size * 2 + 7) // 8
+
+
+def _dense(stones: int, size: int) -> int:
+    """
+    Drops the guard column from a BitBoard mask, leaving size * size bits row by row
+    """
+    stride = size + 1
+    row_mask = (1 << size) - 1
+    dense = 0
+    for row in range(size):
+        dense |= ((stones >> (row * stride)) & row_mask) << (row * size)
+    return dense
+
+
+def _sparse(dense: int, size: int) -> int:
+    """
+    Puts the guard column back into a mask made by _dense()
+    """
+    stride = size + 1
+    row_mask = (1 << size) - 1
+    stones = 0
+    for row in range(size):
+        stones |= ((dense >> (row * size)) & row_mask) << (row * stride)
+    return stones
+
+
+def _spread(dense: int, length: int) -> int:
+    """
+    Moves bit i of a mask to bit 2 * i, length is the number of bytes the mask fits in
+    """
+    return int.from_bytes(b''.join(SPREAD[byte] for byte in dense.to_bytes(length, 'little')), 'little')
+
+
+def _compact(spread: int, length: int) -> int:
+    """
+    Moves bit 2 * i of a mask to bit i, the opposite of _spread(), length is the number of bytes the result fits in
+    """
+    nibbles = bytes(COMPACT[byte] for byte in spread.to_bytes(length * 2, 'little'))
+    return int.from_bytes(bytes(low | (high << 4) for low, high in zip(nibbles[0::2], nibbles[1::2])), 'little')
+
+
+def encode_bitboard(bits: BitBoard, to_move: PlayerColors, captures: tuple = (0, 0), consecutive_passes: int = 0) -> bytes:
+    """
+    Packs a position given as a BitBoard
+
+    Args:
+        bits(BitBoard): the stones and ko point
+        to_move(PlayerColors): the color of the player to move
+        captures(tuple[int]): the (black, white) capture counts, each at most 65535
+        consecutive_passes(int): the number of consecutive passes that led to the position, at most 3
+    Returns:
+        record_size(bits.size) bytes
+    """
+    size = bits.size
+    length = (size * size + 7) // 8
+    black = _spread(_dense(bits.stones[0], size), length)
+    white = _spread(_dense(bits.stones[1], size), length)
+    ko = NO_KO if bits.ko < 0 else (bits.ko // bits.stride) * size + bits.ko % bits.stride
+    flags = to_move.value | (min(consecutive_passes, 3) << 1)
+    header = HEADER.pack(size, flags, captures[0], captures[1], ko)
+    return header + (black | (white << 1)).to_bytes(record_size(size) - HEADER.size, 'little')
+
+
+def decode_bitboard(data) -> tuple:
+    """
+    Unpacks a position into a BitBoard
+
+    Args:
+        data: the bytes of a position, or a memoryview of them
+    Raises:
+        ValueError: if the data is not a valid position
+    Returns:
+        A (BitBoard, player to move, (black, white) captures, consecutive passes) tuple
+    """
+    size, flags, black_captures, white_captures, ko = HEADER.unpack_from(data)
+    if size not in VALID_BOARD_LENGTHS or len(data) < record_size(size):
+        raise ValueError('Data is not a packed position.')
+    if flags >> 3:
+        raise ValueError(f'Data has unknown flags {flags:#x}.')
+    if ko != NO_KO and ko >= size * size:
+        raise ValueError(f'Data has a ko point {ko} off the board.')
+    length = (size * size + 7) // 8
+    points = int.from_bytes(data[HEADER.size:record_size(size)], 'little')
+    if points >> (size * size * 2):
+        raise ValueError('Data has points set after the last point of the board.')
+    low_bits = _LOW_BITS.get(size)
+    if low_bits is None:
+        low_bits = _LOW_BITS[size] = int.from_bytes(b'\x55' * (length * 2), 'little')
+    black = points & low_bits
+    white = (points >> 1) & low_bits
+    if black & white:
+        raise ValueError('Data has a point that is both black and white.')
+
+    bits = BitBoard(size)
+    bits.stones = [_sparse(_compact(black, length), size), _sparse(_compact(white, length), size)]
+    bits.rehash()
+    bits.ko = -1 if ko == NO_KO else bits.point(*divmod(ko, size))
+    if bits.ko >= 0 and bits.get(*divmod(ko, size)) is not None:
+        raise ValueError('Data has a stone on its ko point.')
+    return bits, PlayerColors(flags & 1), (black_captures, white_captures), (flags >> 1) & 3
+
+
+def encode(model: GoModel) -> bytes:
+    """
+    Packs the current position of a game
+
+    Args:
+        model(GoModel): the game
+    Returns:
+        record_size(model.nrows) bytes
+    """
+    return encode_bitboard(model.to_bitboard(), model.current_player.player_color,
+                           (model.player_b.capture_count, model.player_w.capture_count), model.consecutive_passes)
+
+
+def decode(data, superko: bool = False) -> GoModel:
+    """
+    Unpacks a position into a new game that starts from it
+
+    Args:
+        data: the bytes of a position, or a memoryview of them
+        superko(bool): True to forbid recreating any previous position instead of only the last one
+    Raises:
+        ValueError: if the data is not a valid position
+    Returns:
+        A GoModel at the position, with no moves to undo
+    """
+    bits, to_move, captures, consecutive_passes = decode_bitboard(data)
+    model = GoModel(bits.size, bits.size, superko)
+    model.restore_position(bits, to_move, captures, consecutive_passes)
+    return model
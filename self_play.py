@@ -0,0 +1,229 @@
+"""
+Title: Self Play Runner
+Purpose: Plays many headless games between two strategies across a process pool and streams the results as JSON lines
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from bit_board import choose_point
+from game_piece import stone
+from go_model import GoModel, VALID_BOARD_LENGTHS
+from mcts_player import MCTSPlayer
+from position import Position
+from solver import SolverPlayer
+
+
+def random_strategy(model: GoModel, rng: random.Random) -> Position | None:
+    """
+    Picks a random valid placement for the current player that doesn't fill one of their own eyes
+
+    Args:
+        model(GoModel): the game to pick a move in
+        rng(random.Random): the random number generator to use
+    Returns:
+        The Position to play at, or None to pass when there is nothing sensible left to play
+    """
+    color = model.current_player.player_color
+    bits = model.to_bitboard()
+    candidates = model.legal_moves() & ~bits.eye_points(color)
+    if not candidates:
+        return None
+    return Position(*bits.coords(choose_point(candidates, rng)))
+
+
+# Strategies that can be picked by name on the command line, each made by a factory so computer players with tables
+# aren't shared between games or worker processes
+STRATEGIES = {
+    'random': lambda: random_strategy,
+    'mcts': lambda: MCTSPlayer(playouts=200),
+    'solver': lambda: SolverPlayer(time_budget=1.0),
+}
+
+
+def load_strategy(name: str):
+    """
+    Returns a new strategy of a name registered in STRATEGIES, or imports one given as module:function
+
+    Args:
+        name(str): a key of STRATEGIES or a module:function path
+    Raises:
+        ValueError: if the name is not a known strategy and not a module:function path
+    """
+    if name in STRATEGIES:
+        return STRATEGIES[name]()
+    if ':' not in name:
+        raise ValueError(f"Unknown strategy {name!r}, use one of {sorted(STRATEGIES)} or module:function.")
+    module_name, function_name = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def play_game(game_id: int, size: int, black, white, seed: int = 0, max_moves: int = None) -> dict:
+    """
+    Plays one game between two strategies through the GoModel API
+
+    Args:
+        game_id(int): the number of the game, used with seed to seed the game's random number generator
+        size(int): the number of rows (and columns) in the board
+        black: the strategy for black, a callable taking (model, rng) and returning a Position or None to pass
+        white: the strategy for white
+        seed(int): the seed for the whole run
+        max_moves(int): the number of moves (including passes) after which the game is stopped, size * size * 3 by default
+    Raises:
+        ValueError: if a strategy returns an invalid placement
+    Returns:
+        A dict with the moves, final score, capture counts and length of the game
+    """
+    # Seeding by game rather than by worker keeps results the same however the games are spread across processes
+    rng = random.Random(f'{seed}:{game_id}')
+    if max_moves is None:
+        max_moves = size * size * 3
+
+    model = GoModel(size, size)
+    moves = []
+    while not model.is_game_over() and len(moves) < max_moves:
+        strategy = black if model.current_player is model.player_b else white
+        pos = strategy(model, rng)
+        if pos is None:
+            model.pass_turn()
+            moves.append(None)
+            continue
+
+        piece = stone(model.current_player.player_color)
+        if not model.is_valid_placement(pos, piece):
+            name = getattr(strategy, '__name__', type(strategy).__name__)
+            raise ValueError(f'Strategy {name} returned an invalid placement at ({pos.row}, {pos.col}).')
+        model.set_piece(pos, piece)
+        model.capture()
+        model.set_next_player()
+        moves.append([pos.row, pos.col])
+
+    score = model.calculate_score()
+    return {
+        'game': game_id,
+        'seed': seed,
+        'size': size,
+        'moves': moves,
+        'score': score,
+        'captures': [model.player_b.capture_count, model.player_w.capture_count],
+        'length': len(moves),
+        'winner': 'BLACK' if score[0] > score[1] else 'WHITE',
+    }
+
+
+def _play_chunk(game_ids: list, size: int, black_name: str, white_name: str, seed: int, max_moves: int) -> list:
+    """
+    Plays a chunk of games inside a worker process, loading the strategies by name so they don't need to be pickled
+
+    Every game gets new strategies, so a game's result doesn't depend on which games shared its chunk.
+    """
+    return [play_game(game_id, size, load_strategy(black_name), load_strategy(white_name), seed, max_moves)
+            for game_id in game_ids]
+
+
+def run_games(count: int, size: int = 9, black: str = 'random', white: str = 'random', workers: int = None,
+              chunk_size: int = 25, seed: int = 0, max_moves: int = None):
+    """
+    Plays games across a process pool and yields each result as soon as its chunk is finished, in game order
+
+    Only about two chunks per worker are queued at a time and a chunk is dropped once its results are yielded, so
+    memory stays flat however many games are played, and closing the generator early returns without waiting for the
+    rest of the run.
+
+    Args:
+        count(int): the number of games to play
+        size(int): the number of rows (and columns) in the board, one of VALID_BOARD_LENGTHS
+        black(str): the name of black's strategy, see load_strategy()
+        white(str): the name of white's strategy
+        workers(int): the number of worker processes, 1 plays the games in this process, None uses every core
+        chunk_size(int): the number of games sent to a worker at a time
+        seed(int): the seed for the whole run, the same seed always gives the same games
+        max_moves(int): the number of moves after which a game is stopped
+    Raises:
+        ValueError: if size is not a valid board length or count or chunk_size is less than 1
+    """
+    if size not in VALID_BOARD_LENGTHS:
+        raise ValueError(f"Size must be one of {VALID_BOARD_LENGTHS}.")
+    if count < 1 or chunk_size < 1:
+        raise ValueError('Count and chunk size must be at least 1.')
+
+    chunks = (list(range(start, min(start + chunk_size, count))) for start in range(0, count, chunk_size))
+    if workers == 1:
+        for chunk in chunks:
+            yield from _play_chunk(chunk, size, black, white, seed, max_moves)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    in_flight = 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(_play_chunk, chunk, size, black, white, seed, max_moves))
+            if len(pending) >= in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize(results: list, seconds: float) -> dict:
+    """
+    Summarizes a run of games
+
+    Args:
+        results(list): the results from run_games()
+        seconds(float): how long the run took
+    Returns:
+        A dict with the number of games, wins per color, average length and games per second
+    """
+    games = len(results)
+    black_wins = sum(1 for result in results if result['winner'] == 'BLACK')
+    return {
+        'games': games,
+        'black_wins': black_wins,
+        'white_wins': games - black_wins,
+        'average_length': sum(result['length'] for result in results) / games if games else 0,
+        'seconds': seconds,
+        'games_per_second': games / seconds if seconds else 0,
+    }
+
+
+def main(argv: list = None):
+    """
+    Runs self play from the command line, writing one JSON line per game and a summary to stderr
+    """
+    parser = argparse.ArgumentParser(description='Play headless Go games between two strategies.')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--size', type=int, default=9, choices=VALID_BOARD_LENGTHS, help='board size')
+    parser.add_argument('--black', default='random', help='strategy for black (name or module:function)')
+    parser.add_argument('--white', default='random', help='strategy for white (name or module:function)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: every core)')
+    parser.add_argument('--chunk-size', type=int, default=25, help='games sent to a worker at a time')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the whole run')
+    parser.add_argument('--max-moves', type=int, default=None, help='stop a game after this many moves')
+    parser.add_argument('--output', default='-', help='file to write JSON lines to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in run_games(args.games, args.size, args.black, args.white, args.workers, args.chunk_size,
+                                args.seed, args.max_moves):
+            output.write(json.dumps(result) + '\n')
+            results.append({'winner': result['winner'], 'length': result['length']})
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(summarize(results, time.perf_counter() - start)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
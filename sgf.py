@@ -0,0 +1,345 @@
+"""
+Title: SGF Reading, Writing and Replay
+Purpose: Streams games out of SGF collections one at a time, writes a GoModel's moves as SGF and replays SGF games through the model's rules
+"""
+import argparse
+import json
+import re
+import sys
+import time
+
+from bit_board import BitBoard
+from game_piece import stone
+from go_model import GoModel
+from player_colors import PlayerColors
+from position import Position
+
+# One token of an SGF file: a bracket, a semicolon, or a property name followed by all of its [values]
+_TOKEN = re.compile(r'\s*(?:([();])|([A-Za-z]+)\s*((?:\[(?:[^\\\]]|\\.)*\]\s*)+))', re.DOTALL)
+_VALUE = re.compile(r'\[((?:[^\\\]]|\\.)*)\]', re.DOTALL)
+_ESCAPE = re.compile(r'\\(\r\n|\n\r|\n|\r|.)', re.DOTALL)
+
+_COLORS = {'B': PlayerColors.BLACK, 'W': PlayerColors.WHITE}
+
+
+class SgfGame:
+    """
+    Represents the main line of one game from an SGF file
+
+    Attributes:
+        properties(dict): the root node's properties, each name mapped to its list of values
+        size(int): the number of rows (and columns) in the board
+        komi(float): the points given to white for playing second
+        setup(list): (PlayerColors, (row, col)) pairs for the stones placed before the first move
+        to_move(PlayerColors): the player to move in the setup position, from the PL property, black by default
+        moves(list): (PlayerColors, (row, col)) pairs for each move, with None in place of (row, col) for a pass
+    """
+    def __init__(self, nodes: list):
+        """
+        Initializes the game from the nodes of its main line
+
+        Args:
+            nodes(list[dict]): the properties of each node, root first
+        Raises:
+            ValueError: if the board isn't square, a point can't be read or the player to move isn't B or W
+        """
+        self.properties = nodes[0] if nodes else {}
+        size = self.properties.get('SZ', ['19'])[0]
+        if ':' in size:
+            ncols, nrows = size.split(':')
+            if ncols != nrows:
+                raise ValueError(f'Only square boards are supported, not {size}.')
+            size = ncols
+        self.size = int(size)
+        self.komi = float(self.properties.get('KM', ['6.5'])[0] or 6.5)
+
+        self.setup = []
+        for name, color in (('AB', PlayerColors.BLACK), ('AW', PlayerColors.WHITE)):
+            for value in self.properties.get(name, []):
+                self.setup.extend((color, coord) for coord in self.__points(value))
+        player = self.properties.get('PL', ['B'])[0].upper()
+        if player not in _COLORS:
+            raise ValueError(f'Invalid player to move [{player}].')
+        self.to_move = _COLORS[player]
+
+        self.moves = []
+        for node in nodes:
+            for name, color in _COLORS.items():
+                if name in node:
+                    self.moves.append((color, self.__point(node[name][0])))
+
+    def __point(self, value: str) -> tuple | None:
+        """
+        Returns the (row, col) of an SGF point such as 'dc', or None for a pass
+        """
+        if value == '' or (value == 'tt' and self.size <= 19):
+            return None
+        if len(value) != 2 or not value.isalpha():
+            raise ValueError(f'Invalid point [{value}].')
+        col, row = (ord(char) - ord('a') if char.islower() else ord(char) - ord('A') + 26 for char in value)
+        return row, col
+
+    def __points(self, value: str) -> list:
+        """
+        Returns every (row, col) of an SGF point or compressed rectangle of points such as 'aa:cc'
+        """
+        if ':' not in value:
+            return [self.__point(value)]
+        (top, left), (bottom, right) = (self.__point(corner) for corner in value.split(':'))
+        return [(row, col) for row in range(top, bottom + 1) for col in range(left, right + 1)]
+
+
+def _unescape(value: str) -> str:
+    """
+    Removes SGF escapes from a property value: a backslash keeps the next character and an escaped newline is dropped
+    """
+    return _ESCAPE.sub(lambda match: '' if match.group(1) in ('\n', '\r', '\r\n', '\n\r') else match.group(1), value)
+
+
+def read_games(source, chunk_size: int = 1 << 16):
+    """
+    Reads the games of an SGF collection lazily, only ever holding one chunk of the file and one game in memory
+
+    Only the main line (the first variation at every branch) of each game is kept.
+
+    Args:
+        source: the path of an SGF file, or a text file object
+        chunk_size(int): the number of characters read at a time
+    Raises:
+        ValueError: if the file isn't valid SGF
+    Yields:
+        An SgfGame for each game in the collection
+    """
+    for nodes in _read_main_lines(source, chunk_size):
+        yield SgfGame(nodes)
+
+
+def _read_main_lines(source, chunk_size: int):
+    """
+    Yields the main line of each game in an SGF collection as a list of node property dicts, see read_games()
+    """
+    if isinstance(source, str):
+        with open(source, encoding='utf-8', errors='replace') as file:
+            yield from _read_main_lines(file, chunk_size)
+        return
+
+    buffer = ''
+    position = 0
+    at_end = False
+
+    # One entry per open bracket: whether that game tree is on the main line and whether it already has a variation
+    on_main_line: list = []
+    has_variation: list = []
+    nodes: list = []
+    while True:
+        match = _TOKEN.match(buffer, position)
+
+        # A token touching the end of the buffer may carry on into the next chunk
+        if (match is None or match.end() == len(buffer)) and not at_end:
+            chunk = source.read(chunk_size)
+            at_end = chunk == ''
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if match is None:
+            if buffer[position:].strip():
+                raise ValueError(f'Invalid SGF near {buffer[position:position + 20]!r}.')
+            if on_main_line:
+                raise ValueError('SGF ended inside a game.')
+            return
+        position = match.end()
+
+        bracket, name, values = match.groups()
+        if bracket == '(':
+            if not on_main_line:
+                nodes = []
+                on_main_line.append(True)
+            else:
+                on_main_line.append(on_main_line[-1] and not has_variation[-1])
+                has_variation[-1] = True
+            has_variation.append(False)
+        elif not on_main_line:
+            raise ValueError(f'Invalid SGF near {match.group(0).strip()[:20]!r}, expected "(".')
+        elif bracket == ')':
+            on_main_line.pop()
+            has_variation.pop()
+            if not on_main_line:
+                yield nodes
+        elif bracket == ';':
+            if on_main_line[-1]:
+                nodes.append({})
+        elif on_main_line[-1]:
+            if not nodes:
+                raise ValueError(f'Property {name} is outside of a node.')
+            # Old files may spell names out in mixed case, such as AddBlack for AB
+            name = ''.join(char for char in name if char.isupper())
+            nodes[-1].setdefault(name, []).extend(_unescape(value) for value in _VALUE.findall(values))
+
+
+def _point_to_sgf(row: int, col: int) -> str:
+    """
+    Returns the SGF point for a (row, col), column first
+    """
+    return chr(ord('a') + col) + chr(ord('a') + row)
+
+
+def write_game(model: GoModel, komi: float = 6.5) -> str:
+    """
+    Writes the moves made in a GoModel as an SGF game, adding the result once the game is over
+
+    Stones already on the board before the first move (from a restored position or an SGF game's setup) are written
+    as AB and AW setup properties rather than moves, with PL when white is to move in that position.
+
+    Args:
+        model(GoModel): the game to write
+        komi(float): the points given to white for playing second
+    Raises:
+        ValueError: if a move in the model's history cleared a square instead of placing a piece
+    Returns:
+        The SGF text of the game
+    """
+    parts = [f'(;GM[1]FF[4]CA[UTF-8]SZ[{model.nrows}]KM[{komi:g}]']
+    if model.is_game_over():
+        black, white = model.calculate_score(komi)
+        if black > white:
+            parts.append(f'RE[B+{black - white:g}]')
+        elif white > black:
+            parts.append(f'RE[W+{white - black:g}]')
+        else:
+            parts.append('RE[0]')
+    start = model.fork()
+    start.seek(0)
+    bits = start.to_bitboard()
+    for color in (PlayerColors.BLACK, PlayerColors.WHITE):
+        points = [f'[{_point_to_sgf(row, col)}]' for row in range(bits.size) for col in range(bits.size)
+                  if bits.get(row, col) == color]
+        if points:
+            parts.append(f'A{color.name[0]}' + ''.join(points))
+    if start.current_player.player_color != PlayerColors.BLACK:
+        parts.append(f'PL[{start.current_player.player_color.name[0]}]')
+    for record in model.board_history:
+        if record.is_pass:
+            parts.append(f';{record.player.player_color.name[0]}[]')
+        elif record.piece is None:
+            raise ValueError(f'The move at {record.coord} cleared a square, which SGF can\'t record as a move.')
+        else:
+            parts.append(f';{record.piece.color.name[0]}[{_point_to_sgf(*record.coord)}]')
+    parts.append(')\n')
+    return ''.join(parts)
+
+
+def replay(game: SgfGame, superko: bool = False) -> GoModel:
+    """
+    Plays an SGF game through a GoModel, checking every move with the model's rules
+
+    Setup stones are put on the board as the starting position, so they aren't moves that can be undone and
+    write_game() writes them back as setup. When a color moves twice in a row (as white does first in a handicap game)
+    the turn is handed to it without a pass.
+
+    Args:
+        game(SgfGame): the game to replay
+        superko(bool): True to forbid recreating any previous position instead of only the last one
+    Raises:
+        ValueError: if the board size isn't supported, a setup stone is off the board or a move is illegal
+    Returns:
+        The GoModel after the last move
+    """
+    model = GoModel(game.size, game.size, superko)
+    if game.setup or game.to_move != PlayerColors.BLACK:
+        bits = BitBoard(game.size)
+        for color, (row, col) in game.setup:
+            if not (0 <= row < game.size and 0 <= col < game.size):
+                raise ValueError(f'Setup stone at {(row, col)} is off the board.')
+            bits.set(row, col, color)
+        model.restore_position(bits, game.to_move)
+
+    for number, (color, coord) in enumerate(game.moves, 1):
+        if model.current_player.player_color != color:
+            model.set_next_player()
+        if coord is None:
+            model.pass_turn()
+            continue
+        pos = Position(*coord)
+        piece = stone(color)
+        if not model.is_valid_placement(pos, piece):
+            raise ValueError(f'Move {number} ({color.name} at {coord}) is illegal.')
+        model.set_piece(pos, piece)
+        model.capture()
+        model.set_next_player()
+    return model
+
+
+def replay_games(source, superko: bool = False):
+    """
+    Replays every game of an SGF collection, one at a time
+
+    Args:
+        source: the path of an SGF file, or a text file object
+        superko(bool): True to forbid recreating any previous position instead of only the last one
+    Raises:
+        ValueError: if the file isn't valid SGF, a bad game on its own is reported instead
+    Yields:
+        A dict per game with its number, number of moves and final score, or the error that stopped it
+    """
+    for number, nodes in enumerate(_read_main_lines(source, 1 << 16)):
+        result = {'game': number, 'moves': 0}
+        try:
+            game = SgfGame(nodes)
+            result['moves'] = len(game.moves)
+            model = replay(game, superko)
+        except ValueError as error:
+            result['error'] = str(error)
+        else:
+            result['score'] = model.calculate_score(game.komi)
+        yield result
+
+
+def summarize(results: list, seconds: float) -> dict:
+    """
+    Summarizes a replay run
+
+    Args:
+        results(list): the results from replay_games()
+        seconds(float): how long the run took
+    Returns:
+        A dict with the number of games, invalid games, moves and games and moves per second
+    """
+    games = len(results)
+    moves = sum(result['moves'] for result in results)
+    return {
+        'games': games,
+        'invalid': sum(1 for result in results if result.get('error')),
+        'moves': moves,
+        'seconds': seconds,
+        'games_per_second': games / seconds if seconds else 0,
+        'moves_per_second': moves / seconds if seconds else 0,
+    }
+
+
+def main(argv: list = None):
+    """
+    Replays SGF files from the command line, writing one JSON line per game and a summary to stderr
+    """
+    parser = argparse.ArgumentParser(description='Replay SGF game collections through the Go rules.')
+    parser.add_argument('files', nargs='+', help='SGF files to replay')
+    parser.add_argument('--superko', action='store_true', help='forbid recreating any previous position')
+    parser.add_argument('--output', default=None, help='file to write JSON lines to (default: only the summary)')
+    args = parser.parse_args(argv)
+
+    output = None if args.output is None else (sys.stdout if args.output == '-' else open(args.output, 'w'))
+    results = []
+    start = time.perf_counter()
+    try:
+        for path in args.files:
+            for result in replay_games(path, args.superko):
+                if output is not None:
+                    output.write(json.dumps({'file': path, **result}) + '\n')
+                results.append({'moves': result['moves'], 'error': 'error' in result})
+    finally:
+        if output is not None and output is not sys.stdout:
+            output.close()
+    print(json.dumps(summarize(results, time.perf_counter() - start)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
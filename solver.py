@@ -0,0 +1,517 @@
+"""
+Title: GoSolver Class
+Purpose: Solves positions on small boards exactly with alpha-beta search, keeps the solved positions in a table that is
+    saved to disk and reused by later runs, and plays perfectly from them as a computer opponent
+"""
+import os
+import pickle
+import time
+
+from bit_board import BitBoard, iter_points
+from game_piece import stone
+from go_model import GoModel
+from mcts_player import PASS
+from player_colors import PlayerColors
+from position import Position
+
+# Bumped whenever the keys or saved layout change, so an old table file is ignored instead of misread
+FORMAT_VERSION = 1
+
+# The depth stored with a solved position, deeper than any search so it always answers
+SOLVED = 1 << 30
+
+# The depth stored with a position searched to the end in which some line was cut short because it repeated a
+# position, so its value depends on the moves that led to it: it answers the rest of the run but is never saved
+COMPLETE = SOLVED - 1
+
+# What the value of a table entry is: the exact value, or only a lower or upper bound on it
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# The number of positions searched between looks at the clock
+CLOCK_INTERVAL = 256
+
+INFINITY = float('inf')
+
+
+class _OutOfTime(Exception):
+    """
+    Raised inside a search when its time budget runs out, to abandon the iteration
+    """
+
+
+def area_margin(bits: BitBoard, settled: tuple = None) -> int:
+    """
+    Returns black's points on the board minus white's, counted by BitBoard.area() the same way GoModel.calculate_score
+    counts them, so it plus the capture counts and komi is the final margin
+
+    Args:
+        bits(BitBoard): the position
+        settled(tuple[int]): the (black, white) settled masks to use instead of working out bits.settled()
+    """
+    black, white = bits.area(settled)
+    return black - white
+
+
+class SolutionTable:
+    """
+    Represents the solver's transposition table, which can be kept on disk between runs
+
+    Each entry is keyed by the board size, Zobrist hash, color to move, ko point and number of consecutive passes of a
+    position, and holds (depth, value, flag, move): the value for the player to move of every move still to come (area
+    and captures), whether it is EXACT or a LOWER or UPPER bound, how many moves deep it was searched, and the best move
+    found. Solved positions have depth SOLVED: their value holds however deep the game goes on and whatever moves led
+    to them. Only they are saved, the others are cheap to search again or, with depth COMPLETE, depend on the line
+    that reached them.
+
+    Attributes:
+        capacity(int): the number of entries at which the unsolved ones are all forgotten
+        path(str): the file the table is loaded from and saved to, or None to keep it in memory only
+        __entries(dict): the entries by position key
+    Methods:
+        get(): returns the entry of a position, or None
+        put(): stores the entry of a position
+        solved_count(): returns the number of solved positions kept
+        save(): writes the solved positions to the table's file
+        load(): reads solved positions written by save()
+        __len__(): returns the number of entries kept
+    """
+    def __init__(self, capacity: int = 1_000_000, path: str = None):
+        """
+        Initializes the table, loading the positions saved at path if the file exists
+
+        Args:
+            capacity(int): the number of entries at which the unsolved ones are all forgotten
+            path(str): the file the table is loaded from and saved to, or None to keep it in memory only
+        Raises:
+            ValueError: if capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1.')
+        self.capacity = capacity
+        self.path = path
+        self.__entries = {}
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of entries kept
+        """
+        return len(self.__entries)
+
+    def get(self, key: tuple) -> tuple | None:
+        """
+        Returns the (depth, value, flag, move) of a position, or None if it hasn't been searched
+        """
+        return self.__entries.get(key)
+
+    def put(self, key: tuple, entry: tuple):
+        """
+        Stores the (depth, value, flag, move) of a position, never replacing a solved position with an unsolved one
+
+        Once the table reaches its capacity every unsolved entry is forgotten, solved ones are always kept.
+        """
+        old = self.__entries.get(key)
+        if old is not None and old[0] == SOLVED and entry[0] != SOLVED:
+            return
+        self.__entries[key] = entry
+        if len(self.__entries) > self.capacity:
+            self.__entries = {key: entry for key, entry in self.__entries.items() if entry[0] == SOLVED}
+
+    def solved_count(self) -> int:
+        """
+        Returns the number of solved positions kept
+        """
+        return sum(1 for entry in self.__entries.values() if entry[0] == SOLVED)
+
+    def save(self, path: str = None):
+        """
+        Writes the solved positions to a file, replacing the file in one step so a crash can't leave half a table
+
+        Args:
+            path(str): the file to write, the table's own path by default
+        Raises:
+            ValueError: if there is no path to save to
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('The table has no path to save to.')
+        solved = {key: entry for key, entry in self.__entries.items() if entry[0] == SOLVED}
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump({'version': FORMAT_VERSION, 'entries': solved}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def load(self, path: str = None) -> int:
+        """
+        Reads solved positions written by save()
+
+        The file is unpickled, so only load files this program wrote.
+
+        Args:
+            path(str): the file to read, the table's own path by default
+        Raises:
+            ValueError: if there is no path to load from or the file isn't a solution table
+        Returns:
+            The number of positions read, 0 if the file was saved by an older format
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError('The table has no path to load from.')
+        with open(path, 'rb') as file:
+            try:
+                saved = pickle.load(file)
+            except (pickle.UnpicklingError, EOFError) as error:
+                raise ValueError(f'{path} is not a solution table.') from error
+        if not isinstance(saved, dict) or 'entries' not in saved:
+            raise ValueError(f'{path} is not a solution table.')
+        if saved.get('version') != FORMAT_VERSION:
+            return 0
+        self.__entries.update(saved['entries'])
+        return len(saved['entries'])
+
+
+class Solution:
+    """
+    Represents the result of solving a position
+
+    Attributes:
+        move(Position): the best move for the player to move, or None to pass
+        margin(float): black's final score minus white's, komi included, if both sides play the best moves found
+        exact(bool): True if every line was searched to the end of the game, so margin is the result of perfect play,
+            False if the search ran out of time or depth first and margin is an estimate
+        repeated(bool): True if some line was cut short because it repeated a position, so an exact margin is perfect
+            play under positional superko counted from this position, and it isn't saved
+        depth(int): the number of moves ahead the last finished search looked
+        nodes(int): the number of positions searched
+        seconds(float): how long the search took
+    """
+    def __init__(self, move: Position | None, margin: float, exact: bool, repeated: bool, depth: int, nodes: int,
+                 seconds: float):
+        """
+        Initializes the result
+        """
+        self.move = move
+        self.margin = margin
+        self.exact = exact
+        self.repeated = repeated
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+
+class GoSolver:
+    """
+    Represents an exact solver for small boards: negamax alpha-beta search with iterative deepening
+
+    The search works on BitBoard copies of the game and maximizes the final score margin (territory, stones and
+    captures, as GoModel.calculate_score counts them). Positions are looked up in a SolutionTable by Zobrist hash, so
+    transpositions are searched once and solved positions are never searched again, in this run or a later one that
+    loads the table. Moves are tried best first: the table's move, then the moves that caused cutoffs most often
+    (the history heuristic), then moves filling the player's own eyes, then passing.
+
+    No one plays in the regions BitBoard.settled() gives a color, which can't change owner and are scored as they are.
+    Inside the search a move may not repeat any position earlier in the line being searched (positional superko), so
+    every line ends and long kos can be solved. The model only forbids retaking a ko at once, so a position whose
+    search cut a line short this way has a value that depends on the line that reached it: it is stored with depth
+    COMPLETE, reused for the rest of the run and never saved. A position solved without meeting a repetition has the
+    same value under both rules and whatever moves led to it, and only those are stored as SOLVED. The model has the
+    final say on which root moves are legal.
+
+    Attributes:
+        table(SolutionTable): the transposition table, shared by every solve() call
+        time_budget(float): the largest number of seconds per solve, or None for no limit
+        max_depth(int): the deepest search, or None for 4 moves per point of the board
+        komi(float): the points given to white for playing second
+        nodes(int): the number of positions searched by the last solve()
+        __history(list): the history heuristic score of each move for each color
+        __settled(tuple[int]): the (black, white) settled masks of the position being solved
+        __frozen(int): the settled points of either color, which no one plays at
+        __deadline(float): the time.perf_counter() at which the search gives up, or None
+        __line(set): the hashes of the positions in the line being searched, which can't be repeated
+    Methods:
+        solve(): returns the best move and the final margin of a game's current position
+    """
+    def __init__(self, table: SolutionTable = None, time_budget: float = None, max_depth: int = None,
+                 komi: float = 6.5):
+        """
+        Initializes the solver's settings
+
+        Args:
+            table(SolutionTable): the transposition table, a new in memory one by default
+            time_budget(float): the largest number of seconds per solve, or None for no limit
+            max_depth(int): the deepest search, or None for 4 moves per point of the board
+            komi(float): the points given to white for playing second
+        Raises:
+            ValueError: if max_depth is less than 1
+        """
+        if max_depth is not None and max_depth < 1:
+            raise ValueError('Max depth must be at least 1.')
+        self.table = SolutionTable() if table is None else table
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.komi = komi
+        self.nodes = 0
+        self.__history = None
+        self.__settled = (0, 0)
+        self.__frozen = 0
+        self.__deadline = None
+        self.__line = set()
+
+    def solve(self, model: GoModel) -> Solution:
+        """
+        Searches a game's current position one move deeper at a time until it is solved or the time or depth runs out
+
+        The first iteration always finishes, so there is a move to return however small the time budget.
+
+        Args:
+            model(GoModel): the game, it is not changed
+        Returns:
+            The Solution of the last finished iteration
+        """
+        start = time.perf_counter()
+        color = model.current_player.player_color
+        bits = model.to_bitboard()
+        captures = model.player_b.capture_count - model.player_w.capture_count
+        sign = 1 if color == PlayerColors.BLACK else -1
+        self.nodes = 0
+        self.__history = [[0] * (bits.size * bits.stride) for _ in PlayerColors]
+        self.__settled = bits.settled()
+        self.__frozen = self.__settled[0] | self.__settled[1]
+        self.__line = {bits.position_hash}
+
+        if model.is_game_over():
+            margin = area_margin(bits, self.__settled) + captures - self.komi
+            return Solution(None, margin, True, False, 0, 0, time.perf_counter() - start)
+
+        # The model decides which moves are legal at the root, e.g. superko
+        moves = model.legal_moves() & ~self.__frozen
+        max_depth = self.max_depth or 4 * bits.size * bits.size
+        best_move, value, solved, repeated, depth = PASS, 0, False, False, 0
+        while depth < max_depth and not solved:
+            self.__deadline = None
+            if depth and self.time_budget is not None:
+                self.__deadline = start + self.time_budget
+            try:
+                best_move, value, solved, repeated = self.__root(bits, color, model.consecutive_passes, depth + 1,
+                                                                 moves)
+            except _OutOfTime:
+                break
+            depth += 1
+
+        move = None if best_move == PASS else Position(*bits.coords(best_move))
+        margin = sign * value + captures - self.komi
+        return Solution(move, margin, solved, repeated, depth, self.nodes, time.perf_counter() - start)
+
+    def __root(self, bits: BitBoard, color: PlayerColors, passes: int, depth: int, moves: int) -> tuple:
+        """
+        Searches every root move to a depth and returns (best move, its value for the player to move, solved, repeated)
+        """
+        key = (bits.size, bits.position_hash, color.value, bits.ko, passes)
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            first = entry[3]
+            # A solved position's best move is still best when the model forbids some other moves
+            if entry[0] == SOLVED and entry[2] == EXACT and (first == PASS or moves >> first & 1):
+                return first, entry[1], True, False
+
+        alpha = -INFINITY
+        best_move = PASS
+        solved = True
+        repeated = False
+        for move in self.__order(bits, color.value, moves, first):
+            result = self.__child(bits, color.value, passes, move, depth, alpha, INFINITY)
+            if result is None:
+                repeated = True
+                continue
+            score, child_solved, child_repeated = result
+            solved = solved and child_solved
+            repeated = repeated or child_repeated
+            if score > alpha:
+                alpha, best_move = score, move
+        # The result only holds for the position itself if the model didn't forbid any move the search allows
+        if moves == bits.legal_moves(color) & ~self.__frozen:
+            self.table.put(key, (self.__depth_of(depth, solved, repeated), alpha, EXACT, best_move))
+        return best_move, alpha, solved, repeated
+
+    @staticmethod
+    def __depth_of(depth: int, solved: bool, repeated: bool) -> int:
+        """
+        Returns the depth to store a searched position with: SOLVED, COMPLETE or the depth it was searched to
+        """
+        if not solved:
+            return depth
+        return COMPLETE if repeated else SOLVED
+
+    def __order(self, bits: BitBoard, value: int, moves: int, first: int | None) -> list:
+        """
+        Returns a mask of moves and passing as a list, best first: the table's move, then the others by history score,
+        then the ones filling the player's own eyes, which is rarely right but still tried so the result stays exact,
+        then passing
+        """
+        eyes = bits.eye_points((PlayerColors.BLACK, PlayerColors.WHITE)[value])
+        ordered = sorted(iter_points(moves & ~eyes), key=self.__history[value].__getitem__, reverse=True)
+        ordered.extend(iter_points(moves & eyes))
+        ordered.append(PASS)
+        if first is not None and first in ordered and ordered[0] != first:
+            ordered.remove(first)
+            ordered.insert(0, first)
+        return ordered
+
+    def __child(self, bits: BitBoard, value: int, passes: int, move: int, depth: int, alpha: float,
+                beta: float) -> tuple | None:
+        """
+        Makes a move on a copy of the board and returns (its value for the player making it, solved, repeated), or
+        None if the move repeats a position of the line
+        """
+        child = bits.copy()
+        if move == PASS:
+            child.ko = -1
+            score, solved, repeated = self.__search(child, value ^ 1, passes + 1, depth - 1, -beta, -alpha)
+            return -score, solved, repeated
+
+        # Every captured stone is a point for the player making the move
+        gain = child.play(move, (PlayerColors.BLACK, PlayerColors.WHITE)[value], check=False).bit_count()
+        if child.position_hash in self.__line:
+            return None
+        self.__line.add(child.position_hash)
+        try:
+            score, solved, repeated = self.__search(child, value ^ 1, 0, depth - 1, gain - beta, gain - alpha)
+        finally:
+            self.__line.discard(child.position_hash)
+        return gain - score, solved, repeated
+
+    def __search(self, bits: BitBoard, value: int, passes: int, depth: int, alpha: float, beta: float) -> tuple:
+        """
+        Returns (the value of a position for the player to move, solved, repeated), exact if it is between alpha and
+        beta and otherwise a bound on the side it fell. Solved is True if every line was searched to the end of the
+        game, repeated if any of them was cut short because it repeated a position of the line.
+        """
+        self.nodes += 1
+        if self.__deadline is not None and self.nodes % CLOCK_INTERVAL == 0 and time.perf_counter() > self.__deadline:
+            raise _OutOfTime()
+        key = (bits.size, bits.position_hash, value, bits.ko, passes)
+        entry = self.table.get(key)
+        first = None
+        if passes >= 2:
+            # The game is over, scored the way the model will score it, which may find more settled regions
+            if entry is None:
+                margin = area_margin(bits)
+                entry = (SOLVED, margin if value == 0 else -margin, EXACT, PASS)
+                self.table.put(key, entry)
+            return entry[1], True, False
+        if entry is not None:
+            entry_depth, entry_value, flag, first = entry
+            if entry_depth >= depth:
+                if (flag == EXACT or (flag == LOWER and entry_value >= beta)
+                        or (flag == UPPER and entry_value <= alpha)):
+                    return entry_value, entry_depth >= COMPLETE, entry_depth == COMPLETE
+        if depth == 0:
+            # The regions settled at the root are still settled, as no one plays in them
+            margin = area_margin(bits, self.__settled)
+            return (margin if value == 0 else -margin), False, False
+
+        moves = bits.legal_moves((PlayerColors.BLACK, PlayerColors.WHITE)[value]) & ~self.__frozen
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = PASS
+        solved = True
+        repeated = False
+        for move in self.__order(bits, value, moves, first):
+            result = self.__child(bits, value, passes, move, depth, alpha, beta)
+            if result is None:
+                repeated = True
+                continue
+            score, child_solved, child_repeated = result
+            solved = solved and child_solved
+            repeated = repeated or child_repeated
+            if score > best:
+                best, best_move = score, move
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        if move != PASS:
+                            self.__history[value][move] += depth * depth
+                        break
+
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table.put(key, (self.__depth_of(depth, solved, repeated), best, flag, best_move))
+        return best, solved, repeated
+
+
+class SolverPlayer:
+    """
+    Represents a computer player that plays the moves of a GoSolver, perfect play once the position is solved
+
+    On 6x6 boards small endgames are solved within a move's time budget, the solved positions are kept in the table
+    and saved by close() so the player gets stronger the more it has played. Bigger positions get the best move of the
+    deepest search that finished in time.
+
+    Attributes:
+        solver(GoSolver): the solver choosing the moves
+        last_solution(Solution): the solution of the last move chosen, or None
+    Methods:
+        choose_move(): returns the Position to play for the current player, or None to pass
+        play_turn(): chooses a move and makes it on the model the same way the GUI does
+        close(): saves the solved positions if the table has a file
+        __call__(): lets the player be used as a self_play strategy
+    """
+    def __init__(self, time_budget: float = 1.0, max_depth: int = None, komi: float = 6.5, path: str = None,
+                 capacity: int = 1_000_000):
+        """
+        Initializes the player's solver, loading the solved positions saved at path if the file exists
+
+        Args:
+            time_budget(float): the largest number of seconds per move, or None for no limit
+            max_depth(int): the deepest search, or None for 4 moves per point of the board
+            komi(float): the points given to white for playing second
+            path(str): the file the solved positions are kept in, or None to keep them in memory only
+            capacity(int): the number of table entries at which the unsolved ones are forgotten
+        """
+        self.solver = GoSolver(SolutionTable(capacity, path), time_budget, max_depth, komi)
+        self.last_solution = None
+
+    def choose_move(self, model: GoModel, rng=None) -> Position | None:
+        """
+        Solves the model's current position and returns the best move
+
+        Args:
+            model(GoModel): the game to choose a move in, it is not changed
+            rng: unused, the solver doesn't need chance, it is accepted so the player works as a self_play strategy
+        Returns:
+            The Position to play at for the current player, or None to pass
+        """
+        self.last_solution = self.solver.solve(model)
+        return self.last_solution.move
+
+    def play_turn(self, model: GoModel) -> Position | None:
+        """
+        Chooses a move for the current player and makes it, passing if the solver prefers to
+
+        Args:
+            model(GoModel): the game to play in
+        Returns:
+            The Position played at, or None if the player passed
+        """
+        pos = self.choose_move(model)
+        if pos is None:
+            model.pass_turn()
+        else:
+            model.set_piece(pos, stone(model.current_player.player_color))
+            model.capture()
+            model.set_next_player()
+        return pos
+
+    def close(self):
+        """
+        Saves the solved positions to the table's file, if it has one
+        """
+        if self.solver.table.path is not None:
+            self.solver.table.save()
+
+    def __call__(self, model: GoModel, rng=None) -> Position | None:
+        """
+        Lets the player be used as a self_play strategy
+        """
+        return self.choose_move(model, rng)
@@ -0,0 +1,62 @@
+"""
+Title: StoneChain Class
+Purpose: Keeps track of a chain of connected pieces and the empty squares touching it so captures don't need to search the board
+"""
+from player_colors import PlayerColors
+
+class StoneChain:
+    """
+    Represents a chain of same colored pieces connected vertically and horizontally (not diagonally)
+
+    Attributes:
+        color(PlayerColors): the color of every piece in the chain
+        stones(set): the (row, col) coordinates of the pieces in the chain
+        liberties(set): the (row, col) coordinates of the empty squares touching the chain
+        owner: the game allowed to change the chain in place, a game that shares it with a fork copies it first
+    Methods:
+        merge(): absorbs another chain of the same color into this one
+        copy(): returns an unowned chain with its own sets of stones and liberties
+        __len__(): returns the number of pieces in the chain
+    """
+    __slots__ = ('color', 'stones', 'liberties', 'owner')
+
+    def __init__(self, color: PlayerColors, stones: set = None, liberties: set = None, owner=None):
+        """
+        Initializes the chain with its color, pieces and liberties
+
+        Args:
+            color(PlayerColors): the color of every piece in the chain
+            stones(set): the (row, col) coordinates of the pieces in the chain
+            liberties(set): the (row, col) coordinates of the empty squares touching the chain
+            owner: the game allowed to change the chain in place
+        """
+        self.color = color
+        self.stones: set = stones if stones is not None else set()
+        self.liberties: set = liberties if liberties is not None else set()
+        self.owner = owner
+
+    def merge(self, other: 'StoneChain'):
+        """
+        Absorbs another chain of the same color into this one
+
+        Args:
+            other(StoneChain): the chain to absorb
+        Raises:
+            ValueError: if the chains are not the same color
+        """
+        if other.color != self.color:
+            raise ValueError('Only chains of the same color can be merged.')
+        self.stones |= other.stones
+        self.liberties |= other.liberties
+
+    def copy(self) -> 'StoneChain':
+        """
+        Returns a chain of the same color with its own copies of the stones and liberties and no owner
+        """
+        return StoneChain(self.color, set(self.stones), set(self.liberties))
+
+    def __len__(self) -> int:
+        """
+        Returns the number of pieces in the chain
+        """
+        return len(self.stones)
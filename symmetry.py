@@ -0,0 +1,142 @@
+"""
+Title: Board Symmetry
+Purpose: Turns any position into the same one of its 8 rotations and reflections, so caches and archives can store
+    each position once however it is oriented, and maps points between the orientations
+"""
+from bit_board import BitBoard
+
+# A transform is a number from 0 to 7. Its 4 bit swaps rows and columns first, then its 1 bit mirrors each row left to
+# right and its 2 bit flips the rows top to bottom. 5 and 6 are the quarter turns, everything else is its own inverse.
+IDENTITY = 0
+TRANSFORMS = range(8)
+_INVERSES = (0, 1, 2, 3, 4, 6, 5, 7)
+
+
+def inverse(transform: int) -> int:
+    """
+    Returns the transform that undoes a transform
+    """
+    return _INVERSES[transform]
+
+
+def transform_point(transform: int, row: int, col: int, size: int) -> tuple[int, int]:
+    """
+    Returns where a square ends up after a transform
+
+    Args:
+        transform(int): the transform, 0 to 7
+        row(int): the row of the square
+        col(int): the column of the square
+        size(int): the number of rows (and columns) in the board
+    """
+    if transform & 4:
+        row, col = col, row
+    if transform & 1:
+        col = size - 1 - col
+    if transform & 2:
+        row = size - 1 - row
+    return row, col
+
+
+def _bit_string(mask: int, size: int) -> str:
+    """
+    Returns a BitBoard mask as a string of '0' and '1' where character i is bit i
+    """
+    return format(mask, f'0{size * (size + 1)}b')[::-1]
+
+
+def _lines(bits: str, size: int, transform: int) -> list:
+    """
+    Returns the rows of a mask given by _bit_string() after a transform, each a string of size characters
+    """
+    stride = size + 1
+    if transform & 4:
+        lines = [bits[col::stride] for col in range(size)]
+    else:
+        lines = [bits[row * stride:row * stride + size] for row in range(size)]
+    if transform & 2:
+        lines.reverse()
+    if transform & 1:
+        lines = [line[::-1] for line in lines]
+    return lines
+
+
+def _orientations(bits: str, size: int) -> list:
+    """
+    Returns the rows of a mask given by _bit_string() joined into one string, for each of the 8 transforms
+
+    Only 4 orientations are built from slices, each of the others is one of those read backwards.
+    """
+    stride = size + 1
+    rows = [bits[row * stride:row * stride + size] for row in range(size)]
+    cols = [bits[col::stride] for col in range(size)]
+    joined = [''.join(rows), None, ''.join(reversed(rows)), None, ''.join(cols), None, ''.join(reversed(cols)), None]
+    for transform, mirror in ((1, 2), (3, 0), (5, 6), (7, 4)):
+        joined[transform] = joined[mirror][::-1]
+    return joined
+
+
+def _mask(lines: list) -> int:
+    """
+    Returns the BitBoard mask of rows made by _lines(), putting the empty guard bit back after each row
+    """
+    return int('0'.join(lines)[::-1], 2)
+
+
+def _ko_after(bits: BitBoard, transform: int) -> int:
+    """
+    Returns the ko point of a board after a transform, or -1
+    """
+    if bits.ko < 0:
+        return -1
+    return bits.point(*transform_point(transform, *bits.coords(bits.ko), bits.size))
+
+
+def transform_bitboard(bits: BitBoard, transform: int) -> BitBoard:
+    """
+    Returns a rotated or reflected copy of a board, with its ko point and hash
+
+    Args:
+        bits(BitBoard): the board, it is not changed
+        transform(int): the transform, 0 to 7
+    """
+    other = bits.copy()
+    if transform == IDENTITY:
+        return other
+    other.stones = [_mask(_lines(_bit_string(stones, bits.size), bits.size, transform)) for stones in bits.stones]
+    other.ko = _ko_after(bits, transform)
+    other.rehash()
+    return other
+
+
+def canonical_form(bits: BitBoard) -> tuple[BitBoard, int]:
+    """
+    Returns the orientation of a board that all 8 of its rotations and reflections share, and the transform to it
+
+    Every orientation's stones are written out as strings of rows, which Python slices, reverses and compares in C,
+    and the smallest is kept. When several transforms give the same board the lowest numbered one is returned.
+
+    Args:
+        bits(BitBoard): the board, it is not changed
+    Returns:
+        (canonical BitBoard with its ko point and hash, transform from bits to it). A move at (row, col) on the
+        canonical board is transform_point(inverse(transform), row, col, size) on the original one.
+    """
+    size = bits.size
+    black, white = (_orientations(_bit_string(stones, size), size) for stones in bits.stones)
+    best = None
+    best_transform = IDENTITY
+    for transform in TRANSFORMS:
+        key = (black[transform], white[transform], _ko_after(bits, transform))
+        if best is None or key < best:
+            best = key
+            best_transform = transform
+    return transform_bitboard(bits, best_transform), best_transform
+
+
+def canonical_hash(bits: BitBoard) -> tuple[int, int]:
+    """
+    Returns the Zobrist hash of the canonical orientation of a board and the transform to it, see canonical_form()
+    """
+    canonical, transform = canonical_form(bits)
+    return canonical.position_hash, transform
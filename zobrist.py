@@ -0,0 +1,52 @@
+"""
+Title: Zobrist Hashing
+Purpose: Builds the random key tables used to hash board positions so that ko and superko can be checked in constant time
+"""
+import random
+from player_colors import PlayerColors
+
+# Fixed seed so that a position always hashes to the same value between runs
+ZOBRIST_SEED = 163
+
+# Tables are built lazily, once per board size
+_tables: dict = {}
+
+
+def zobrist_table(nrows: int, ncols: int) -> tuple:
+    """
+    Returns the Zobrist key table for a board of the given size, building it the first time it is requested
+
+    Args:
+        nrows(int): The number of rows in the board
+        ncols(int): The number of columns in the board
+    Returns:
+        A tuple with one tuple of 64 bit keys per player color, indexed by row * ncols + col
+
+    """
+    key = (nrows, ncols)
+    table = _tables.get(key)
+    if table is None:
+        rng = random.Random(f"{ZOBRIST_SEED}:{nrows}x{ncols}")
+        table = tuple(tuple(rng.getrandbits(64) for _ in range(nrows * ncols)) for _ in PlayerColors)
+        _tables[key] = table
+    return table
+
+
+def hash_board(board, table: tuple) -> int:
+    """
+    Computes the Zobrist hash of a whole board from scratch
+
+    Args:
+        board(list[list]): the board to hash
+        table(tuple): the key table from zobrist_table() matching the board's size
+    Returns:
+        The 64 bit hash of the board, 0 for an empty board
+
+    """
+    ncols = len(board[0])
+    position_hash = 0
+    for row_i, row in enumerate(board):
+        for col_i, ele in enumerate(row):
+            if ele is not None:
+                position_hash ^= table[ele.color.value][row_i * ncols + col_i]
+    return position_hash